@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 from .models import Cart, CartItem, Category, CheckoutSession, HolidayDeal, MpesaTransaction, Order, OrderItem, ProductReview, Tag, Product, ProductImages
 from django.utils.safestring import mark_safe
+from .crud import apply_review_rating_changes, moderate_reviews
+from .signals import notify_products_changed
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -54,11 +58,49 @@ class CheckoutSessionAdmin(admin.ModelAdmin):
 
 @admin.register(ProductReview)
 class ProductReviewAdmin(admin.ModelAdmin):
-    list_display = ('user', 'is_approved', 'rating')
+    list_display = ('user', 'product', 'is_approved', 'rating', 'moderated_at', 'created_at')
+    list_filter = ('is_approved',)
+    list_select_related = ('user', 'product')
+    actions = ['approve_reviews', 'reject_reviews']
+
+    @admin.action(description="Approve selected reviews")
+    def approve_reviews(self, request, queryset):
+        updated, product_ids = moderate_reviews(queryset.values_list('id', flat=True), approve=True)
+        self.message_user(request, f"Approved {updated} reviews across {len(product_ids)} products.")
+
+    @admin.action(description="Reject selected reviews")
+    def reject_reviews(self, request, queryset):
+        updated, product_ids = moderate_reviews(queryset.values_list('id', flat=True), approve=False)
+        self.message_user(request, f"Rejected {updated} reviews across {len(product_ids)} products.")
+
+    def save_model(self, request, obj, form, change):
+        """Keep the product's rating summary in step with approval and rating edits."""
+        with transaction.atomic():
+            before = (form.initial.get('is_approved'), form.initial.get('rating')) if change else None
+            if 'is_approved' in form.changed_data:
+                obj.moderated_at = timezone.now()
+            obj.save()
+            if apply_review_rating_changes([(obj.product_id, before, (obj.is_approved, obj.rating))]):
+                notify_products_changed([obj.product_id])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            obj.delete()
+            if apply_review_rating_changes([(obj.product_id, (obj.is_approved, obj.rating), None)]):
+                notify_products_changed([obj.product_id])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            reviews = list(queryset.values_list('product_id', 'is_approved', 'rating'))
+            queryset.delete()
+            notify_products_changed(apply_review_rating_changes(
+                (product_id, (is_approved, rating), None) for product_id, is_approved, rating in reviews
+            ))
 
 @admin.register(MpesaTransaction)
 class MpesaTransactionAdmin(admin.ModelAdmin):
     list_display = ('order', 'status', 'amount')
+    list_filter = ('status',)
 
 @admin.register(HolidayDeal)
 class HolidayDealAdmin(admin.ModelAdmin):
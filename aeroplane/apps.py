@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class AeroplaneConfig(AppConfig):
     name = "aeroplane"
+
+    def ready(self):
+        from . import conditional, ranking, views
+        from .middleware import install_query_observers
+
+        connection_created.connect(install_query_observers, dispatch_uid="aeroplane.query_observers")
+        # Ranking first: its on_commit callbacks then patch the ranked lists
+        # before the catalog versions are bumped, so nothing rebuilt under a
+        # new version reads an old list.
+        ranking.connect_signals()
+        conditional.connect_signals()
+        views.connect_home_signals()
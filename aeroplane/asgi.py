@@ -0,0 +1,30 @@
+import os
+
+from asgiref.sync import sync_to_async
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aeroplane.settings")
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """
+    Django with ASGI lifespan support: cache warmup (WARMUP_ON_BOOT) runs
+    at startup. Django itself rejects lifespan scopes.
+    """
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            from aeroplane.warmup import warm_on_boot
+
+            try:
+                await sync_to_async(warm_on_boot, thread_sensitive=False)()
+            except Exception as exc:
+                await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,198 @@
+"""
+Async versions of the catalog read and M-Pesa payment endpoints, served
+under ``/api/async/`` with the same responses as their ``/api/``
+counterparts.
+
+Under ASGI (``aeroplane.asgi``) a sync view holds a worker thread for as
+long as it waits on the database or on Daraja. These views await instead,
+so a single event loop keeps serving other requests meanwhile. Queries go
+through the async ORM with everything the serializers read prefetched, and
+serializing (which reads image files) runs in a worker thread.
+"""
+import math
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions, status
+
+from users.authentication import CustomJWTAuthentication
+from users.models import PaymentMethod, ShippingAddress
+
+from .conditional import conditional
+from .crud import (
+    ainitiate_mpesa_stk_push, aget_active_holiday_deals, aget_product, aget_products,
+    aget_products_by_category, aprocess_mpesa_query
+)
+from .models import Order
+from .parsers import loads
+from .renderers import ORJSONRenderer
+from .serializers import (
+    CheckoutSessionRequestSerializer, CheckoutSessionResponseSerializer, HolidayDealSerializer,
+    MpesaQueryRequestSerializer, MpesaQueryResponseSerializer, ProductSerializer
+)
+from .throttling import (
+    CheckoutIPThrottle, CheckoutPhoneThrottle, CheckoutUserThrottle, MpesaQueryUserThrottle
+)
+
+
+def api_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        ORJSONRenderer().render(data), status=status, headers=headers, content_type='application/json'
+    )
+
+
+def error_response(exc):
+    """Render an APIException the way DRF's exception handler does."""
+    headers = {}
+    if getattr(exc, 'auth_header', None):
+        headers['WWW-Authenticate'] = exc.auth_header
+    if getattr(exc, 'wait', None) is not None:
+        headers['Retry-After'] = str(math.ceil(exc.wait))
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return api_response(data, status=exc.status_code, headers=headers)
+
+
+async def serialize(serializer_class, instance, many=False):
+    # No queries happen here (see crud.with_listing_prefetches), so this
+    # need not run on the thread that owns the database connection.
+    return await sync_to_async(lambda: serializer_class(instance, many=many).data, thread_sensitive=False)()
+
+
+async def authenticate(request):
+    """
+    Return the user of the request's JWT, raising NotAuthenticated or
+    AuthenticationFailed like IsAuthenticated views do.
+    """
+    authenticator = CustomJWTAuthentication()
+    result = await sync_to_async(authenticator.authenticate)(request)
+    if result is None:
+        exc = exceptions.NotAuthenticated()
+        exc.auth_header = authenticator.authenticate_header(request)
+        raise exc
+    return result[0]
+
+
+def parse_json(request):
+    try:
+        data = loads(request.body or b'{}')
+    except ValueError as e:
+        raise exceptions.ParseError(f'JSON parse error - {e}')
+    if not isinstance(data, dict):
+        raise exceptions.ParseError('Expected a JSON object.')
+    return data
+
+
+async def check_throttles(request, user, data, throttle_classes):
+    probe = SimpleNamespace(user=user, data=data, META=request.META)
+
+    def waits():
+        return [
+            throttle.wait() for throttle in (throttle_class() for throttle_class in throttle_classes)
+            if not throttle.allow_request(probe, None)
+        ]
+
+    # The shared cache backend does network I/O; the local buckets do not.
+    if getattr(settings, 'THROTTLE_BACKEND', 'local') == 'cache':
+        pending = await sync_to_async(waits)()
+    else:
+        pending = waits()
+    if pending:
+        raise exceptions.Throttled(max(pending))
+
+
+def not_found(model):
+    return exceptions.NotFound(f'No {model._meta.object_name} matches the given query.')
+
+
+@require_GET
+@conditional('products')
+async def product_list_view(request):
+    products = await aget_products(ordering=request.GET.get('ordering'))
+    return api_response(await serialize(ProductSerializer, products, many=True))
+
+
+@require_GET
+@conditional('products')
+async def product_detail_view(request, product_id):
+    product = await aget_product(product_id)
+    if not product:
+        return api_response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    return api_response(await serialize(ProductSerializer, product))
+
+
+@require_GET
+@conditional('products')
+async def products_by_category_view(request, category_id):
+    products = await aget_products_by_category(category_id, ordering=request.GET.get('ordering'))
+    if not products:
+        return api_response({"detail": "No products found for this category"}, status=status.HTTP_404_NOT_FOUND)
+    return api_response(await serialize(ProductSerializer, products, many=True))
+
+
+@require_GET
+@conditional('deals')
+async def holiday_deal_list_view(request):
+    deals = await aget_active_holiday_deals()
+    return api_response(await serialize(HolidayDealSerializer, deals, many=True))
+
+
+@csrf_exempt
+@require_POST
+async def create_checkout_session_view(request):
+    try:
+        user = await authenticate(request)
+        data = parse_json(request)
+        await check_throttles(request, user, data, [CheckoutIPThrottle, CheckoutUserThrottle, CheckoutPhoneThrottle])
+        serializer = CheckoutSessionRequestSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        validated = serializer.validated_data
+
+        order = await Order.objects.filter(id=validated['order_id'], user=user).afirst()
+        if order is None:
+            raise not_found(Order)
+        if order.payment_status != "unpaid":
+            return api_response({"detail": "Order already processed"}, status=status.HTTP_400_BAD_REQUEST)
+        if not await ShippingAddress.objects.filter(id=validated['shipping_address_id'], user=user).aexists():
+            raise not_found(ShippingAddress)
+        if not await PaymentMethod.objects.filter(id=validated['payment_method_id'], user=user).aexists():
+            raise not_found(PaymentMethod)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+
+    phone_number = validated['phone_number']
+    if not phone_number.startswith('254'):
+        return api_response({"detail": "Invalid M-Pesa phone number"}, status=status.HTTP_400_BAD_REQUEST)
+
+    mpesa_response = await ainitiate_mpesa_stk_push(
+        order, phone_number, float(order.total_amount), settings.MPESA_CALLBACK_URL
+    )
+    response_serializer = CheckoutSessionResponseSerializer({
+        'checkout_request_id': mpesa_response['CheckoutRequestID'],
+        'merchant_request_id': mpesa_response['MerchantRequestID'],
+        'response_code': mpesa_response['ResponseCode'],
+        'response_description': mpesa_response['ResponseDescription'],
+        'customer_message': mpesa_response['CustomerMessage']
+    })
+    return api_response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_POST
+async def query_mpesa_view(request):
+    try:
+        user = await authenticate(request)
+        data = parse_json(request)
+        await check_throttles(request, user, data, [MpesaQueryUserThrottle])
+        serializer = MpesaQueryRequestSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+
+    result = await aprocess_mpesa_query(serializer.validated_data)
+    if result.get('status') == 'error':
+        return api_response({"detail": result['message']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return api_response(MpesaQueryResponseSerializer(result).data)
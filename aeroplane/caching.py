@@ -0,0 +1,334 @@
+"""
+Two-tier cache: a per-process LRU in front of a shared Django cache.
+
+Values are stored in both tiers inside an envelope with a soft expiry time
+and the version tokens of their tags. Reads work as follows:
+
+- **Local tier.** An entry is served without any I/O while it is within the
+  instance's ``local_ttl`` trust window. After that it is served only if
+  its tag tokens still match the shared ones, which costs one small read.
+- **Shared tier.** On a local miss the entry is read from the shared cache
+  and checked the same way.
+- **Soft expiry.** Once ``ttl`` has passed, the first caller to take the
+  key's lock recomputes the value while every other caller is served the
+  stale one. After a further ``stale_ttl`` the shared cache drops the
+  entry altogether.
+- **Misses.** On a miss only the caller holding the lock runs ``compute``.
+  The rest poll the shared tier for its result, for up to ``lock_wait``
+  seconds, so that concurrent misses do not all hit the database.
+
+``invalidate_tags`` gives a tag a new token, orphaning every entry stored
+under the old one in every process, and by default it waits for the
+current transaction to commit. Tag versions also carry the time they were
+last bumped, which ``aeroplane.conditional`` uses for Last-Modified.
+
+Locks use ``cache.add``, which is atomic on Redis and the database cache
+but only best effort on the file cache. A lost race costs one extra
+recompute, never a wrong value.
+"""
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .metrics import record_cache
+
+TAG_KEY = "tag:{tag}"
+LOCK_KEY = "lock:{key}"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def tag_versions(tags, alias="default"):
+    """
+    ``{tag: (timestamp, token)}``, creating a version for any tag the shared
+    cache has none for (first use or eviction). A new version orphans the
+    entries stored under the old one; it never resurrects a stale one.
+    """
+    cache = caches[alias]
+    keys = {TAG_KEY.format(tag=tag): tag for tag in tags}
+    found = cache.get_many(keys) if keys else {}
+    for key in keys.keys() - found.keys():
+        cache.add(key, (time.time(), uuid.uuid4().hex), None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate_tags(*tags, on_commit=True, alias="default"):
+    """
+    Orphan every entry stored under any of ``tags``, once the current
+    transaction commits unless ``on_commit`` is False. Bumping before the
+    commit would let a concurrent reader cache the old rows under the new
+    version.
+    """
+    def bump():
+        now = time.time()
+        caches[alias].set_many({TAG_KEY.format(tag=tag): (now, uuid.uuid4().hex) for tag in tags}, None)
+        for instance in list(TieredCache.instances):
+            instance.local.discard_tagged(tags)
+
+    if on_commit:
+        transaction.on_commit(bump)
+    else:
+        bump()
+
+
+class LocalTier:
+    """LRU of ``key -> (trusted_until, envelope)``; ``trusted_until`` is monotonic time."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, trusted_until, envelope):
+        with self._lock:
+            self._entries[key] = (trusted_until, envelope)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_tagged(self, tags):
+        tags = set(tags)
+        with self._lock:
+            for key in [key for key, (_, envelope) in self._entries.items() if tags & envelope[2].keys()]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SizeBoundedLRU:
+    """
+    Per-process LRU of strings or bytes bounded by their total length, for
+    values whose keys identify their content (so they never go stale, only
+    get evicted): compressed bodies, encoded images.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class TieredCache:
+    """
+    A namespace (``name``) in the two-tier cache. ``local_ttl`` is how long
+    the local tier may serve an entry without checking its tags against the
+    shared tier, and so how stale a value invalidated by another process may
+    get: keep it at 0 for anything that must match the ETags of
+    ``aeroplane.conditional``.
+    """
+    instances = weakref.WeakSet()
+
+    def __init__(self, name, alias="default", local_maxsize=1024, local_ttl=0.0, lock_timeout=None,
+                 lock_wait=None, poll_interval=0.05):
+        self.name = name
+        self.alias = alias
+        self.local = LocalTier(local_maxsize)
+        self.local_ttl = local_ttl
+        self.lock_timeout = lock_timeout if lock_timeout is not None else _setting("TIERED_CACHE_LOCK_TIMEOUT", 30)
+        self.lock_wait = lock_wait if lock_wait is not None else _setting("TIERED_CACHE_LOCK_WAIT", 5)
+        self.poll_interval = poll_interval
+        TieredCache.instances.add(self)
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _shared_key(self, key):
+        return f"{self.name}:{key}"
+
+    def _tokens(self, tags):
+        return {tag: version[1] for tag, version in tag_versions(tags, self.alias).items()}
+
+    def _lookup(self, key, tags):
+        """The entry for ``key`` that is valid for the current tag versions, fresh or stale, or None."""
+        local = self.local.get(key)
+        now = time.time()
+        if local is not None and local[1][1] > now:
+            if local[0] > time.monotonic():
+                record_cache(f"{self.name}_local", True)
+                return local[1]
+            tokens = self._tokens(tags)
+            if local[1][2] == tokens:
+                self.local.set(key, time.monotonic() + self.local_ttl, local[1])
+                record_cache(f"{self.name}_local", True)
+                return local[1]
+        else:
+            tokens = None
+        record_cache(f"{self.name}_local", False)
+
+        if tokens is None:
+            tokens = self._tokens(tags)
+        envelope = self.shared.get(self._shared_key(key))
+        valid = envelope is not None and envelope[2] == tokens
+        record_cache(f"{self.name}_shared", valid)
+        if not valid:
+            return None
+        if envelope[1] > now:
+            self.local.set(key, time.monotonic() + self.local_ttl, envelope)
+        return envelope
+
+    def get(self, key, tags=(), default=None):
+        """The cached value for ``key``, stale or not, or ``default``."""
+        envelope = self._lookup(key, tags)
+        return default if envelope is None else envelope[0]
+
+    def set(self, key, value, ttl, tags=(), stale_ttl=0, tokens=None):
+        """
+        Store ``value`` for ``ttl`` seconds, plus ``stale_ttl`` during which
+        it is served while being recomputed. Pass the ``tokens`` read before
+        computing the value when there are tags, so that an invalidation in
+        the meantime is not lost.
+        """
+        if tokens is None:
+            tokens = self._tokens(tags)
+        envelope = (value, time.time() + ttl, tokens)
+        self.shared.set(self._shared_key(key), envelope, ttl + stale_ttl)
+        self.local.set(key, time.monotonic() + self.local_ttl, envelope)
+
+    def delete(self, key):
+        self.shared.delete(self._shared_key(key))
+        self.local.discard(key)
+
+    def _acquire(self, key):
+        token = uuid.uuid4().hex
+        return token if self.shared.add(LOCK_KEY.format(key=self._shared_key(key)), token, self.lock_timeout) else None
+
+    def _release(self, key, token):
+        lock_key = LOCK_KEY.format(key=self._shared_key(key))
+        if self.shared.get(lock_key) == token:
+            self.shared.delete(lock_key)
+
+    def _recompute(self, key, compute, ttl, tags, stale_ttl, lock_token=None):
+        try:
+            tokens = self._tokens(tags)
+            value = compute()
+            self.set(key, value, ttl, tags, stale_ttl, tokens)
+            return value
+        finally:
+            if lock_token is not None:
+                self._release(key, lock_token)
+
+    def get_or_set(self, key, compute, ttl, tags=(), stale_ttl=0, lock=True):
+        """
+        Return the cached value for ``key``, calling ``compute()`` to fill or
+        refresh it. With ``lock`` (the default) at most one caller across all
+        processes computes a key at a time. Exceptions from ``compute``
+        propagate and nothing is cached.
+        """
+        envelope = self._lookup(key, tags)
+        if envelope is not None:
+            if envelope[1] > time.time():
+                return envelope[0]
+            lock_token = self._acquire(key) if lock else None
+            if lock and lock_token is None:
+                return envelope[0]  # someone else is revalidating it
+            return self._recompute(key, compute, ttl, tags, stale_ttl, lock_token)
+
+        if not lock:
+            return self._recompute(key, compute, ttl, tags, stale_ttl)
+        deadline = time.monotonic() + self.lock_wait
+        while True:
+            lock_token = self._acquire(key)
+            if lock_token is not None:
+                return self._recompute(key, compute, ttl, tags, stale_ttl, lock_token)
+            time.sleep(self.poll_interval)
+            envelope = self._lookup(key, tags)
+            if envelope is not None:
+                return envelope[0]
+            if time.monotonic() >= deadline:
+                # The holder is stuck or gone; don't wait for its lock to expire.
+                return self._recompute(key, compute, ttl, tags, stale_ttl)
+
+    def update(self, key, change, ttl, tags, stale_ttl=0):
+        """
+        Replace the cached value of ``key`` with ``change(value)`` under the
+        key's lock, for values cheaper to patch than to recompute. ``tags``
+        get a new version so that other processes drop their local copies;
+        only this key should be stored under them. A missing key is left for
+        the next ``get_or_set``, and if the lock is busy the key is dropped
+        instead, so an update is never lost. ``change`` must not modify the
+        value it is given (other threads may be reading it), and returns it
+        as is when there is nothing to change, which leaves the tags alone.
+
+        :return: the new value, or None if the key was dropped
+        """
+        lock_token = self._acquire(key)
+        try:
+            envelope = self.shared.get(self._shared_key(key)) if lock_token else None
+            if envelope is not None and envelope[2] == self._tokens(tags):
+                value = change(envelope[0])
+                if value is not envelope[0]:
+                    invalidate_tags(*tags, on_commit=False, alias=self.alias)
+                    self.set(key, value, ttl, tags, stale_ttl)
+                return value
+            invalidate_tags(*tags, on_commit=False, alias=self.alias)
+            self.delete(key)
+            return None
+        finally:
+            if lock_token is not None:
+                self._release(key, lock_token)
+
+
+catalog_cache = TieredCache(
+    "catalog",
+    local_maxsize=_setting("CATALOG_CACHE_LOCAL_MAXSIZE", 256),
+)
+
+
+def cached_catalog(key, tags, build):
+    """``build()`` (serialized catalog data) through ``catalog_cache`` with the catalog TTLs."""
+    return catalog_cache.get_or_set(
+        key, build, _setting("CATALOG_CACHE_TTL", 600), tags=tags,
+        stale_ttl=_setting("CATALOG_CACHE_STALE_TTL", 60),
+    )
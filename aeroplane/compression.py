@@ -0,0 +1,160 @@
+"""
+Response compression used by ``aeroplane.middleware.CompressionMiddleware``.
+
+gzip is always available; Brotli and zstd are offered when the ``brotli``
+and ``zstandard`` packages are installed. Compressed bodies are kept in a
+per-process LRU keyed by encoding and a digest of the uncompressed body, so
+a catalog response rendered from a cache, or rendered again unchanged, is
+not compressed a second time.
+"""
+import hashlib
+import zlib
+
+from django.conf import settings
+
+from .caching import SizeBoundedLRU
+from .metrics import record_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_LEVELS = {"br": 5, "zstd": 3, "gzip": 6}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _level(encoding):
+    return _setting("COMPRESSION_LEVELS", {}).get(encoding, DEFAULT_LEVELS[encoding])
+
+
+class GzipStream:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        # A sync flush after every chunk, so that each one reaches the client.
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliStream:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdStream:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def _gzip(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+# encoding -> (one-shot compress(data, level), incremental stream class)
+CODECS = {"gzip": (_gzip, GzipStream)}
+if brotli is not None:
+    CODECS["br"] = (lambda data, level: brotli.compress(data, quality=level), BrotliStream)
+if zstandard is not None:
+    CODECS["zstd"] = (lambda data, level: zstandard.ZstdCompressor(level=level).compress(data), ZstdStream)
+
+
+def available_encodings():
+    """Configured encodings in order of preference, limited to installed codecs."""
+    return [encoding for encoding in _setting("COMPRESSION_ENCODINGS", ("br", "zstd", "gzip")) if encoding in CODECS]
+
+
+def parse_accept_encoding(header):
+    """``{coding: q}`` for an Accept-Encoding header; malformed q-values count as 0."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header):
+    """
+    Pick the encoding for an Accept-Encoding header: the highest q-value
+    wins and ties go to the first of ``available_encodings()``. Returns None
+    when the client accepts none of them.
+    """
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+variants = SizeBoundedLRU(_setting("COMPRESSION_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+
+def compress_body(body, encoding):
+    """Compress a complete body, reusing an earlier result for identical bytes."""
+    if len(body) < _setting("COMPRESSION_CACHE_MIN_SIZE", 4096):
+        return CODECS[encoding][0](body, _level(encoding))
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    compressed = variants.get(key)
+    record_cache("compression", compressed is not None)
+    if compressed is None:
+        compressed = CODECS[encoding][0](body, _level(encoding))
+        variants.set(key, compressed)
+    return compressed
+
+
+def compress_stream(chunks, encoding):
+    stream = CODECS[encoding][1](_level(encoding))
+    for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    stream = CODECS[encoding][1](_level(encoding))
+    async for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
@@ -0,0 +1,122 @@
+"""
+Conditional GET for the catalog endpoints.
+
+Every cacheable representation belongs to one or more scopes ("products",
+"categories", "deals"), which are tags of ``aeroplane.caching``: model
+signals invalidate them on commit of any change to the models they are
+built from (see ``connect_signals``), and the catalog cache entries stored
+under them go with them. A view's ETag is a digest of its scopes' tag
+tokens, the request path and the Accept header, and its Last-Modified is
+the newest bump time. Both take one cache read; nothing is queried or
+rendered, so a matching request is answered with a 304 at almost no cost.
+
+Changes that bypass model signals (``QuerySet.update``, ``bulk_create``,
+raw SQL) must call ``bump_catalog_version`` themselves.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .caching import invalidate_tags, tag_versions
+from .signals import products_changed
+
+SCOPES = ("products", "categories", "deals")
+
+
+def bump_catalog_version(*scopes):
+    """Invalidate ``scopes`` once the current transaction commits."""
+    invalidate_tags(*scopes)
+
+
+def compute_validators(request, scopes):
+    """``(etag, last_modified)`` of the representation ``request`` asks for."""
+    versions = tag_versions(scopes)
+    digest = hashlib.blake2b(digest_size=16)
+    for scope in scopes:
+        digest.update(versions[scope][1].encode())
+    digest.update(request.get_full_path().encode())
+    digest.update(request.META.get('HTTP_ACCEPT', '').encode())
+    # Whole seconds, as HTTP dates have no finer resolution.
+    return quote_etag(digest.hexdigest()), int(max(timestamp for timestamp, _ in versions.values()))
+
+
+def _finalize(request, response, etag, last_modified, public):
+    if request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304):
+        return response
+    response.headers.setdefault('ETag', etag)
+    if not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified)
+    max_age = getattr(settings, 'CATALOG_CACHE_MAX_AGE', 60)
+    if public:
+        patch_cache_control(response, public=True, max_age=max_age)
+    else:
+        patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
+def conditional(*scopes, public=True):
+    """
+    Decorate a view (sync or async; use ``method_decorator`` on viewset
+    methods, which DRF calls after authentication and permission checks)
+    so that it answers matching If-None-Match/If-Modified-Since requests
+    with a 304, and sends ETag, Last-Modified and Cache-Control otherwise.
+    ``public=False`` marks responses that need authentication as private.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                # The cache may be over the network.
+                etag, last_modified = await sync_to_async(compute_validators)(request, scopes)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finalize(request, response, etag, last_modified, public)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                etag, last_modified = compute_validators(request, scopes)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _finalize(request, response, etag, last_modified, public)
+        return inner
+    return decorator
+
+
+def connect_signals():
+    """Bump the stamps of every scope a model appears in when it changes."""
+    from .models import Category, HolidayDeal, Product, ProductImages
+
+    def receiver(*scopes):
+        def bump(sender, action=None, **kwargs):
+            if action is None or action.startswith('post_'):  # m2m_changed sends pre_ and post_
+                bump_catalog_version(*scopes)
+        return bump
+
+    # Products embed their images and active deals; deals count their
+    # products; deleting a category nulls its products' category_id.
+    dependencies = {
+        Product: ("products", "deals"),
+        ProductImages: ("products",),
+        Category: ("categories", "products"),
+        HolidayDeal: ("deals", "products"),
+    }
+    for model, scopes in dependencies.items():
+        handler = receiver(*scopes)
+        uid = f"aeroplane.conditional.{model.__name__}"
+        post_save.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+    m2m_changed.connect(
+        receiver("deals", "products"), sender=HolidayDeal.products.through, weak=False,
+        dispatch_uid="aeroplane.conditional.HolidayDeal.products",
+    )
+    # Rating summaries are updated with QuerySet.update().
+    products_changed.connect(
+        receiver("products"), weak=False, dispatch_uid="aeroplane.conditional.products_changed",
+    )
@@ -1,26 +1,67 @@
+import asyncio
 import base64
+import logging
+import math
+import weakref
+from collections import Counter, defaultdict
 from datetime import datetime
 import os
 from django.utils import timezone
 from typing import List, Optional
+from django.conf import settings
 from django.db import transaction
-from fastapi import HTTPException
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Prefetch, Q, Sum, Value, When, Window
+from django.db.models.functions import RowNumber
+import httpx
 import requests
-from .models import Cart, CartItem, Category, CheckoutSession, Order, Product, ProductReview  # Assuming Product is one of your models
+from .caching import SizeBoundedLRU
+from .metrics import IMAGE_ENCODE_BYTES, MPESA_ERRORS, record_cache, track_mpesa
+from .signals import notify_products_changed
+from .models import RATING, Cart, CartItem, Category, CheckoutSession, HolidayDeal, Order, Product, ProductReview  # Assuming Product is one of your models
+
+logger = logging.getLogger(__name__)
+
+
+# Encoded images by (path, mtime, size), so that a replaced file is encoded again.
+encoded_images = SizeBoundedLRU(getattr(settings, "IMAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+IMAGE_DATA_PREFIX = "data:image/jpeg;base64,"
+
+
+def encoded_image_length(image_field) -> int:
+    """The length ``encode_image_to_base64`` gives an image, from its file size alone (0 if missing)."""
+    try:
+        size = os.path.getsize(image_field.path) if image_field else None
+    except OSError:
+        size = None
+    return 0 if size is None else len(IMAGE_DATA_PREFIX) + 4 * math.ceil(size / 3)
 
 
 def encode_image_to_base64(image_field) -> Optional[str]:
-    if image_field and os.path.exists(image_field.path):
-        try:
-            with open(image_field.path, "rb") as image_file:
-                base64_string = base64.b64encode(image_file.read()).decode("utf-8")
-                return f"data:image/jpeg;base64,{base64_string}"
-        except Exception as e:
-            print(f"Error encoding image {image_field.path}: {e}")
-            return None
-    else:
-        print(f"Image not found or missing: {image_field.path if image_field else 'None'}")
+    if not image_field:
+        logger.debug("Image not found or missing: %s", None)
+        return None
+    try:
+        stat = os.stat(image_field.path)
+    except OSError:
+        logger.debug("Image not found or missing: %s", image_field.path)
         return None
+    key = (image_field.path, stat.st_mtime_ns, stat.st_size)
+    encoded = encoded_images.get(key)
+    record_cache("image", encoded is not None)
+    if encoded is not None:
+        return encoded
+    try:
+        with open(image_field.path, "rb") as image_file:
+            base64_string = base64.b64encode(image_file.read()).decode("utf-8")
+    except Exception:
+        logger.warning("Error encoding image %s", image_field.path, exc_info=True)
+        return None
+    IMAGE_ENCODE_BYTES.inc(len(base64_string))
+    encoded = f"{IMAGE_DATA_PREFIX}{base64_string}"
+    encoded_images.set(key, encoded)
+    return encoded
 
 
 def create_product(**kwargs):
@@ -46,13 +87,71 @@ def get_product(product_id: int):
     except Product.DoesNotExist:
         return None
 
-def get_products() -> List[Product]:
+# Public ordering names accepted by the product listings.
+PRODUCT_ORDERINGS = {
+    'rating': ('-rating_avg', '-rating_count'),
+    '-rating': ('rating_avg', 'rating_count'),
+    'rating_count': ('-rating_count',),
+    '-rating_count': ('rating_count',),
+}
+
+def order_products(queryset, ordering=None):
+    """
+    Apply one of PRODUCT_ORDERINGS to a product queryset; unknown values are
+    ignored. Rating orderings sort by the stored summary, so no review rows
+    are read.
+    """
+    if ordering not in PRODUCT_ORDERINGS:
+        return queryset
+    if 'rating' in ordering and 'count' not in ordering:
+        queryset = queryset.annotate(rating_avg=Case(
+            When(rating_count=0, then=Value(0.0)),
+            default=ExpressionWrapper(F('rating_sum') * 1.0 / F('rating_count'), output_field=FloatField()),
+            output_field=FloatField(),
+        ))
+    return queryset.order_by(*PRODUCT_ORDERINGS[ordering], 'id')
+
+def get_products(ordering=None) -> List[Product]:
     """
     Retrieves all products from the database.
     
-    :return: A list of all Product instances
+    :param ordering: Optional key of PRODUCT_ORDERINGS
+    :return: A list of all Product instances, with the listing prefetches
+    """
+    return list(with_listing_prefetches(order_products(Product.objects.all(), ordering)))
+
+def get_hot_product_ids(limit: int) -> List[int]:
     """
-    return list(Product.objects.all())
+    Ids of the products most likely to be requested: featured ones first,
+    then the most ordered.
+    """
+    return list(
+        Product.objects.annotate(order_count=Count('orderitem'))
+        .order_by('-featured', '-order_count', '-id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+def get_active_deals_with_top_products(per_deal: int) -> List[tuple]:
+    """
+    ``[(deal, product_ids)]`` for the active holiday deals, each with its
+    ``per_deal`` best rated published products, in two queries.
+    """
+    deals = list(HolidayDeal.objects.filter(is_active=True).annotate(product_count=Count('products')))
+    ranked = (
+        HolidayDeal.products.through.objects
+        .filter(holidaydeal_id__in=[deal.id for deal in deals], product__product_status='published')
+        .annotate(rank=Window(
+            RowNumber(), partition_by=F('holidaydeal_id'),
+            order_by=[F('product__rating_count').desc(), F('product_id').desc()],
+        ))
+        .filter(rank__lte=per_deal)
+        .order_by('holidaydeal_id', 'rank')
+        .values_list('holidaydeal_id', 'product_id')
+    )
+    top = defaultdict(list)
+    for deal_id, product_id in ranked:
+        top[deal_id].append(product_id)
+    return [(deal, top[deal.id]) for deal in deals]
 
 def update_product(product_id: int, **kwargs):
     """
@@ -90,9 +189,9 @@ def delete_product(product_id: int) -> bool:
 def get_categories() -> List[Category]:
     return list(Category.objects.all())
 
-def get_products_by_category(category_id: int) -> List[Product]:
+def get_products_by_category(category_id: int, ordering=None) -> List[Product]:
     try:
-        return list(Product.objects.filter(category_id=category_id))
+        return list(with_listing_prefetches(order_products(Product.objects.filter(category_id=category_id), ordering)))
     except Product.DoesNotExist:
         return []
     
@@ -113,10 +212,7 @@ def get_or_create_cart(user=None) -> Cart:
     return cart
 
 def add_to_cart(cart: Cart, product_id: int, quantity: int = 1, size: str = 'M') -> CartItem:
-    print(cart, 'cart in Data')
-    print(product_id, 'product_id in Data')
-    print(quantity, 'quantity in Data')
-    print(size, 'size in Data')
+    logger.debug("Adding product %s (quantity %s, size %s) to cart %s", product_id, quantity, size, cart.pk)
     with transaction.atomic():
         product = Product.objects.get(id=product_id)
         cart_item, created = CartItem.objects.get_or_create(
@@ -131,8 +227,6 @@ def add_to_cart(cart: Cart, product_id: int, quantity: int = 1, size: str = 'M')
         return 
     
 def update_cart_it(cart: Cart, cart_item_id: int, quantity: int = None, size: str = None) -> Cart:
-    print(cart, 'cart in Data')
-
     """
     Update the quantity and/or size of a specific cart item.
     
@@ -145,11 +239,9 @@ def update_cart_it(cart: Cart, cart_item_id: int, quantity: int = None, size: st
     Raises:
         ValueError: If the cart item is not found or if the update is invalid.
     """
-    print(f"Received args: cart={cart}, cart_item_id={cart_item_id}, quantity={quantity}, size={size}")
+    logger.debug("Updating item %s in cart %s: quantity %s, size %s", cart_item_id, cart.pk, quantity, size)
     try:
         cart_item = cart.items.get(id=cart_item_id)
-        print(cart_item, 'cart Data')
-        
     except CartItem.DoesNotExist:
         raise ValueError("Cart item not found")
     if quantity is not None:
@@ -172,8 +264,8 @@ def remove_from_cart(cart: Cart, cart_item_id: int) -> bool:
     with transaction.atomic():
         try:
             cart_item = CartItem.objects.get(id=cart_item_id, cart=cart)
-            print(cart_item)
             cart_item.delete()
+            logger.debug("Removed item %s from cart %s", cart_item_id, cart.pk)
             return True
         except CartItem.DoesNotExist:
             return False
@@ -188,6 +280,53 @@ def create_checkout_session(cart: Cart) -> CheckoutSession:
         return checkout_session 
     
 
+def apply_rating_deltas(product_id, deltas):
+    """
+    Adjust a product's rating summary in a single UPDATE.
+
+    :param product_id: The product whose summary changes
+    :param deltas: Mapping of star rating to the change in the number of
+                   approved reviews with that rating, e.g. ``{4: -1, 5: 1}``
+    """
+    deltas = {rating: change for rating, change in deltas.items() if change}
+    if not deltas:
+        return
+    updates = {f'rating_{rating}': F(f'rating_{rating}') + change for rating, change in deltas.items()}
+    Product.objects.filter(id=product_id).update(
+        rating_count=F('rating_count') + sum(deltas.values()),
+        rating_sum=F('rating_sum') + sum(rating * change for rating, change in deltas.items()),
+        **updates
+    )
+
+def review_rating_deltas(before=None, after=None):
+    """
+    Rating deltas for a review going from ``before`` to ``after``. Each side
+    is an ``(is_approved, rating)`` pair, or None if the review doesn't exist
+    on that side. Unapproved reviews don't count towards the summary.
+    """
+    deltas = Counter()
+    if before and before[0]:
+        deltas[before[1]] -= 1
+    if after and after[0]:
+        deltas[after[1]] += 1
+    return deltas
+
+def apply_review_rating_changes(changes):
+    """
+    Apply the rating deltas for many reviews, grouped so that each product
+    gets a single UPDATE.
+
+    :param changes: Iterable of ``(product_id, before, after)`` as taken by
+                    review_rating_deltas
+    :return: The ids of the products whose summary changed
+    """
+    deltas = defaultdict(Counter)
+    for product_id, before, after in changes:
+        deltas[product_id].update(review_rating_deltas(before, after))
+    for product_id, product_deltas in deltas.items():
+        apply_rating_deltas(product_id, product_deltas)
+    return {product_id for product_id, product_deltas in deltas.items() if any(product_deltas.values())}
+
 def create_pro_review(user, product_id, data):
     """
     Create a product review for a specific product by a user and return a response-compatible dict.
@@ -200,59 +339,160 @@ def create_pro_review(user, product_id, data):
     if 'rating' not in data or not isinstance(data['rating'], int):
         raise ValueError("Rating is required and must be an integer")
     
-    review = ProductReview.objects.create(user=user, product=product, **data)
+    with transaction.atomic():
+        review = ProductReview.objects.create(user=user, product=product, **data)
+        if review.is_approved:
+            apply_rating_deltas(product.id, review_rating_deltas(after=(review.is_approved, review.rating)))
+            notify_products_changed([product.id])
     
     # Return a dict matching ProductReviewResponse
     return review
 
-def get_product_reviews(product_id=None, user=None):
+# Columns read by ProductReviewSerializer; the author is joined in rather
+# than fetched per row.
+REVIEW_FEED_FIELDS = (
+    'id', 'product_id', 'rating', 'review_text', 'created_at', 'updated_at', 'is_approved', 'user__username',
+)
+
+def get_product_reviews(product_id=None, user=None, approved_only=False):
     """
-    Retrieve product reviews, optionally filtered by product_id or user, returning a list of dicts.
+    Retrieve product reviews, optionally filtered by product_id or user.
+
+    The queryset is left unordered and unevaluated so that the caller can
+    paginate it with CreatedAtCursorPagination.
     """
-    queryset = ProductReview.objects.all()
+    queryset = ProductReview.objects.select_related('user').only(*REVIEW_FEED_FIELDS)
     if product_id:
         queryset = queryset.filter(product_id=product_id)
     if user:
         queryset = queryset.filter(user=user)
-    
-    return queryset  # Convert QuerySet to list
+    if approved_only:
+        queryset = queryset.filter(is_approved=True)
+    return queryset
     
 def update_product_review(review_id, user, data):
-    review = ProductReview.objects.filter(id=review_id, user=user).first()
-    if not review:
-        raise ValueError("Review not found or unauthorized")
-    for key, value in data.items():
-        setattr(review, key, value)
-    review.save()
+    with transaction.atomic():
+        review = ProductReview.objects.select_for_update().filter(id=review_id, user=user).first()
+        if not review:
+            raise ValueError("Review not found or unauthorized")
+        before = (review.is_approved, review.rating)
+        for key, value in data.items():
+            setattr(review, key, value)
+        review.save()
+        if apply_review_rating_changes([(review.product_id, before, (review.is_approved, review.rating))]):
+            notify_products_changed([review.product_id])
     return review
 
 def delete_product_review(review_id, user):
-    review = ProductReview.objects.filter(id=review_id, user=user).first()
-    if not review:
-        raise ValueError("Review not found or unauthorized")
-    review.delete()
+    with transaction.atomic():
+        review = ProductReview.objects.select_for_update().filter(id=review_id, user=user).first()
+        if not review:
+            raise ValueError("Review not found or unauthorized")
+        review.delete()
+        if apply_review_rating_changes([(review.product_id, (review.is_approved, review.rating), None)]):
+            notify_products_changed([review.product_id])
     return True
 
+def get_moderation_queue():
+    """Reviews that have been neither approved nor rejected yet."""
+    return get_product_reviews().filter(is_approved=False, moderated_at__isnull=True)
+
+def moderate_reviews(review_ids, approve: bool):
+    """
+    Approve or reject many reviews at once.
+
+    The reviews are flipped with one ``UPDATE ... WHERE id IN``, the rating
+    summaries are adjusted once per affected product and a single
+    ``products_changed`` notification covers all of them.
+
+    :param review_ids: Ids of the reviews to moderate
+    :param approve: True to approve, False to reject
+    :return: ``(reviews updated, ids of products whose ratings changed)``
+    """
+    review_ids = list(set(review_ids))
+    with transaction.atomic():
+        reviews = list(
+            ProductReview.objects.select_for_update().filter(id__in=review_ids)
+            .values_list('product_id', 'is_approved', 'rating')
+        )
+        now = timezone.now()
+        updated = ProductReview.objects.filter(id__in=review_ids).update(
+            is_approved=approve, moderated_at=now, updated_at=now
+        )
+        product_ids = apply_review_rating_changes(
+            (product_id, (is_approved, rating), (approve, rating)) for product_id, is_approved, rating in reviews
+        )
+        notify_products_changed(product_ids)
+    return updated, product_ids
+
+def rebuild_product_ratings() -> int:
+    """
+    Recompute every product's rating summary from the approved reviews with
+    one grouped query.
+
+    :return: The number of products that have approved reviews
+    """
+    buckets = {f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating, _ in RATING}
+    rows = (
+        ProductReview.objects.filter(is_approved=True)
+        .values('product_id')
+        .annotate(rating_count=Count('id'), rating_sum=Sum('rating'), **buckets)
+    )
+    fields = ['rating_count', 'rating_sum', *buckets]
+    rated = 0
+    with transaction.atomic():
+        Product.objects.update(**{field: 0 for field in fields})
+        # Stream the aggregate (a server-side cursor on Postgres) so memory
+        # stays flat however many products have reviews.
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            batch.append(Product(id=row.pop('product_id'), **row))
+            if len(batch) == 500:
+                Product.objects.bulk_update(batch, fields)
+                rated += len(batch)
+                batch = []
+        Product.objects.bulk_update(batch, fields)
+        rated += len(batch)
+    return rated
+
 
-from django.conf import settings
 from .models import MpesaTransaction
 
-def generate_mpesa_access_token():
+def mpesa_url(path):
+    return getattr(settings, 'MPESA_API_BASE_URL', 'https://sandbox.safaricom.co.ke').rstrip('/') + path
+
+_mpesa_session = None
+
+def mpesa_session() -> requests.Session:
     """
-    Generate an access token for M-Pesa API using Consumer Key and Secret.
+    Process-wide session, so that consecutive Daraja calls (and warm Lambda
+    invocations) reuse open connections. Created on first use, after any fork.
     """
+    global _mpesa_session
+    if _mpesa_session is None:
+        _mpesa_session = requests.Session()
+    return _mpesa_session
+
+def mpesa_timeout():
+    return getattr(settings, 'MPESA_HTTP_TIMEOUT', 30)
+
+def mpesa_credentials_header():
     consumer_key = settings.MPESA_CONSUMER_KEY
     consumer_secret = settings.MPESA_CONSUMER_SECRET
     credentials = f"{consumer_key}:{consumer_secret}"
     encoded_credentials = base64.b64encode(credentials.encode()).decode('utf-8')
-    
-    url = 'https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials'
-    headers = {
+    return {
         'Authorization': f'Basic {encoded_credentials}',
     }
-    
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
+
+def generate_mpesa_access_token():
+    """
+    Generate an access token for M-Pesa API using Consumer Key and Secret.
+    """
+    url = mpesa_url('/oauth/v1/generate?grant_type=client_credentials')
+    with track_mpesa("oauth"):
+        response = mpesa_session().get(url, headers=mpesa_credentials_header(), timeout=mpesa_timeout())
+        response.raise_for_status()
     return response.json()['access_token']
 
 def generate_mpesa_password(business_shortcode, passkey, timestamp):
@@ -262,17 +502,14 @@ def generate_mpesa_password(business_shortcode, passkey, timestamp):
     password = f"{business_shortcode}{passkey}{timestamp}"
     return base64.b64encode(password.encode()).decode('utf-8')
 
-def initiate_mpesa_stk_push(order: Order, phone_number: str, amount: float, callback_url: str):
-    """
-    Initiate an M-Pesa STK Push request for a given order and create an MpesaTransaction record.
-    """
+def build_stk_push_payload(order: Order, phone_number: str, amount: float, callback_url: str):
     business_shortcode = settings.MPESA_BUSINESS_SHORTCODE
     passkey = settings.MPESA_PASSKEY
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
     
     password = generate_mpesa_password(business_shortcode, passkey, timestamp)
     
-    payload = {
+    return {
         "BusinessShortCode": business_shortcode,
         "Password": password,
         "Timestamp": timestamp,
@@ -285,23 +522,45 @@ def initiate_mpesa_stk_push(order: Order, phone_number: str, amount: float, call
         "AccountReference": f"Order_{order.id}",
         "TransactionDesc": f"Payment for Order {order.id}"
     }
-    
+
+def build_stk_query_payload(checkout_request_id):
+    business_shortcode = settings.MPESA_BUSINESS_SHORTCODE
+    passkey = settings.MPESA_PASSKEY
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    password = generate_mpesa_password(business_shortcode, passkey, timestamp)
+    return {
+        "BusinessShortCode": business_shortcode,
+        "Password": password,
+        "Timestamp": timestamp,
+        "CheckoutRequestID": checkout_request_id["checkout_request_id"],
+    }
+
+def initiate_mpesa_stk_push(order: Order, phone_number: str, amount: float, callback_url: str):
+    """
+    Initiate an M-Pesa STK Push request for a given order and create an MpesaTransaction record.
+    """
+    payload = build_stk_push_payload(order, phone_number, amount, callback_url)
     access_token = generate_mpesa_access_token()
-    url = 'https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
     headers = {
         'Content-Type': 'application/json',
         'Authorization': f'Bearer {access_token}',
     }
     
-    response = requests.post(url, json=payload, headers=headers)
-    response.text.encode('utf-8')
-    print(response, "mpesa response")
-
-    
+    with track_mpesa("stkpush"):
+        response = mpesa_session().post(mpesa_url('/mpesa/stkpush/v1/processrequest'), json=payload,
+                                        headers=headers, timeout=mpesa_timeout())
+    if not response.ok:
+        MPESA_ERRORS.labels("stkpush").inc()
     mpesa_response = response.json()
-    print(mpesa_response, 'mpesa response')
-    
-    # Create or update MpesaTransaction
+    logger.info(
+        "STK push for order %s returned HTTP %s", order.id, response.status_code,
+        extra={"mpesa_response": mpesa_response},
+    )
+    record_stk_push(order, phone_number, amount, mpesa_response)
+    return mpesa_response
+
+def record_stk_push(order: Order, phone_number: str, amount: float, mpesa_response):
+    """Create or update the order's MpesaTransaction from an STK push response."""
     checkout_session, _ = CheckoutSession.objects.get_or_create(order=order)
     mpesa_transaction, created = MpesaTransaction.objects.get_or_create(
         order=order,
@@ -326,10 +585,7 @@ def initiate_mpesa_stk_push(order: Order, phone_number: str, amount: float, call
         mpesa_transaction.amount = amount
         mpesa_transaction.status = 'pending'
         mpesa_transaction.save()
-
-     # Update the checkout_session's mpesa_receipt_number with the checkout_request_id
-    
-    return mpesa_response
+    return mpesa_transaction
 
 from asgiref.sync import sync_to_async
 
@@ -339,7 +595,7 @@ def process_mpesa_callback(callback_data):
     Process the M-Pesa callback data and update the MpesaTransaction and related Order.
     """
     try:
-        print(callback_data)
+        logger.info("M-Pesa callback received", extra={"callback": callback_data})
         stk_callback = callback_data['Body']['stkCallback']
         checkout_request_id = stk_callback['CheckoutRequestID']
         result_code = stk_callback['ResultCode']
@@ -362,11 +618,14 @@ def process_mpesa_callback(callback_data):
             order = mpesa_transaction.order
             checkout_session = CheckoutSession.objects.get(order=order)
 
-            print(checkout_session, 'checkout_session')
-            print(checkout_session.mpesa_receipt_number, 'checkout_session.mpesa_receipt_number')
-            print(checkout_request_id, 'checkout_request_id')
+            logger.debug(
+                "Callback for checkout %s (session %s, recorded receipt %s)",
+                checkout_request_id, checkout_session.pk, checkout_session.mpesa_receipt_number,
+            )
 
             if checkout_session.mpesa_receipt_number == checkout_request_id:
+                # fastapi takes half a second to import; only pay for it here.
+                from fastapi import HTTPException
                 raise HTTPException(status_code=400, detail="Callback already processed")
 
             if result_code == 0:
@@ -393,6 +652,7 @@ def process_mpesa_callback(callback_data):
         
         return {'status': 'success', 'message': 'Callback processed successfully'}
     except Exception as e:
+        logger.warning("Could not process M-Pesa callback", exc_info=True)
         return {'status': 'error', 'message': str(e)}
     
 
@@ -400,31 +660,100 @@ def process_mpesa_query(checkout_request_id):
     """
     Check the status of a Lipa Na M-Pesa Online Payment.
     """
-    business_shortcode = settings.MPESA_BUSINESS_SHORTCODE
-    passkey = settings.MPESA_PASSKEY
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-
     try:
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        password = generate_mpesa_password(business_shortcode, passkey, timestamp)
-        
-        CheckoutRequestID = checkout_request_id["checkout_request_id"]
-        payload = {
-            "BusinessShortCode": business_shortcode,
-            "Password": password,
-            "Timestamp": timestamp,
-            "CheckoutRequestID": CheckoutRequestID,
-        }
-        
+        payload = build_stk_query_payload(checkout_request_id)
         access_token = generate_mpesa_access_token()
-        url = 'https://sandbox.safaricom.co.ke/mpesa/stkpushquery/v1/query'
         headers = {
             'Authorization': f'Bearer {access_token}',
         }
         
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
+        with track_mpesa("stkpush_query"):
+            response = mpesa_session().post(mpesa_url('/mpesa/stkpushquery/v1/query'),
+                                            json=payload, headers=headers, timeout=mpesa_timeout())
+            response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
         return {'status': 'error', 'message': str(e)}
 
+
+# Async counterparts used by aeroplane.async_views when served over ASGI.
+
+def with_listing_prefetches(queryset):
+    """Prefetch everything ProductSerializer reads, so serializing runs no queries."""
+    return queryset.prefetch_related(
+        'p_images',
+        Prefetch('holiday_deals', queryset=HolidayDeal.objects.filter(is_active=True), to_attr='active_holiday_deals'),
+    )
+
+async def aget_products(ordering=None) -> List[Product]:
+    return [product async for product in with_listing_prefetches(order_products(Product.objects.all(), ordering))]
+
+async def aget_product(product_id: int) -> Optional[Product]:
+    return await with_listing_prefetches(Product.objects.filter(id=product_id)).afirst()
+
+async def aget_products_by_category(category_id: int, ordering=None) -> List[Product]:
+    queryset = order_products(Product.objects.filter(category_id=category_id), ordering)
+    return [product async for product in with_listing_prefetches(queryset)]
+
+async def aget_active_holiday_deals() -> List[HolidayDeal]:
+    queryset = HolidayDeal.objects.filter(is_active=True).annotate(product_count=Count('products'))
+    return [deal async for deal in queryset]
+
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_mpesa_client() -> httpx.AsyncClient:
+    """
+    The running event loop's pooled client. Concurrent requests share its
+    keep-alive connections to Daraja instead of each opening their own.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(timeout=mpesa_timeout())
+    return client
+
+async def agenerate_mpesa_access_token():
+    client = get_async_mpesa_client()
+    with track_mpesa("oauth"):
+        response = await client.get(mpesa_url('/oauth/v1/generate?grant_type=client_credentials'),
+                                    headers=mpesa_credentials_header())
+        response.raise_for_status()
+    return response.json()['access_token']
+
+async def ainitiate_mpesa_stk_push(order: Order, phone_number: str, amount: float, callback_url: str):
+    """Async initiate_mpesa_stk_push; the event loop is free while Daraja responds."""
+    payload = build_stk_push_payload(order, phone_number, amount, callback_url)
+    access_token = await agenerate_mpesa_access_token()
+    headers = {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {access_token}',
+    }
+    client = get_async_mpesa_client()
+    with track_mpesa("stkpush"):
+        response = await client.post(mpesa_url('/mpesa/stkpush/v1/processrequest'), json=payload, headers=headers)
+    if not response.is_success:
+        MPESA_ERRORS.labels("stkpush").inc()
+    mpesa_response = response.json()
+    logger.info(
+        "STK push for order %s returned HTTP %s", order.id, response.status_code,
+        extra={"mpesa_response": mpesa_response},
+    )
+    await sync_to_async(record_stk_push)(order, phone_number, amount, mpesa_response)
+    return mpesa_response
+
+async def aprocess_mpesa_query(checkout_request_id):
+    """Async process_mpesa_query."""
+    try:
+        payload = build_stk_query_payload(checkout_request_id)
+        access_token = await agenerate_mpesa_access_token()
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+        }
+        client = get_async_mpesa_client()
+        with track_mpesa("stkpush_query"):
+            response = await client.post(mpesa_url('/mpesa/stkpushquery/v1/query'), json=payload, headers=headers)
+            response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        # Transport errors often have an empty message.
+        return {'status': 'error', 'message': str(e) or type(e).__name__}
@@ -0,0 +1,153 @@
+"""
+Logging plumbing used by the ``LOGGING`` setting.
+
+Records are handed to ``QueueingHandler``, which only puts them on an
+in-memory queue; a ``QueueListener`` thread formats them as JSON lines and
+writes them out, so request threads never wait on log I/O. Every record
+carries the current request's correlation id (set by
+``aeroplane.middleware.RequestIdMiddleware``)
+and payment fields are masked before a record leaves the calling thread.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+REDACTED = "[redacted]"
+# Compared case-insensitively against dict keys, ``extra`` names and the
+# names of Daraja callback items.
+SENSITIVE_FIELDS = frozenset(name.lower() for name in (
+    "password", "passkey", "access_token", "refresh_token", "Authorization",
+    "PhoneNumber", "phone_number", "phone", "PartyA", "PartyB",
+    "MpesaReceiptNumber", "mpesa_receipt_number",
+))
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def redact(value):
+    """
+    Return a copy of ``value`` with sensitive keys masked, recursing into
+    dicts and lists. Daraja's ``{"Name": ..., "Value": ...}`` callback items
+    are masked by name as well.
+    """
+    if isinstance(value, dict):
+        if isinstance(value.get("Name"), str) and value["Name"].lower() in SENSITIVE_FIELDS and "Value" in value:
+            return {**value, "Value": REDACTED}
+        return {
+            key: REDACTED if isinstance(key, str) and key.lower() in SENSITIVE_FIELDS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    return value
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class RedactingFilter(logging.Filter):
+    """Masks sensitive fields in a record's arguments and ``extra`` values."""
+
+    def filter(self, record):
+        if isinstance(record.args, (dict, tuple)) and record.args:
+            record.args = redact(record.args)
+        for key, value in vars(record).items():
+            if key in _RECORD_ATTRS:
+                continue
+            if key.lower() in SENSITIVE_FIELDS:
+                setattr(record, key, REDACTED)
+            elif isinstance(value, (dict, list, tuple)):
+                setattr(record, key, redact(value))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class QueueingHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a queue drained by a background ``QueueListener`` that
+    writes them to ``stream``. The formatter configured for this handler is
+    applied by the listener thread, so the caller only pays for merging the
+    message arguments. The listener is restarted in forked children (e.g.
+    gunicorn workers with ``preload_app``) and flushed at exit.
+    """
+
+    def __init__(self, stream=None, maxsize=10_000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self._start_listener()
+        atexit.register(self._stop_listener)
+        if hasattr(os, "register_at_fork"):
+            # Threads do not survive fork(); give each child its own writer.
+            os.register_at_fork(after_in_child=self._start_listener)
+
+    def _start_listener(self):
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def _stop_listener(self):
+        # Drains the queue before returning.
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            # Tracebacks hold frames; render them now, while they are valid.
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Drop rather than block the request when the writer falls behind.
+            pass
+
+    def close(self):
+        self._stop_listener()
+        super().close()
@@ -1,5 +1,31 @@
+"""
+WSGI application (``application``) and AWS Lambda handler (``handler``, see
+serverless.yml). ASGI servers use aeroplane.asgi.
+
+Everything is set up at import time. On Lambda that happens once per
+execution environment, during the init phase; warm invocations then reuse
+the loaded URLconf, the event loop with its pooled Daraja client, and the
+database connections (see "Deploying to AWS Lambda" in the README). Run
+``manage.py coldstart_report`` to see what the import costs.
+"""
 import os
+
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aeroplane.settings")
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Import the views now rather than on the first request.
+get_resolver().url_patterns
+
+try:
+    from mangum import Mangum
+except ImportError:  # only needed on Lambda
+    handler = None
+else:
+    from aeroplane.asgi import application as asgi_application
+
+    # The lifespan startup only warms caches (aeroplane.warmup), which would
+    # lengthen the init phase of every new execution environment.
+    handler = Mangum(asgi_application, lifespan="off")
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+
+from aeroplane import crud
+from aeroplane.throttling import local_buckets
+from users.models import User
+
+# Requests per user, below the mpesa_query_user burst.
+REQUESTS_PER_USER = 25
+
+
+class StubDarajaHandler(BaseHTTPRequestHandler):
+    """Answers the OAuth and STK query calls after ``server.latency`` seconds."""
+
+    protocol_version = "HTTP/1.1"
+
+    def reply(self, body):
+        time.sleep(self.server.latency)
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self.reply({"access_token": "bench-token", "expires_in": "3599"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.reply({
+            "ResponseCode": "0", "ResponseDescription": "The service request has been accepted successfully",
+            "MerchantRequestID": "bench", "CheckoutRequestID": body.get("CheckoutRequestID", ""),
+            "ResultCode": "0", "ResultDesc": "The service request is processed successfully.",
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubDarajaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def expect_ok(response, path):
+    if response.status_code != 200:
+        raise CommandError(f"{path} failed: {response.status_code} {response.content[:200]!r}")
+
+
+def summarize(name, workers, timings, elapsed):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, math.ceil(len(timings) * 0.95) - 1)]
+    return (
+        f"{name}: {len(timings) / elapsed:8.1f} req/s with {workers:>3} {'threads' if name == 'WSGI' else 'tasks  '}  "
+        f"p50 {statistics.median(timings) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare /api/query-mpesa/ under a WSGI thread pool with /api/async/query-mpesa/ under ASGI, "
+        "against a local Daraja stub with a fixed response latency, on a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--latency", type=float, default=0.5, help="Stub Daraja latency per call, in seconds.")
+        parser.add_argument("--threads", type=int, default=8, help="WSGI worker threads (e.g. gunicorn --threads).")
+        parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight on the ASGI event loop.")
+
+    def handle(self, *args, requests, latency, threads, concurrency, **options):
+        if requests < 1:
+            raise CommandError("--requests must be positive")
+        server = StubDarajaServer(("127.0.0.1", 0), StubDarajaHandler)
+        server.latency = latency
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(MPESA_API_BASE_URL=base_url):
+                users = User.objects.bulk_create(
+                    User(username=f"bench{i}", email=f"bench{i}@example.com")
+                    for i in range(math.ceil(requests / REQUESTS_PER_USER))
+                )
+                headers = [
+                    {"Authorization": f"Bearer {AccessToken.for_user(user)}"} for user in users
+                ]
+                wsgi = self.run_wsgi(requests, threads, headers)
+                asgi = asyncio.run(self.run_asgi(requests, concurrency, headers))
+        finally:
+            server.shutdown()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{requests} M-Pesa status queries, {latency * 1000:.0f} ms per Daraja call (2 per query)")
+        self.stdout.write(summarize("WSGI", threads, *wsgi))
+        self.stdout.write(summarize("ASGI", concurrency, *asgi))
+
+    def run_wsgi(self, requests, threads, headers):
+        local_buckets.clear()
+        path = "/api/query-mpesa/"
+
+        def call(i):
+            start = time.perf_counter()
+            try:
+                response = Client(headers=headers[i % len(headers)]).post(
+                    path, {"checkout_request_id": f"ws_{i}"}, content_type="application/json"
+                )
+            finally:
+                # As at the end of a real request; worker threads must not
+                # keep connections to the test database open.
+                connections.close_all()
+            expect_ok(response, path)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            timings = list(pool.map(call, range(requests)))
+        return timings, time.perf_counter() - start
+
+    async def run_asgi(self, requests, concurrency, headers):
+        local_buckets.clear()
+        path = "/api/async/query-mpesa/"
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await AsyncClient().post(
+                    path, {"checkout_request_id": f"ws_{i}"}, content_type="application/json",
+                    headers=headers[i % len(headers)],
+                )
+                expect_ok(response, path)
+                return time.perf_counter() - start
+
+        try:
+            start = time.perf_counter()
+            timings = await asyncio.gather(*(call(i) for i in range(requests)))
+            return timings, time.perf_counter() - start
+        finally:
+            await crud.get_async_mpesa_client().aclose()
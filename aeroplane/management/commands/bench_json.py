@@ -0,0 +1,69 @@
+import io
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from aeroplane.models import Product
+from aeroplane.parsers import ORJSONParser
+from aeroplane.renderers import ORJSONRenderer, orjson
+from aeroplane.views import ProductViewSet
+
+CODECS = {
+    "stdlib json": (JSONRenderer(), JSONParser()),
+    "orjson": (ORJSONRenderer(), ORJSONParser()),
+}
+
+
+def measure(func, rounds):
+    """``(fastest seconds, median seconds, peak traced bytes)`` of calling ``func``."""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), statistics.median(timings), peak
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare render and parse time and peak memory of the stdlib and orjson codecs on the "
+        "/api/products/ response of the current database (seed one with seed_perf)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=5)
+
+    def handle(self, *args, rounds, **options):
+        if orjson is None:
+            raise CommandError("orjson is not installed")
+        count = Product.objects.count()
+        if not count:
+            raise CommandError("There are no products; seed a catalog with `manage.py seed_perf` first")
+
+        # Serialize once; only the encoding step differs between codecs.
+        response = ProductViewSet.as_view({"get": "list"})(APIRequestFactory().get("/api/products/"))
+        data = response.data
+        body = JSONRenderer().render(data)
+        self.stdout.write(f"/api/products/: {count} products, {len(body) / 1e6:.1f} MB of JSON, {rounds} rounds")
+
+        for name, (renderer, parser) in CODECS.items():
+            for action, func in (
+                ("render", lambda: renderer.render(data, "application/json", {})),
+                ("parse", lambda: parser.parse(io.BytesIO(body), "application/json", {})),
+            ):
+                fastest, median, peak = measure(func, rounds)
+                self.stdout.write(
+                    f"{name:>12} {action:<6}  fastest {fastest * 1000:8.1f} ms  median {median * 1000:8.1f} ms  "
+                    f"peak {peak / 1e6:7.1f} MB"
+                )
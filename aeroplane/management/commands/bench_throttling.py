@@ -0,0 +1,48 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from aeroplane.throttling import CacheBucketStore, LocalBucketStore, LoginIPThrottle, LoginUserThrottle
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead of the token bucket throttles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100_000)
+        parser.add_argument("--clients", type=int, default=1000, help="Distinct clients to rotate through.")
+
+    def handle(self, *args, iterations, clients, **options):
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(clients):
+            request = Request(
+                factory.post(
+                    "/users/login/", {"username": f"user{i}"}, format="json",
+                    REMOTE_ADDR=f"10.0.{i // 256}.{i % 256}",
+                ),
+                parsers=[JSONParser()],
+            )
+            request.user = AnonymousUser()
+            request.data  # DRF has parsed the body by the time throttles run
+            requests.append(request)
+
+        for name, store in (("local", LocalBucketStore()), ("cache", CacheBucketStore())):
+            throttles = [
+                type(cls.__name__, (cls,), {"get_store": lambda self: store})
+                for cls in (LoginIPThrottle, LoginUserThrottle)
+            ]
+            start = time.perf_counter()
+            for i in range(iterations):
+                request = requests[i % clients]
+                for throttle_class in throttles:
+                    throttle_class().allow_request(request, None)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{name:>5} store: {elapsed / iterations * 1e6:.2f} us per request "
+                f"({len(throttles)} throttles, {iterations} requests, {clients} clients)"
+            )
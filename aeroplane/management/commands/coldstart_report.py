@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MARKER = "COLDSTART "
+
+# Runs in a fresh interpreter: imports the Lambda handler the way the init
+# phase does, then serves one request through it.
+CHILD = f"""
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aeroplane.settings")
+from aeroplane.main import handler
+loaded = time.perf_counter()
+if handler is None:
+    sys.exit("mangum is not installed")
+response = handler(json.loads(sys.argv[1]), None)
+done = time.perf_counter()
+print({MARKER!r} + json.dumps({{
+    "init_ms": (loaded - start) * 1000,
+    "first_request_ms": (done - loaded) * 1000,
+    "status": response["statusCode"],
+}}), flush=True)
+"""
+
+
+def http_api_event(path):
+    """A minimal API Gateway HTTP API (payload 2.0) GET event."""
+    path, _, query = path.partition("?")
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": {"host": "localhost", "user-agent": "coldstart-report"},
+        "requestContext": {
+            "http": {"method": "GET", "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+            "stage": "$default",
+        },
+        "isBase64Encoded": False,
+    }
+
+
+def parse_importtime(stderr):
+    """``(module, self_us, cumulative_us, depth)`` for each line ``-X importtime`` wrote."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        modules.append((stripped, int(fields[0]), int(fields[1]), (len(name) - len(stripped)) // 2))
+    return modules
+
+
+def by_package(modules):
+    totals = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Report how long a cold start of aeroplane.main.handler takes (imports, setup and one request) "
+        "and which packages and modules the imports spend it on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget-ms", type=float, default=getattr(settings, "COLD_START_BUDGET_MS", 2000),
+                            help="Fail when init plus the first request takes longer.")
+        parser.add_argument("--path", default="/metrics", help="Path of the first request.")
+        parser.add_argument("--top", type=int, default=15)
+
+    def handle(self, *args, budget_ms, path, top, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "aeroplane.settings"))
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD, json.dumps(http_api_event(path))],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        lines = [line for line in result.stdout.splitlines() if line.startswith(MARKER)]
+        if result.returncode or not lines:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+            raise CommandError("Cold start failed:\n" + "\n".join(errors[-20:]))
+        timing = json.loads(lines[-1][len(MARKER):])
+        modules = parse_importtime(result.stderr)
+
+        self.stdout.write(f"Slowest packages ({len(modules)} modules imported, self time):")
+        for package, self_us in by_package(modules)[:top]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} ms  {package}")
+        self.stdout.write("Slowest modules (self time, cumulative):")
+        for name, self_us, cumulative_us, _ in sorted(modules, key=lambda m: m[1], reverse=True)[:top]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms  {name}")
+
+        total = timing["init_ms"] + timing["first_request_ms"]
+        self.stdout.write(
+            f"init {timing['init_ms']:.0f} ms + first request to {path} (HTTP {timing['status']}) "
+            f"{timing['first_request_ms']:.0f} ms = {total:.0f} ms; budget {budget_ms:.0f} ms"
+        )
+        if total > budget_ms:
+            raise CommandError(f"Cold start of {total:.0f} ms is over the {budget_ms:.0f} ms budget")
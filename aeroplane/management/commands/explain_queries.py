@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from aeroplane.models import HolidayDeal, Product
+from aeroplane.querylog import ENDPOINTS, capture, endpoint_context, explain, sequential_scans
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the benchmark endpoint queries with EXPLAIN (SQLite or Postgres) and report the "
+        "sequential scans left. Run it on a seeded database (seed_perf)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", action="append", choices=list(ENDPOINTS), dest="endpoints",
+                            help="Only these endpoints (repeatable; default all).")
+        parser.add_argument("--log", type=Path,
+                            help="Replay this query log instead of capturing one from the endpoints.")
+        parser.add_argument("--save-log", type=Path, help="Write the captured query log here.")
+        parser.add_argument("--ignore", action="append", default=[], metavar="TABLE",
+                            help="Tables whose full scans are expected (repeatable).")
+        parser.add_argument("--plans", action="store_true", help="Print every plan, not only the scans.")
+        parser.add_argument("--strict", action="store_true", help="Fail if any sequential scan is left.")
+
+    def handle(self, *args, endpoints, log, save_log, ignore, plans, strict, **options):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            raise CommandError(f"EXPLAIN is not supported on {connection.vendor}")
+        if log:
+            entries = [entry for entry in json.loads(log.read_text())
+                       if not endpoints or entry["endpoint"] in endpoints]
+        else:
+            entries = self.capture(endpoints)
+        if save_log:
+            save_log.write_text(json.dumps(entries, indent=2, default=str) + "\n")
+            self.stdout.write(f"Wrote {len(entries)} statements to {save_log}")
+
+        remaining = 0
+        for entry in entries:
+            plan = explain(entry["sql"], entry["params"])
+            scans = [(table, detail) for table, detail in sequential_scans(plan)
+                     if table not in ignore]
+            remaining += len(scans)
+            if not scans and not plans:
+                continue
+            self.stdout.write(f"\n[{entry['endpoint']}] x{entry['count']}  {entry['sql'][:200]}")
+            for _, detail in scans:
+                self.stdout.write(self.style.WARNING(f"  {detail}"))
+            if plans:
+                lines = plan if connection.vendor == "sqlite" else json.dumps(plan, indent=2).splitlines()
+                for line in lines:
+                    self.stdout.write(f"    {line}")
+
+        summary = f"{len(entries)} statements, {remaining} sequential scans"
+        if remaining and strict:
+            raise CommandError(summary)
+        self.stdout.write(f"\n{summary}")
+
+    def capture(self, endpoints):
+        if not Product.objects.exists():
+            raise CommandError("There are no products; seed a catalog with `manage.py seed_perf` first")
+        user = User.objects.annotate(orders=Count("order")).order_by("-orders", "id").first()
+        deal = HolidayDeal.objects.order_by("-is_active", "id").first()
+        return capture(endpoint_context(user, deal), endpoints)
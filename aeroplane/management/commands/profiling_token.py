@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from aeroplane.profiling import MODES, make_profile_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed X-Profile header value that makes the API profile a request."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES, default="cprofile")
+
+    def handle(self, *args, mode, **options):
+        token = make_profile_token(mode)
+        max_age = getattr(settings, "PROFILING_TOKEN_MAX_AGE", 3600)
+        self.stdout.write(token)
+        self.stderr.write(f"Valid for {max_age}s. Send it as: -H 'X-Profile: {token}'")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from aeroplane.crud import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute every product's rating summary from its approved reviews."
+
+    def handle(self, *args, **options):
+        rated = rebuild_product_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating summaries ({rated} products with approved reviews)"))
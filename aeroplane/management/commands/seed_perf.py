@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from aeroplane.seeding import PerfSeeder
+
+
+def image_size(value):
+    width, _, height = value.lower().partition("x")
+    try:
+        return int(width), int(height or width)
+    except ValueError:
+        raise CommandError(f"Invalid image size {value!r}; expected WIDTHxHEIGHT")
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate a deterministic synthetic catalog and order history for performance testing. "
+        "Run it against a dedicated database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument("--tags", type=int, default=200)
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument("--images-per-product", type=int, default=3)
+        parser.add_argument("--deals", type=int, default=20)
+        parser.add_argument("--products-per-deal", type=int, default=100)
+        parser.add_argument("--carts", type=int, default=2_000)
+        parser.add_argument("--orders", type=int, default=20_000)
+        parser.add_argument("--reviews", type=int, default=50_000)
+        parser.add_argument("--chunk-size", type=int, default=5_000, help="Rows per bulk insert and transaction.")
+        parser.add_argument(
+            "--image-size", type=image_size, action="append", dest="image_sizes",
+            help="Synthetic image size as WIDTHxHEIGHT; repeat for several (default 320x320, 800x800, 1600x1200).",
+        )
+        parser.add_argument("--images-per-size", type=int, default=4, help="Distinct image files per size.")
+        parser.add_argument(
+            "--anchor", type=datetime.fromisoformat,
+            help="Date the generated history ends at (ISO format, default today). Fix it to reproduce a dataset exactly.",
+        )
+
+    def handle(self, *args, seed, chunk_size, image_sizes, images_per_size, anchor, **options):
+        if anchor is not None and anchor.tzinfo is None:
+            anchor = anchor.replace(tzinfo=timezone.utc)
+        kwargs = {"image_sizes": image_sizes} if image_sizes else {}
+        seeder = PerfSeeder(
+            seed=seed, chunk_size=chunk_size, anchor=anchor, images_per_size=images_per_size,
+            log=self.stdout.write, **kwargs,
+        )
+        counts = {
+            name: options[name]
+            for name in ("products", "categories", "tags", "users", "images_per_product", "deals",
+                         "products_per_deal", "carts", "orders", "reviews")
+        }
+        try:
+            seeder.run(**counts)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Seeded dataset {seed}"))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from aeroplane import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Preload the catalog caches (categories, active deals, the hottest product details) and the "
+        "image cache of this process within a time budget, and report what was warmed. The shared "
+        "cache tier stays warm for the workers that start afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget", type=float, default=None,
+                            help=f"Seconds to spend at most (default WARMUP_BUDGET, {settings.WARMUP_BUDGET}).")
+        parser.add_argument("--workers", type=int, default=None,
+                            help=f"Threads to warm with (default WARMUP_WORKERS, {settings.WARMUP_WORKERS}).")
+
+    def handle(self, *args, budget, workers, **options):
+        if budget is not None and budget <= 0:
+            raise CommandError("--budget must be positive")
+        state = warmup.warm(budget=budget, workers=workers)
+        for name, task in state["tasks"].items():
+            outcome = f"{task['count']:6d}" if task["ok"] else f"stopped: {task['error']}"
+            self.stdout.write(f"{name:<14} {task['seconds'] * 1000:9.1f} ms  {outcome}")
+        self.stdout.write(f"{state['status']} in {state['finished'] - state['started']:.1f}s")
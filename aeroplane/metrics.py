@@ -0,0 +1,83 @@
+"""
+Prometheus metrics for the API.
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set in the environment (before the workers
+start) every gunicorn worker writes its samples to that directory and
+``/metrics`` aggregates them, whichever worker serves the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route",
+    ["route", "method"],
+)
+RESPONSES = Counter(
+    "http_responses_total",
+    "Responses by route and status code",
+    ["route", "method", "status"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Duration of individual SQL queries",
+    ["database"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Number of SQL queries run by a request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"],
+)
+IMAGE_ENCODE_BYTES = Counter(
+    "image_encode_bytes_total",
+    "Bytes of base64 image data produced for API responses",
+)
+MPESA_LATENCY = Histogram(
+    "mpesa_request_duration_seconds",
+    "Latency of M-Pesa (Daraja) API calls",
+    ["endpoint"],
+)
+MPESA_ERRORS = Counter(
+    "mpesa_request_errors_total",
+    "Failed M-Pesa (Daraja) API calls",
+    ["endpoint"],
+)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+@contextmanager
+def track_mpesa(endpoint):
+    """Time a Daraja call and count it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        MPESA_ERRORS.labels(endpoint).inc()
+        raise
+    finally:
+        MPESA_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+
+
+def render_metrics():
+    """Return ``(body, content_type)`` in the Prometheus text format."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
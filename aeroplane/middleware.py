@@ -0,0 +1,361 @@
+import logging
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from types import SimpleNamespace
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from . import compression, profiling
+from .log import _request_id
+from .metrics import DB_QUERIES_PER_REQUEST, DB_QUERY_LATENCY, REQUEST_LATENCY, RESPONSES
+from .routers import _pinned_to_primary
+
+logger = logging.getLogger("aeroplane.queries")
+profile_logger = logging.getLogger("aeroplane.profiling")
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so
+    that async views are not pushed into a thread by a sync-only layer.
+
+    Subclasses implement ``around(request, result)``, a context manager
+    wrapping the rest of the chain; ``result.response`` is set when the
+    block body completes and may be replaced after the ``yield``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def around(self, request, result):
+        raise NotImplementedError(".around() must be overridden")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        result = SimpleNamespace(response=None)
+        with contextmanager(self.around)(request, result):
+            result.response = self.get_response(request)
+        return result.response
+
+    async def __acall__(self, request):
+        result = SimpleNamespace(response=None)
+        with contextmanager(self.around)(request, result):
+            result.response = await self.get_response(request)
+        return result.response
+
+
+# Query observers of the current request. Under ASGI the ORM runs in
+# asgiref's worker threads, which have their own connections, so wrapping
+# the request thread's connections would see nothing; every connection
+# instead runs observe_queries, which reads this context variable, and
+# asgiref copies the context into the thread it runs sync code in.
+_query_observers = ContextVar("aeroplane_query_observers", default=())
+
+
+def observe_queries(execute, sql, params, many, context):
+    """``execute_wrapper`` installed on every connection, calling the request's observers."""
+    for observer in reversed(_query_observers.get()):
+        execute = partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def install_query_observers(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``observe_queries`` to each connection once."""
+    if observe_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(observe_queries)
+
+
+@contextmanager
+def observing_queries(observer):
+    """Pass every query run for the current request, in any thread, through ``observer``."""
+    token = _query_observers.set((*_query_observers.get(), observer))
+    try:
+        yield
+    finally:
+        _query_observers.reset(token)
+
+
+class RequestIdMiddleware(HybridMiddleware):
+    """
+    Assigns each request a correlation id, taken from a well-formed
+    ``X-Request-ID`` header (e.g. set by the load balancer) or generated,
+    exposes it to log records and echoes it in the response.
+    """
+
+    def around(self, request, result):
+        request_id = request.META.get("HTTP_X_REQUEST_ID", "")
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        token = _request_id.set(request_id)
+        try:
+            yield
+        finally:
+            _request_id.reset(token)
+        result.response["X-Request-ID"] = request_id
+
+
+class PrimaryPinningMiddleware(HybridMiddleware):
+    """
+    Starts every request unpinned, so that reads go back to the replicas
+    after a previous request on the same thread wrote to the primary.
+    """
+
+    def around(self, request, result):
+        token = _pinned_to_primary.set(False)
+        try:
+            yield
+        finally:
+            _pinned_to_primary.reset(token)
+
+
+class NPlusOneError(AssertionError):
+    """Raised in strict mode when one query shape repeats too often in a request."""
+
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+def query_fingerprint(sql):
+    # Django hands execute wrappers the parameterised SQL, so only IN lists
+    # of different lengths need collapsing for equal shapes to compare equal.
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts and times every query it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[query_fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > threshold]
+
+
+class QueryInspectorMiddleware(HybridMiddleware):
+    """
+    Records the SQL count, total database time and repeated query shapes of
+    each request when ``QUERY_INSPECTOR_ENABLED`` is set.
+
+    The numbers are returned as a ``Server-Timing`` header and logged to
+    ``aeroplane.queries``. Any query shape that runs more than
+    ``QUERY_INSPECTOR_REPEAT_THRESHOLD`` times is reported as a likely N+1,
+    and with ``QUERY_INSPECTOR_STRICT`` it raises NPlusOneError instead so
+    that tests fail.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_INSPECTOR_ENABLED", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.threshold = getattr(settings, "QUERY_INSPECTOR_REPEAT_THRESHOLD", 5)
+        self.strict = getattr(settings, "QUERY_INSPECTOR_STRICT", False)
+
+    def around(self, request, result):
+        recorder = QueryRecorder()
+        with observing_queries(recorder):
+            yield
+
+        response = result.response
+        repeated = recorder.repeated(self.threshold)
+        response["Server-Timing"] = ", ".join(filter(None, [
+            response.get("Server-Timing"),
+            f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"',
+        ]))
+        logger.info(
+            "%s %s ran %d queries in %.2fms", request.method, request.path, recorder.count, recorder.duration * 1000,
+            extra={
+                "path": request.path,
+                "method": request.method,
+                "status": response.status_code,
+                "db_queries": recorder.count,
+                "db_time_ms": round(recorder.duration * 1000, 2),
+                "repeated_queries": len(repeated),
+            },
+        )
+        for sql, count in repeated:
+            message = f"Possible N+1 on {request.method} {request.path}: query ran {count} times: {sql[:300]}"
+            if self.strict:
+                raise NPlusOneError(message)
+            logger.warning(message, extra={"path": request.path, "fingerprint": sql, "repeat_count": count})
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Feeds the request, status and per-query metrics in aeroplane.metrics.
+    Routes are labelled by URL name (e.g. ``product-list``) to keep the
+    label set small.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def around(self, request, result):
+        queries = 0
+
+        def observe_query(execute, sql, params, many, context):
+            nonlocal queries
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries += 1
+                DB_QUERY_LATENCY.labels(context["connection"].alias).observe(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with observing_queries(observe_query):
+            yield
+        elapsed = time.perf_counter() - start
+
+        response = result.response
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else "unmatched"
+        REQUEST_LATENCY.labels(route, request.method).observe(elapsed)
+        RESPONSES.labels(route, request.method, str(response.status_code)).inc()
+        DB_QUERIES_PER_REQUEST.labels(route).observe(queries)
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """
+    Compresses responses with the best encoding the client accepts (see
+    aeroplane.compression). Bodies under ``COMPRESSION_MIN_SIZE`` bytes,
+    content types outside ``COMPRESSION_CONTENT_TYPES`` and paths under
+    ``COMPRESSION_EXCLUDE_PATHS`` are sent unchanged. Streaming responses
+    are compressed chunk by chunk as they are sent.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "COMPRESSION_ENABLED", True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+        self.content_types = tuple(getattr(settings, "COMPRESSION_CONTENT_TYPES", ("application/json", "text/")))
+        self.exclude_paths = tuple(getattr(settings, "COMPRESSION_EXCLUDE_PATHS", ()))
+
+    def compressible(self, request, response):
+        if response.status_code < 200 or response.status_code in (204, 304) or response.has_header("Content-Encoding"):
+            return False
+        content_type = response.get("Content-Type", "").partition(";")[0].strip().lower()
+        if not content_type.startswith(self.content_types) or request.path.startswith(self.exclude_paths):
+            return False
+        if response.streaming:
+            length = response.get("Content-Length")
+            return length is None or not length.isdigit() or int(length) >= self.min_size
+        return len(response.content) >= self.min_size
+
+    def around(self, request, result):
+        yield
+        response = result.response
+        if not self.compressible(request, response):
+            return
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = compression.negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compression.compress_stream(response.streaming_content, encoding)
+            if response.has_header("Content-Length"):
+                del response.headers["Content-Length"]
+        else:
+            compressed = compression.compress_body(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The bytes differ from the uncompressed representation, so a strong
+        # validator would be wrong; keep it as a weak one.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+
+
+class RequestProfilingMiddleware(HybridMiddleware):
+    """
+    Profiles requests that carry a valid ``X-Profile`` token, plus a random
+    ``PROFILING_SAMPLE_RATE`` share of all requests, and stores the result
+    with aeroplane.profiling. The profile id is returned in the
+    ``X-Profile-Id`` header. Other requests only pay for a header lookup.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.default_mode = getattr(settings, "PROFILING_MODE", "sample")
+
+    def around(self, request, result):
+        token = request.META.get("HTTP_X_PROFILE")
+        if token is not None:
+            mode = profiling.read_profile_token(token)
+        elif self.sample_rate and random.random() < self.sample_rate:
+            mode = self.default_mode
+        else:
+            mode = None
+        if mode is None:
+            yield
+            return
+
+        # Under ASGI the profilers watch the event loop thread, so other
+        # requests running concurrently on it appear in the profile too.
+        start = time.perf_counter()
+        timeline = profiling.SqlTimeline(start)
+        with observing_queries(timeline):
+            profiler, sampler = profiling.start_profiler(mode)
+            try:
+                yield
+            finally:
+                profiling.stop_profiler(profiler, sampler)
+        elapsed = time.perf_counter() - start
+
+        response = result.response
+        try:
+            profile_id = profiling.save_profile({
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "mode": mode,
+                "duration_ms": round(elapsed * 1000, 3),
+                "sql": timeline.queries,
+            }, profiler=profiler, sampler=sampler)
+        except OSError:
+            profile_logger.exception("Could not store profile for %s %s", request.method, request.path)
+        else:
+            response["X-Profile-Id"] = profile_id
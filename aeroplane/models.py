@@ -83,8 +83,24 @@ class Product(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(null=True, blank=True)
 
+    # Summary of approved reviews, maintained with F() deltas by the review
+    # code paths (see crud.apply_rating_deltas) and rebuilt by the
+    # rebuild_product_ratings command.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name_plural = "Products"
+        indexes = [
+            # The ranked feeds (aeroplane.ranking) read the published products,
+            # newest first for the featured and new-arrival ones.
+            models.Index(fields=['product_status', '-date', '-id'], name='product_status_date_idx'),
+        ]
 
     def product_image(self):
         return mark_safe('<img src="%s" width="50" height="50" />' % (self.image.url))
@@ -96,6 +112,16 @@ class Product(models.Model):
         new_price = (self.price / self.old_price) * 100
         return new_price
 
+    @property
+    def rating_average(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 2)
+
+    @property
+    def rating_histogram(self):
+        return [self.rating_1, self.rating_2, self.rating_3, self.rating_4, self.rating_5]
+
 
 class ProductImages(models.Model):
     images = models.ImageField(upload_to="product-images", default="product.jpg")
@@ -114,6 +140,12 @@ class Cart(models.Model):
     class Meta:
         verbose_name = "Cart"
         verbose_name_plural = "Carts"
+        indexes = [
+            # crud.get_or_create_cart and create_order look up the active cart.
+            # Boolean filters compile to a bare `WHERE is_active` on SQLite,
+            # which only a partial index on the same condition can serve.
+            models.Index(fields=['user'], name='cart_user_active_idx', condition=models.Q(is_active=True)),
+        ]
 
     def __str__(self):
         return f"Cart for {self.user.username if self.user else 'Guest'}"
@@ -152,6 +184,12 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # A user's order history, newest first.
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.user.username}"
 
@@ -186,6 +224,25 @@ class ProductReview(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_approved = models.BooleanField(default=False)  # Optional: admin approval for reviews
+    moderated_at = models.DateTimeField(null=True, blank=True, editable=False)  # Set once approved or rejected
+
+    class Meta:
+        indexes = [
+            # Keyset feeds in crud.get_product_reviews, newest first.
+            models.Index(fields=['product', 'is_approved', 'created_at'], name='review_product_feed_idx'),
+            models.Index(fields=['user', 'created_at'], name='review_user_feed_idx'),
+            # The public feed; the index above can't serve its bare
+            # `is_approved` term on SQLite.
+            models.Index(
+                fields=['product', '-created_at', '-id'], name='review_product_approved_idx',
+                condition=models.Q(is_approved=True),
+            ),
+            # Only reviews still waiting for moderation are indexed.
+            models.Index(
+                fields=['created_at'], name='review_moderation_queue_idx',
+                condition=models.Q(is_approved=False, moderated_at__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Review by {self.user.username} for {self.product.title} ({self.rating} stars)"
@@ -215,6 +272,10 @@ class MpesaTransaction(models.Model):
     class Meta:
         verbose_name = "M-Pesa Transaction"
         verbose_name_plural = "M-Pesa Transactions"
+        indexes = [
+            # The admin status filter, and pending payments oldest first.
+            models.Index(fields=['status', 'created_at'], name='mpesa_status_created_idx'),
+        ]
 
 class HolidayDeal(models.Model):
     # Unique identifier for the deal
@@ -252,6 +313,10 @@ class HolidayDeal(models.Model):
         verbose_name = "Holiday Deal"
         verbose_name_plural = "Holiday Deals"
         ordering = ['-start_date']
+        indexes = [
+            # Active deals in the default ordering.
+            models.Index(fields=['-start_date'], name='deal_active_start_idx', condition=models.Q(is_active=True)),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.discount_percentage}% off)"
@@ -0,0 +1,254 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries a valid ``X-Profile`` header (a token
+from ``make_profile_token``, see the ``profiling_token`` command) or when it
+is picked by ``PROFILING_SAMPLE_RATE``. The view then runs under cProfile or
+under a wall-clock stack sampler, and the result is written to
+``PROFILING_DIR`` under a random profile id along with the request's SQL
+timeline:
+
+``<id>.json``
+    metadata and SQL timeline
+``<id>.pstats``
+    cProfile data (cprofile mode only), loadable with ``pstats.Stats`` or
+    snakeviz
+``<id>.speedscope.json``
+    sampled flame graph for https://www.speedscope.app
+"""
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core import signing
+
+MODES = ("cprofile", "sample")
+TOKEN_SALT = "aeroplane.profiling"
+FORMATS = {
+    "pstats": (".pstats", "application/octet-stream"),
+    "speedscope": (".speedscope.json", "application/json"),
+}
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def profile_dir():
+    return _setting("PROFILING_DIR", os.path.join(settings.BASE_DIR, "profiles"))
+
+
+def make_profile_token(mode="cprofile"):
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode {mode!r}")
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign_object({"mode": mode})
+
+
+def read_profile_token(token):
+    """Return the profiling mode a token asks for, or None if it is invalid or expired."""
+    try:
+        payload = signing.TimestampSigner(salt=TOKEN_SALT).unsign_object(
+            token, max_age=_setting("PROFILING_TOKEN_MAX_AGE", 3600)
+        )
+    except signing.BadSignature:
+        return None
+    mode = payload.get("mode") if isinstance(payload, dict) else None
+    return mode if mode in MODES else None
+
+
+class SqlTimeline:
+    """``execute_wrapper`` recording when each query started and how long it took."""
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            self.queries.append({
+                "start_ms": round((start - self.origin) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+                "database": context["connection"].alias,
+                "sql": sql,
+                "many": many,
+            })
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler for one thread. A daemon thread snapshots
+    the target thread's stack every ``interval`` seconds, so the profiled
+    code runs at full speed and time spent waiting on the database or the
+    network shows up too.
+    """
+
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(tuple(stack))
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _speedscope(name, stacks, weights, unit):
+    """Build a speedscope "sampled" profile from stacks of ``(name, file, line)`` frames."""
+    frames = []
+    index = {}
+    samples = []
+    for stack in stacks:
+        sample = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            sample.append(index[frame])
+        samples.append(sample)
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled", "name": name, "unit": unit,
+            "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights,
+        }],
+        "exporter": "aeroplane.profiling",
+    }
+
+
+def sampler_to_speedscope(sampler, name):
+    return _speedscope(name, sampler.samples, [sampler.interval] * len(sampler.samples), "seconds")
+
+
+def save_profile(meta, profiler, sampler):
+    """
+    Write a finished profile and return its id. ``meta`` describes the
+    request and carries the SQL timeline; ``profiler`` is the disabled
+    ``cProfile.Profile`` or None in sampling mode.
+    """
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    base = os.path.join(directory, profile_id)
+    name = f"{meta['method']} {meta['path']}"
+
+    if profiler is not None:
+        pstats.Stats(profiler).dump_stats(base + FORMATS["pstats"][0])
+    with open(base + FORMATS["speedscope"][0], "w") as f:
+        json.dump(sampler_to_speedscope(sampler, name), f)
+
+    meta = dict(meta, id=profile_id, created_at=datetime.now(timezone.utc).isoformat(),
+                formats=[fmt for fmt, (suffix, _) in FORMATS.items() if os.path.exists(base + suffix)])
+    # The metadata file goes last: a profile is listed only once complete.
+    with open(base + ".json", "w") as f:
+        json.dump(meta, f)
+    prune_profiles(_setting("PROFILING_MAX_PROFILES", 200))
+    return profile_id
+
+
+def _meta_paths():
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    paths = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith(".json") and not name.endswith(".speedscope.json")
+    ]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def list_profiles():
+    """Metadata of stored profiles, newest first, without their SQL timelines."""
+    profiles = []
+    for path in _meta_paths():
+        try:
+            with open(path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta["sql_queries"] = len(meta.pop("sql", []))
+        profiles.append(meta)
+    return profiles
+
+
+def _is_profile_id(profile_id):
+    return len(profile_id) == 32 and all(c in "0123456789abcdef" for c in profile_id)
+
+
+def get_profile(profile_id):
+    if not _is_profile_id(profile_id):
+        return None
+    try:
+        with open(os.path.join(profile_dir(), profile_id + ".json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def profile_file(profile_id, fmt):
+    """Path of one stored format of a profile, or None if there is no such file."""
+    if not _is_profile_id(profile_id) or fmt not in FORMATS:
+        return None
+    path = os.path.join(profile_dir(), profile_id + FORMATS[fmt][0])
+    return path if os.path.exists(path) else None
+
+
+def prune_profiles(keep):
+    for path in _meta_paths()[keep:]:
+        base = path[:-len(".json")]
+        for suffix in [".json"] + [suffix for suffix, _ in FORMATS.values()]:
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def start_profiler(mode):
+    """
+    Start profiling the current thread; returns ``(profiler, sampler)``.
+
+    The stack sampler always runs since cProfile keeps no call stacks to
+    build a flame graph from; in "cprofile" mode its timings include
+    cProfile's own overhead.
+    """
+    sampler = StackSampler(_setting("PROFILING_SAMPLE_INTERVAL", 0.001))
+    sampler.start()
+    if mode == "sample":
+        return None, sampler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler, sampler
+
+
+def stop_profiler(profiler, sampler):
+    if profiler is not None:
+        profiler.disable()
+    sampler.stop()
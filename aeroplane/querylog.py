@@ -0,0 +1,176 @@
+"""
+Query logs of the benchmark endpoints and their ``EXPLAIN`` plans.
+
+``ENDPOINTS`` is the request set of the endpoint benchmarks
+(``tests/test_benchmarks.py``). ``capture()`` replays it against the
+current database inside a rolled-back transaction, with empty caches, and
+returns every distinct statement with one example of its parameters: the
+query log the indexes in ``aeroplane.models`` were chosen from. ``explain()``
+asks SQLite (``EXPLAIN QUERY PLAN``) or Postgres (``EXPLAIN (FORMAT JSON)``)
+how it would run one of them, and ``sequential_scans()`` picks out the
+tables it would read from end to end.
+
+The ``explain_queries`` command puts them together. A plan depends on the
+table sizes and statistics, so run it on a seeded database (``seed_perf``),
+``ANALYZE``d on Postgres.
+"""
+import json
+import re
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .caching import TieredCache
+from .middleware import query_fingerprint
+from .throttling import local_buckets
+
+
+def fill_cart(ctx):
+    from .models import Cart
+
+    cart, _ = Cart.objects.get_or_create(user=ctx["user"], is_active=True)
+    cart.items.all().delete()
+    for product_id in ctx["product_ids"][:3]:
+        cart.items.create(product_id=product_id, quantity=2)
+
+
+# name -> (method, path template, body, authenticated, per-round setup)
+ENDPOINTS = {
+    "product_list": ("get", "/api/products/", None, False, None),
+    "product_detail": ("get", "/api/products/{product_id}/", None, False, None),
+    "products_by_category": ("get", "/api/products/category/{category_id}/", None, False, None),
+    "cart_add": ("post", "/api/cart/", {"product_id": "{product_id}", "quantity": 1}, True, None),
+    "cart_list": ("get", "/api/cart/", None, True, fill_cart),
+    "order_create": ("post", "/api/orders/", None, True, fill_cart),
+    "user_orders": ("get", "/api/user/orders/", None, True, None),
+    "product_reviews": ("get", "/api/products/{product_id}/reviews/", None, False, None),
+    "user_reviews": ("get", "/api/users/reviews/", None, True, None),
+    "deal_list": ("get", "/api/holiday-deals/", None, False, None),
+    "deal_products": ("get", "/api/holiday-deals/{deal_id}/products/", None, False, None),
+}
+
+
+def endpoint_context(user, deal):
+    """The values ``ENDPOINTS`` are filled in with, for requests made as ``user``."""
+    from .models import Category, Product
+
+    return {
+        "user": user,
+        "token": str(AccessToken.for_user(user)),
+        "product_ids": list(Product.objects.order_by("id").values_list("id", flat=True)[:10]),
+        "product_id": Product.objects.order_by("-rating_count", "id").values_list("id", flat=True).first(),
+        "category_id": Category.objects.order_by("id").values_list("id", flat=True).first(),
+        "deal_id": deal.deal_id if deal else "none",
+    }
+
+
+def endpoint_caller(ctx, name):
+    """A function making the ``name`` request; it asserts that it succeeds."""
+    method, path, body, authenticated, _ = ENDPOINTS[name]
+    path = path.format(**ctx)
+    if body is not None:
+        body = {key: int(value.format(**ctx)) if isinstance(value, str) else value for key, value in body.items()}
+    client = Client(HTTP_AUTHORIZATION=f"Bearer {ctx['token']}") if authenticated else Client()
+
+    def call():
+        local_buckets.clear()
+        response = getattr(client, method)(path, body, content_type="application/json")
+        assert response.status_code < 400, f"{name}: {response.status_code} {response.content[:200]!r}"
+        return response
+
+    return call
+
+
+class StatementLog:
+    """``execute_wrapper`` keeping the first example of every statement shape."""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        entry = self.statements.setdefault(query_fingerprint(sql), {"sql": sql, "params": params, "count": 0})
+        entry["count"] += 1
+        return execute(sql, params, many, context)
+
+
+def capture(ctx, names=None):
+    """
+    ``[{"endpoint", "sql", "params", "count"}]`` for the SELECT, UPDATE and
+    DELETE statements the endpoints run. Caches are bypassed so that every
+    query runs, and all writes are rolled back.
+    """
+    log = []
+    seen = set()
+    fresh = override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        QUERY_INSPECTOR_ENABLED=False,
+    )
+    with fresh:
+        for name in names or ENDPOINTS:
+            for instance in list(TieredCache.instances):
+                instance.local.clear()
+            statements = StatementLog()
+            with transaction.atomic():
+                setup = ENDPOINTS[name][4]
+                if setup:
+                    setup(ctx)
+                with connection.execute_wrapper(statements):
+                    endpoint_caller(ctx, name)()
+                transaction.set_rollback(True)
+            for fingerprint, entry in statements.statements.items():
+                if fingerprint in seen or not re.match(r"\s*(SELECT|UPDATE|DELETE|WITH)\b", entry["sql"], re.I):
+                    continue
+                seen.add(fingerprint)
+                log.append({"endpoint": name, **entry, "params": list(entry["params"] or ())})
+    return log
+
+
+def explain(sql, params, using=connection):
+    """The plan of one statement: detail lines on SQLite, the JSON plan tree on Postgres."""
+    with using.cursor() as cursor:
+        if using.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+        if using.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            return json.loads(plan) if isinstance(plan, str) else plan
+    raise NotImplementedError(f"EXPLAIN is not supported on {using.vendor}")
+
+
+def _postgres_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _postgres_nodes(child)
+
+
+def _is_partial_index(name, using):
+    with using.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = %s", [name])
+        row = cursor.fetchone()
+    return bool(row and row[0] and re.search(r"\bWHERE\b", row[0], re.I))
+
+
+def sequential_scans(plan, using=connection):
+    """
+    The tables a plan reads in full, as ``(table, detail)`` pairs. On SQLite
+    that is every ``SCAN`` of a table, including one walking a whole index
+    for its order unless the index is partial; on Postgres every ``Seq Scan``
+    node.
+    """
+    if using.vendor == "sqlite":
+        scans = []
+        for line in plan:
+            match = re.match(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", line)
+            if not match or match.group(1) == "CONSTANT":
+                continue
+            if match.group(2) and _is_partial_index(match.group(2), using):
+                continue
+            scans.append((match.group(1), line))
+        return scans
+    return [
+        (node["Relation Name"], f"Seq Scan on {node['Relation Name']} (rows={node.get('Plan Rows')})")
+        for root in plan for node in _postgres_nodes(root["Plan"]) if node["Node Type"] == "Seq Scan"
+    ]
@@ -0,0 +1,160 @@
+"""
+Ranked product feeds kept as precomputed id lists.
+
+Every feed in ``FEEDS`` is the ids of the products that qualify for it, best
+first, stored in ``ranked_cache`` as two compact arrays: the ids
+(``array('q')``) and their sort keys (``array('d')``, ascending). Serving a
+page is a slice of the ids and one ``id__in`` query (see ``ranked_page``),
+so no request sorts the product table.
+
+A saved or deleted product is moved to its new position, or out, of every
+feed once its transaction commits: a bisection on the cached arrays under
+the feed's lock (``TieredCache.update``). A feed missing from the cache is
+built again with one query on first use. Changes that bypass the model
+signals (``QuerySet.update``, ``bulk_create``) must call
+``invalidate_rankings``. ``feed_changed`` tells whatever shows the head of
+a feed (the home page) when to rebuild it.
+"""
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from .caching import TieredCache, invalidate_tags
+
+# Sent with ``feed`` and ``positions``, the (before, after) indexes of a
+# product that moved into, out of or within the cached feed (None where it
+# is absent), or None when the feed was rebuilt and anything may have moved.
+feed_changed = Signal()
+
+FIELDS = ('date', 'price', 'old_price')
+
+
+def _newest(date, price, old_price):
+    return -date.timestamp()
+
+
+def _discount(date, price, old_price):
+    # The smallest price/old_price ratio is the biggest discount.
+    return float(Decimal(price) / Decimal(old_price))
+
+
+# name -> (exact and __gt lookups a product must match, sort key of FIELDS)
+FEEDS = {
+    'featured': ({'featured': True, 'product_status': 'published'}, _newest),
+    'newest': ({'product_status': 'published'}, _newest),
+    'discount': ({'product_status': 'published', 'old_price__gt': 0}, _discount),
+}
+
+ranked_cache = TieredCache("ranking", local_maxsize=len(FEEDS))
+
+
+def _tags(feed):
+    return (f"ranking:{feed}",)
+
+
+def _ttl():
+    return getattr(settings, "RANKED_FEED_TTL", 24 * 60 * 60)
+
+
+def _field_value(product, name):
+    # Saved instances may still hold what was assigned to them (strings from
+    # request data, or the string defaults of the price fields).
+    return product._meta.get_field(name).to_python(getattr(product, name))
+
+
+def _sort_key(feed, product):
+    """The product's key in ``feed``, or None if it does not qualify."""
+    lookups, key = FEEDS[feed]
+    for lookup, expected in lookups.items():
+        name, _, operator = lookup.partition('__')
+        value = _field_value(product, name)
+        if not (value is not None and value > expected if operator == 'gt' else value == expected):
+            return None
+    return key(*(_field_value(product, name) for name in FIELDS))
+
+
+def build_feed(feed):
+    """``(ids, keys)`` of ``feed`` from the database, best first."""
+    from .models import Product
+
+    lookups, key = FEEDS[feed]
+    rows = Product.objects.filter(**lookups).values_list('id', *FIELDS)
+    ranked = sorted((key(*fields), -pk) for pk, *fields in rows.iterator(chunk_size=5000))
+    return array('q', (-negated for _, negated in ranked)), array('d', (sort_key for sort_key, _ in ranked))
+
+
+def ranked_ids(feed):
+    """The ids of ``feed``, best first, as an ``array('q')``; do not modify it."""
+    return ranked_cache.get_or_set(feed, lambda: build_feed(feed), _ttl(), tags=_tags(feed))[0]
+
+
+def ranked_page(ids):
+    """The products of a slice of ``ranked_ids(feed)``, in order, with the listing prefetches."""
+    from .crud import with_listing_prefetches
+    from .models import Product
+
+    products = {product.id: product for product in with_listing_prefetches(Product.objects.filter(id__in=list(ids)))}
+    return [products[pk] for pk in ids if pk in products]
+
+
+def _reposition(pk, sort_key, moved):
+    """
+    A ``TieredCache.update`` change moving ``pk`` to ``sort_key`` (None: out
+    of the feed), which records the product's positions in ``moved``.
+    """
+    def change(value):
+        ids, keys = value
+        try:
+            index = ids.index(pk)
+        except ValueError:
+            if sort_key is None:
+                return value
+            index = None
+        ids, keys = array('q', ids), array('d', keys)
+        if index is not None:
+            del ids[index]
+            del keys[index]
+        at = None
+        if sort_key is not None:
+            at = bisect_left(range(len(ids)), (sort_key, -pk), key=lambda i: (keys[i], -ids[i]))
+            ids.insert(at, pk)
+            keys.insert(at, sort_key)
+        moved.append((index, at))
+        return ids, keys
+    return change
+
+
+def product_changed(sender, instance, **kwargs):
+    # Keys are taken now; the cached feeds change once the rows are visible.
+    removed = kwargs['signal'] is post_delete
+    moves = {feed: None if removed else _sort_key(feed, instance) for feed in FEEDS}
+    pk = instance.pk
+
+    def apply():
+        for feed, sort_key in moves.items():
+            moved = []
+            if ranked_cache.update(feed, _reposition(pk, sort_key, moved), _ttl(), tags=_tags(feed)) is None:
+                feed_changed.send(sender=ranked_cache, feed=feed, positions=None)
+            elif moved:
+                feed_changed.send(sender=ranked_cache, feed=feed, positions=moved[0])
+
+    transaction.on_commit(apply)
+
+
+def invalidate_rankings():
+    """Rebuild every feed on next use, once the current transaction commits."""
+    invalidate_tags(*(tag for feed in FEEDS for tag in _tags(feed)))
+    for feed in FEEDS:
+        feed_changed.send(sender=ranked_cache, feed=feed, positions=None)
+
+
+def connect_signals():
+    from .models import Product
+
+    post_save.connect(product_changed, sender=Product, dispatch_uid="aeroplane.ranking.save")
+    post_delete.connect(product_changed, sender=Product, dispatch_uid="aeroplane.ranking.delete")
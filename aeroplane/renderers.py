@@ -0,0 +1,52 @@
+"""
+A drop-in replacement for DRF's ``JSONRenderer`` built on orjson.
+
+orjson encodes datetimes, dates, times and UUIDs itself, in the same form
+as DRF's ``JSONEncoder`` (ISO 8601, ``Z`` for UTC). Decimals and the other
+types only DRF knows about go through that encoder's ``default``. Without
+orjson, or for output orjson cannot produce (indents other than 2, ASCII-only
+or non-compact output), rendering falls back to the stdlib ``json`` module.
+
+Unlike ``JSONRenderer``, U+2028 and U+2029 are not escaped: JSON has been a
+subset of JavaScript since ES2019, and scanning a multi-megabyte product
+list for them costs as much as encoding it.
+"""
+import decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, decimal.Decimal):
+        # Serializers coerce decimals to strings unless told not to, in which
+        # case DRF renders them as numbers.
+        return float(obj)
+    return _encoder.default(obj)
+
+
+def dumps(data, indent=None):
+    """Encode ``data`` as UTF-8 JSON bytes with orjson; ``indent`` may be None or 2."""
+    option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, default=_default, option=option)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data, indent)
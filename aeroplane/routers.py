@@ -0,0 +1,112 @@
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Models served from replicas, including the auto-created M2M tables.
+CATALOG_MODELS = frozenset({
+    "aeroplane.category",
+    "aeroplane.tag",
+    "aeroplane.product",
+    "aeroplane.product_tags",
+    "aeroplane.productimages",
+    "aeroplane.holidaydeal",
+    "aeroplane.holidaydeal_products",
+})
+
+_pinned_to_primary = ContextVar("aeroplane_pinned_to_primary", default=False)
+
+
+def pin_to_primary():
+    """Send every further read in this request (or context) to the primary."""
+    _pinned_to_primary.set(True)
+
+
+def is_pinned_to_primary():
+    return _pinned_to_primary.get()
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+def replica_lag(alias):
+    """
+    Seconds the replica is behind the primary, or None if it can't be
+    reached. Only Postgres replicas report a real lag.
+    """
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+            )
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        return None
+
+
+class CatalogReplicaRouter:
+    """
+    Routes reads of catalog models to the ``replica*`` databases and
+    everything else to the primary.
+
+    Replicas are picked round-robin, or with ``DB_REPLICA_SELECTION =
+    "least_lag"`` by the lowest lag measured at most every
+    ``DB_REPLICA_LAG_CHECK_INTERVAL`` seconds, skipping any replica further
+    behind than ``DB_REPLICA_MAX_LAG``. Once a request writes anything (or
+    opens a transaction on the primary) its remaining reads stay on the
+    primary so that it reads its own writes; PrimaryPinningMiddleware
+    resets this per request.
+    """
+
+    def __init__(self):
+        self.replicas = replica_aliases()
+        self.selection = getattr(settings, "DB_REPLICA_SELECTION", "round_robin")
+        self.max_lag = getattr(settings, "DB_REPLICA_MAX_LAG", 5.0)
+        self.lag_check_interval = getattr(settings, "DB_REPLICA_LAG_CHECK_INTERVAL", 5.0)
+        self._cycle = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._lags = {}
+        self._lags_checked_at = None
+
+    def db_for_read(self, model, **hints):
+        if (
+            not self.replicas
+            or model._meta.label_lower not in CATALOG_MODELS
+            or _pinned_to_primary.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return self.select_replica()
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def select_replica(self):
+        if self.selection != "least_lag":
+            with self._lock:
+                return next(self._cycle)
+        lags = self.replica_lags()
+        candidates = [(lag, alias) for alias, lag in lags.items() if lag is not None and lag <= self.max_lag]
+        return min(candidates)[1] if candidates else DEFAULT_DB_ALIAS
+
+    def replica_lags(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._lags_checked_at is not None and now - self._lags_checked_at < self.lag_check_interval:
+                return self._lags
+            self._lags_checked_at = now
+        lags = {alias: replica_lag(alias) for alias in self.replicas}
+        self._lags = lags
+        return lags
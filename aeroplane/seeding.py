@@ -0,0 +1,351 @@
+"""
+Deterministic synthetic data for performance work.
+
+``PerfSeeder`` bulk-inserts a catalog (categories, tags, products, images,
+deals) and traffic (users, carts, orders, reviews) in chunked transactions.
+Everything is derived from a single ``random.Random(seed)`` and a fixed
+anchor date, so two runs with the same arguments against empty databases
+produce identical rows. Used by the ``seed_perf`` command and the benchmark
+suite.
+"""
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import islice
+
+import shortuuid
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from users.models import Profile, User
+
+from .conditional import SCOPES, bump_catalog_version
+from .ranking import invalidate_rankings
+from .crud import rebuild_product_ratings
+from .models import (
+    Cart, CartItem, Category, HolidayDeal, Order, OrderItem, Product, ProductImages, ProductReview, Tag
+)
+
+IMAGE_DIR = "seed_perf"
+DEFAULT_IMAGE_SIZES = ((320, 320), (800, 800), (1600, 1200))
+
+ADJECTIVES = ("Fresh", "Organic", "Classic", "Premium", "Everyday", "Compact", "Deluxe", "Smart", "Vintage", "Eco")
+NOUNS = ("Pear", "Shirt", "Kettle", "Backpack", "Headphones", "Sneakers", "Lamp", "Blender", "Jacket", "Watch")
+SIZES = ("S", "M", "L", "XL")
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let ``bulk_create`` store the timestamps we generate instead of "now" by
+    switching off ``auto_now``/``auto_now_add`` on the given models for the
+    duration of the block.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class PerfSeeder:
+    """
+    :param seed: seeds every random choice, including the short UUIDs
+    :param chunk_size: rows per ``bulk_create`` and per transaction
+    :param anchor: the "present" the generated history leads up to; defaults
+                   to today's midnight (UTC) so reruns on the same day match
+    :param log: optional callable receiving progress lines
+    """
+
+    def __init__(self, seed=0, chunk_size=5000, anchor=None, image_sizes=DEFAULT_IMAGE_SIZES,
+                 images_per_size=4, log=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.anchor = anchor or datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.image_sizes = image_sizes
+        self.images_per_size = images_per_size
+        self.log = log or (lambda message: None)
+        self.prefix = f"p{seed}"
+
+    # Helpers -------------------------------------------------------------
+
+    def short_uuid(self):
+        return shortuuid.encode(uuid.UUID(int=self.rng.getrandbits(128)))
+
+    def past(self, max_days=365):
+        return self.anchor - timedelta(seconds=self.rng.randrange(max_days * 86400))
+
+    def bulk_insert(self, model, rows, label=None):
+        """Insert ``rows`` (an iterable of unsaved instances) chunk by chunk and return their ids."""
+        ids = []
+        start = time.perf_counter()
+        for chunk in chunked(rows, self.chunk_size):
+            with transaction.atomic():
+                ids.extend(obj.pk for obj in model.objects.bulk_create(chunk))
+        if label:
+            self.log(f"{label}: {len(ids)} rows in {time.perf_counter() - start:.2f}s")
+        return ids
+
+    def bulk_insert_plain(self, model, rows, label):
+        """Like ``bulk_insert`` for rows whose ids are not needed (through tables, line items)."""
+        count = 0
+        start = time.perf_counter()
+        for chunk in chunked(rows, self.chunk_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+            count += len(chunk)
+        self.log(f"{label}: {count} rows in {time.perf_counter() - start:.2f}s")
+        return count
+
+    def write_images(self):
+        """
+        Write a pool of ``images_per_size`` noise JPEGs per configured size
+        under ``MEDIA_ROOT/seed_perf`` and return their storage names. Noise
+        compresses poorly, so file sizes resemble real photos.
+        """
+        from PIL import Image
+
+        directory = os.path.join(settings.MEDIA_ROOT, IMAGE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        names = []
+        for width, height in self.image_sizes:
+            for i in range(self.images_per_size):
+                name = f"{IMAGE_DIR}/{self.prefix}_{width}x{height}_{i}.jpg"
+                path = os.path.join(settings.MEDIA_ROOT, name)
+                if not os.path.exists(path):
+                    Image.frombytes("RGB", (width, height), self.rng.randbytes(width * height * 3)).save(
+                        path, "JPEG", quality=85
+                    )
+                else:
+                    # Keep the random stream identical whether or not the files exist.
+                    self.rng.randbytes(width * height * 3)
+                names.append(name)
+        self.log(f"images: {len(names)} files in {directory}")
+        return names
+
+    # Generators ----------------------------------------------------------
+
+    def run(self, products=1000, categories=20, tags=50, users=200, images_per_product=2, deals=10,
+             products_per_deal=50, carts=200, orders=500, reviews=2000):
+        """
+        Generate the whole dataset. Counts are totals except
+        ``images_per_product`` and ``products_per_deal``.
+        """
+        if User.objects.filter(username=f"{self.prefix}u0").exists():
+            raise ValueError(f"Data for seed {self.seed} already exists; use another seed or a fresh database")
+
+        images = self.write_images() if (products and self.image_sizes and self.images_per_size) else ["product.jpg"]
+        user_ids = self.seed_users(users)
+        category_ids = self.seed_categories(categories, images)
+        tag_ids = self.seed_tags(tags)
+        product_ids, prices = self.seed_products(products, user_ids, category_ids, tag_ids, images)
+        self.seed_product_images(product_ids, images, images_per_product)
+        self.seed_deals(deals, product_ids, products_per_deal)
+        self.seed_carts(carts, user_ids, product_ids)
+        self.seed_orders(orders, user_ids, product_ids, prices)
+        self.seed_reviews(reviews, user_ids, product_ids)
+        self.log(f"ratings: {rebuild_product_ratings()} products rated")
+        # Everything above went in with bulk_create.
+        invalidate_rankings()
+        bump_catalog_version(*SCOPES)
+        return {"products": product_ids, "users": user_ids, "categories": category_ids}
+
+    def seed_users(self, count):
+        password = make_password("perf-password", salt=f"{self.prefix}salt")
+        prefix = self.prefix
+
+        def rows():
+            for i in range(count):
+                yield User(
+                    username=f"{prefix}u{i}", email=f"{prefix}u{i}@example.com", password=password,
+                    date_joined=self.past(730),
+                )
+
+        user_ids = self.bulk_insert(User, rows(), "users")
+        # bulk_create skips the post_save handler that normally creates these.
+        self.bulk_insert_plain(Profile, (Profile(user_id=user_id) for user_id in user_ids), "profiles")
+        return user_ids
+
+    def seed_categories(self, count, images):
+        rows = (
+            Category(cid=self.short_uuid(), title=f"{self.rng.choice(NOUNS)} {i}", image=self.rng.choice(images))
+            for i in range(count)
+        )
+        return self.bulk_insert(Category, rows, "categories")
+
+    def seed_tags(self, count):
+        return self.bulk_insert(Tag, (Tag(name=f"{self.prefix}-tag-{i}") for i in range(count)), "tags")
+
+    def seed_products(self, count, user_ids, category_ids, tag_ids, images):
+        rng = self.rng
+        prices = []
+        statuses = ["published"] * 17 + ["in_review", "draft", "disabled"]
+        description = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8 + "</p>"
+
+        def rows():
+            for i in range(count):
+                price = Decimal(rng.randrange(100, 5_000_000)) / 100
+                prices.append(price)
+                date = self.past()
+                yield Product(
+                    pid=self.short_uuid(), sku=self.short_uuid(),
+                    user_id=rng.choice(user_ids) if user_ids else None,
+                    category_id=rng.choice(category_ids) if category_ids else None,
+                    title=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                    image=rng.choice(images), description=description,
+                    price=price, old_price=(price * Decimal(rng.uniform(1.0, 1.6))).quantize(Decimal("0.01")),
+                    stock_count=str(rng.randrange(0, 500)),
+                    product_status=rng.choice(statuses), in_stock=rng.random() > 0.1,
+                    featured=rng.random() < 0.05, date=date, updated=date + timedelta(days=rng.randrange(30)),
+                )
+
+        with explicit_timestamps(Product):
+            product_ids = self.bulk_insert(Product, rows(), "products")
+
+        if tag_ids:
+            Through = Product.tags.through
+            links = (
+                Through(product_id=product_id, tag_id=tag_id)
+                for product_id in product_ids
+                for tag_id in rng.sample(tag_ids, min(len(tag_ids), rng.randrange(0, 4)))
+            )
+            self.bulk_insert_plain(Through, links, "product tags")
+        return product_ids, prices
+
+    def seed_product_images(self, product_ids, images, per_product):
+        rows = (
+            ProductImages(product_id=product_id, images=self.rng.choice(images), date=self.past())
+            for product_id in product_ids
+            for _ in range(per_product)
+        )
+        with explicit_timestamps(ProductImages):
+            self.bulk_insert_plain(ProductImages, rows, "product images")
+
+    def seed_deals(self, count, product_ids, products_per_deal):
+        rng = self.rng
+        deals = []
+        for i in range(count):
+            # Roughly a third each of past, running and upcoming deals.
+            start = self.anchor + timedelta(days=rng.randrange(-60, 30))
+            end = start + timedelta(days=rng.randrange(1, 45))
+            deal = HolidayDeal(
+                deal_id=self.short_uuid(), name=f"{self.prefix} Deal {i}",
+                discount_percentage=Decimal(rng.randrange(5, 70)),
+                start_date=start, end_date=end, created_at=start - timedelta(days=7), updated_at=start,
+            )
+            # bulk_create bypasses save(), which normally maintains is_active;
+            # judge it at the anchor so the same seed gives the same rows.
+            deal.is_active = start <= self.anchor <= end
+            deals.append(deal)
+        with explicit_timestamps(HolidayDeal):
+            deal_ids = self.bulk_insert(HolidayDeal, deals, "holiday deals")
+
+        Through = HolidayDeal.products.through
+        links = (
+            Through(holidaydeal_id=deal_id, product_id=product_id)
+            for deal_id in deal_ids
+            for product_id in rng.sample(product_ids, min(len(product_ids), products_per_deal))
+        )
+        self.bulk_insert_plain(Through, links, "deal products")
+        return deal_ids
+
+    def seed_carts(self, count, user_ids, product_ids):
+        if not (user_ids and product_ids):
+            return []
+        rng = self.rng
+
+        def carts():
+            for i in range(count):
+                created = self.past(90)
+                # The first cart of each user is the active one.
+                yield Cart(user_id=user_ids[i % len(user_ids)], is_active=i < len(user_ids),
+                           created_at=created, updated_at=created)
+
+        with explicit_timestamps(Cart, CartItem):
+            cart_ids = self.bulk_insert(Cart, carts(), "carts")
+            items = (
+                CartItem(cart_id=cart_id, product_id=rng.choice(product_ids), quantity=rng.randrange(1, 4),
+                         size=rng.choice(SIZES), created_at=self.past(90))
+                for cart_id in cart_ids
+                for _ in range(rng.randrange(0, 6))
+            )
+            self.bulk_insert_plain(CartItem, items, "cart items")
+        return cart_ids
+
+    def seed_orders(self, count, user_ids, product_ids, prices):
+        if not (user_ids and product_ids):
+            return 0
+        rng = self.rng
+        created_orders = created_items = 0
+        start = time.perf_counter()
+        for offset in range(0, count, self.chunk_size):
+            # Line items are generated first so that each order's total is known.
+            baskets = []
+            orders = []
+            for _ in range(min(self.chunk_size, count - offset)):
+                basket = []
+                for _ in range(rng.randrange(1, 6)):
+                    index = rng.randrange(len(product_ids))
+                    basket.append((product_ids[index], rng.randrange(1, 4), prices[index], rng.choice(SIZES)))
+                baskets.append(basket)
+                created = self.past()
+                paid = rng.random() < 0.7
+                orders.append(Order(
+                    user_id=rng.choice(user_ids),
+                    status=rng.choice(("processing", "shipped", "delivered")) if paid else "pending",
+                    payment_status="paid" if paid else rng.choice(("unpaid", "failed")),
+                    total_amount=sum(quantity * price for _, quantity, price, _ in basket),
+                    created_at=created, updated_at=created,
+                ))
+            with transaction.atomic(), explicit_timestamps(Order):
+                orders = Order.objects.bulk_create(orders)
+                items = OrderItem.objects.bulk_create(
+                    OrderItem(order_id=order.pk, product_id=product_id, quantity=quantity, price=price, size=size)
+                    for order, basket in zip(orders, baskets)
+                    for product_id, quantity, price, size in basket
+                )
+            created_orders += len(orders)
+            created_items += len(items)
+        self.log(f"orders: {created_orders} rows, {created_items} items in {time.perf_counter() - start:.2f}s")
+        return created_orders
+
+    def seed_reviews(self, count, user_ids, product_ids):
+        if not (user_ids and product_ids):
+            return 0
+        rng = self.rng
+        # Skewed towards good ratings, as real review data is.
+        ratings = (1, 2, 3, 4, 4, 5, 5, 5)
+
+        def rows():
+            for _ in range(count):
+                created = self.past()
+                moderated = rng.random() < 0.9
+                yield ProductReview(
+                    user_id=rng.choice(user_ids), product_id=rng.choice(product_ids),
+                    rating=rng.choice(ratings), review_text="Synthetic review " * rng.randrange(1, 20),
+                    is_approved=moderated and rng.random() < 0.9,
+                    moderated_at=created + timedelta(hours=rng.randrange(1, 72)) if moderated else None,
+                    created_at=created, updated_at=created,
+                )
+
+        with explicit_timestamps(ProductReview):
+            return self.bulk_insert_plain(ProductReview, rows(), "reviews")
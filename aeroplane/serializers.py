@@ -20,16 +20,29 @@ class ProductSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
     holiday_deals = serializers.SerializerMethodField()
     additional_images = ProductImageSerializer(many=True, source='p_images')
+    rating = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = ['id', 'title', 'price', 'old_price', 'category_id', 'description', 
-                  'specifications', 'holiday_deals','type', 'stock_count', 'life', 'image', 'additional_images']
+                  'specifications', 'holiday_deals','type', 'stock_count', 'life', 'image', 'additional_images',
+                  'rating']
+    
+    def get_rating(self, obj):
+        """Approved-review summary; histogram is counts for 1 to 5 stars."""
+        return {
+            'average': obj.rating_average,
+            'count': obj.rating_count,
+            'histogram': obj.rating_histogram,
+        }
     
     def get_holiday_deals(self, obj):
         """Return active holiday deals with discounted price."""
-        active_deals = obj.holiday_deals.filter(is_active=True)
-        if not active_deals.exists():
+        # Set by crud.with_listing_prefetches.
+        active_deals = getattr(obj, 'active_holiday_deals', None)
+        if active_deals is None:
+            active_deals = list(obj.holiday_deals.filter(is_active=True))
+        if not active_deals:
             return None
         deal_data = []
         for deal in active_deals:
@@ -96,11 +109,17 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'total_amount', 'status', 'payment_status', 'created_at', 'items']
 
 class ProductReviewSerializer(serializers.ModelSerializer):
-    user = serializers.CharField(source='user.username')
+    user = serializers.CharField(source='user.username', read_only=True)
 
     class Meta:
         model = ProductReview
         fields = ['id', 'user', 'product', 'rating', 'review_text', 'created_at', 'updated_at', 'is_approved']
+        # The product comes from the URL and approval is a moderation decision.
+        read_only_fields = ['product', 'is_approved']
+
+class ReviewModerationSerializer(serializers.Serializer):
+    review_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    action = serializers.ChoiceField(choices=['approve', 'reject'])
 
 class CheckoutSessionRequestSerializer(serializers.Serializer):
     order_id = serializers.IntegerField()
@@ -132,7 +151,8 @@ class HolidayDealSerializer(serializers.ModelSerializer):
     products = serializers.SerializerMethodField()
 
     def get_products(self, obj):
-      return obj.products.count()
+      count = getattr(obj, 'product_count', None)
+      return obj.products.count() if count is None else count
 
     class Meta:
         model = HolidayDeal
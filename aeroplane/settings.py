@@ -41,20 +41,64 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
         'rest_framework.permissions.AllowAny',
     ),
+    # orjson-backed JSON (aeroplane.renderers/parsers), falling back to the
+    # stdlib json module when orjson is not installed.
+    'DEFAULT_RENDERER_CLASSES': (
+        'aeroplane.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'aeroplane.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Token buckets used by aeroplane.throttling: "5/min" is a burst of 5
+    # refilled at 5 per minute.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '20/min',
+        'login_user': '5/min',
+        'checkout_ip': '20/min',
+        'checkout_user': '5/min',
+        'checkout_phone': '3/min',
+        'mpesa_query_user': '30/min',
+    },
 }
 
+# "local" keeps throttle buckets in process memory; "cache" shares them
+# between workers through THROTTLE_CACHE_ALIAS.
+THROTTLE_BACKEND = os.environ.get("THROTTLE_BACKEND", "local")
+THROTTLE_CACHE_ALIAS = "default"
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    # Rotation and reuse detection are handled by users.tokens' family store.
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenFamilyRefreshSerializer",
 }
 
+# Authenticated users are resolved from a per-process LRU (seconds of TTL)
+# backed by the shared cache; both are invalidated by a per-user version stamp.
+USER_AUTH_CACHE_LOCAL_TTL = 5
+USER_AUTH_CACHE_LOCAL_MAXSIZE = 1024
+USER_AUTH_CACHE_SHARED_TTL = 300
+
+# Seconds clients may reuse a catalog response (products, categories, deals)
+# before revalidating it with its ETag; see aeroplane.conditional.
+CATALOG_CACHE_MAX_AGE = int(os.environ.get("CATALOG_CACHE_MAX_AGE", "60"))
+
 
 MIDDLEWARE = [
+    "aeroplane.middleware.RequestIdMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "aeroplane.middleware.MetricsMiddleware",
+    "aeroplane.middleware.CompressionMiddleware",
+    "aeroplane.middleware.PrimaryPinningMiddleware",
+    "aeroplane.middleware.QueryInspectorMiddleware",
+    "aeroplane.middleware.RequestProfilingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -63,6 +107,77 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Prometheus metrics served at /metrics (see aeroplane.metrics). Set
+# PROMETHEUS_MULTIPROC_DIR to aggregate across gunicorn workers.
+METRICS_ENABLED = True
+
+# Response compression (aeroplane.middleware.CompressionMiddleware). Brotli
+# and zstd are offered when their packages are installed; ties between
+# equally acceptable encodings go to the first listed.
+COMPRESSION_ENABLED = True
+COMPRESSION_ENCODINGS = ("br", "zstd", "gzip")
+COMPRESSION_LEVELS = {"br": 5, "zstd": 3, "gzip": 6}
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = (
+    "application/json", "application/javascript", "application/xml", "image/svg+xml", "text/",
+)
+# Responses carrying credentials stay uncompressed so that their size can't
+# leak them (BREACH).
+COMPRESSION_EXCLUDE_PATHS = ("/users/", "/token/")
+# Per-process cache of compressed bodies, keyed by content; bodies smaller
+# than COMPRESSION_CACHE_MIN_SIZE are simply compressed again.
+COMPRESSION_CACHE_MAX_BYTES = 32 * 1024 * 1024
+COMPRESSION_CACHE_MIN_SIZE = 4096
+
+# Per-request SQL counting and N+1 detection (aeroplane.middleware). A query
+# shape running more than QUERY_INSPECTOR_REPEAT_THRESHOLD times in one request
+# is reported, or raises in strict mode.
+QUERY_INSPECTOR_ENABLED = os.environ.get("QUERY_INSPECTOR_ENABLED", str(DEBUG)).lower() == "true"
+QUERY_INSPECTOR_REPEAT_THRESHOLD = 5
+QUERY_INSPECTOR_STRICT = os.environ.get("QUERY_INSPECTOR_STRICT", "false").lower() == "true"
+
+# Structured logging (aeroplane.log): JSON lines with the request id, written
+# by a background thread. Payment fields are redacted before records are queued.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "request_id": {"()": "aeroplane.log.RequestIdFilter"},
+        "redact": {"()": "aeroplane.log.RedactingFilter"},
+    },
+    "formatters": {
+        "json": {"()": "aeroplane.log.JsonFormatter"},
+    },
+    "handlers": {
+        "queue": {
+            "()": "aeroplane.log.QueueingHandler",
+            "stream": "ext://sys.stdout",
+            "filters": ["request_id", "redact"],
+            "formatter": "json",
+        },
+    },
+    "root": {"handlers": ["queue"], "level": "WARNING"},
+    "loggers": {
+        "aeroplane": {"level": LOG_LEVEL},
+        "users": {"level": LOG_LEVEL},
+        "django": {"level": "INFO"},
+        # Request logging is covered by the metrics and request ids.
+        "django.server": {"level": "WARNING"},
+    },
+}
+
+# On-demand profiling (aeroplane.profiling). Requests with a valid X-Profile
+# token from `manage.py profiling_token`, plus a PROFILING_SAMPLE_RATE share of
+# all requests, are profiled and stored in PROFILING_DIR.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "true").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_MODE = "sample"  # for sampled requests: "sample" or "cprofile"
+PROFILING_SAMPLE_INTERVAL = 0.001
+PROFILING_DIR = os.environ.get("PROFILING_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILING_MAX_PROFILES = 200
+PROFILING_TOKEN_MAX_AGE = 3600
+
 # Remove or comment out the wildcard setting:
 # CORS_ALLOW_ALL_ORIGINS = True
 
@@ -76,6 +191,14 @@ CORS_ALLOW_CREDENTIALS = True
 
 ROOT_URLCONF = "aeroplane.urls"
 
+# aeroplane.main serves WSGI; aeroplane.asgi also serves the async views
+# under /api/async/ (e.g. ``uvicorn aeroplane.asgi:application``).
+ASGI_APPLICATION = "aeroplane.asgi.application"
+
+# Upper bound for Lambda init plus the first request, checked by
+# ``manage.py coldstart_report``.
+COLD_START_BUDGET_MS = 2000
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -92,23 +215,140 @@ TEMPLATES = [
     },
 ]
 
-# DATABASES = {
-#     "default": {
-#         "ENGINE": "django.db.backends.postgresql_psycopg2",
-#         "NAME": "postgres",
-#         "USER": "postgres",
-#         "PASSWORD": os.environ["DB_PASSWORD"],
-#         "HOST": os.environ["DB_HOST"],
-#         "PORT": os.environ["DB_PORT"],
-#     }
-# }
-
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Database profile, chosen with DB_ENGINE ("sqlite" or "postgres").
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "postgres"),
+            "USER": os.environ.get("DB_USER", "postgres"),
+            "PASSWORD": os.environ["DB_PASSWORD"],
+            "HOST": os.environ["DB_HOST"],
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            # Keep connections open between requests and check them before reuse.
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "600")),
+            "CONN_HEALTH_CHECKS": True,
+            # QuerySet.iterator() streams through server-side cursors; these
+            # must be disabled behind a transaction-pooling PgBouncer.
+            "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DB_DISABLE_SERVER_SIDE_CURSORS", "false").lower() == "true",
+            "OPTIONS": {
+                "options": "-c statement_timeout={}".format(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "5000")),
+            },
+        }
     }
-}
+    if os.environ.get("DB_POOL_MAX_SIZE"):
+        # psycopg 3 connection pool shared by the worker's threads. Django
+        # requires persistent connections to be off when pooling.
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ["DB_POOL_MAX_SIZE"]),
+            "timeout": int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        }
+        if os.environ.get("DB_POOL_CHECK", "false").lower() == "true":
+            # Test each connection before handing it out, e.g. after a Lambda
+            # environment was frozen long enough for the server to drop it.
+            from psycopg_pool import ConnectionPool
+
+            DATABASES["default"]["OPTIONS"]["pool"]["check"] = ConnectionPool.check_connection
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # Seconds to wait on a locked database (SQLite's busy timeout).
+                "timeout": 20,
+                # Take the write lock up front instead of failing to upgrade.
+                "transaction_mode": "IMMEDIATE",
+                # Run on every new connection, so that several local workers
+                # can read while one writes.
+                "init_command": "PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;PRAGMA mmap_size=134217728;",
+            },
+        }
+    }
+
+# Read replicas for catalog traffic: comma-separated hosts for Postgres, or
+# database files for SQLite. Each becomes a "replica_<n>" alias and
+# aeroplane.routers.CatalogReplicaRouter sends catalog reads to them.
+DB_REPLICAS = [replica for replica in os.environ.get("DB_REPLICAS", "").split(",") if replica]
+for index, replica in enumerate(DB_REPLICAS, start=1):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        ("HOST" if DB_ENGINE == "postgres" else "NAME"): replica,
+    }
+DATABASE_ROUTERS = ["aeroplane.routers.CatalogReplicaRouter"] if DB_REPLICAS else []
+# "round_robin" or "least_lag"; replicas more than DB_REPLICA_MAX_LAG seconds
+# behind are skipped by least_lag.
+DB_REPLICA_SELECTION = os.environ.get("DB_REPLICA_SELECTION", "round_robin")
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_LAG_CHECK_INTERVAL = 5.0
+
+# The shared tier of aeroplane.caching, and where version stamps, throttle
+# buckets and the auth cache live. It must be shared by every worker: Redis
+# in production (REDIS_URL; needs the redis package), otherwise a file cache
+# (CACHE_DIR) that all processes on one machine see, or the database cache
+# (CACHE_BACKEND=db, after `manage.py createcachetable`). On Lambda the code
+# directory is read-only, so the file cache defaults to /tmp there.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "redis" if os.environ.get("REDIS_URL") else "file")
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+            "TIMEOUT": 300,
+        }
+    }
+elif CACHE_BACKEND == "db":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "aeroplane_cache",
+            "TIMEOUT": 300,
+            "OPTIONS": {"MAX_ENTRIES": 50_000},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get(
+                "CACHE_DIR",
+                "/tmp/aeroplane-cache" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else BASE_DIR / ".cache",
+            ),
+            "TIMEOUT": 300,
+            "OPTIONS": {"MAX_ENTRIES": 10_000},
+        }
+    }
+
+# aeroplane.caching: how long a request waits for another one to compute a
+# missing key, and how long that computation may hold the key's lock.
+TIERED_CACHE_LOCK_WAIT = 5
+TIERED_CACHE_LOCK_TIMEOUT = 30
+# Catalog responses kept in the shared tier (seconds), after which they are
+# served stale for CATALOG_CACHE_STALE_TTL more while one request refreshes
+# them. Edits invalidate them at once through tags.
+CATALOG_CACHE_TTL = int(os.environ.get("CATALOG_CACHE_TTL", "600"))
+CATALOG_CACHE_STALE_TTL = int(os.environ.get("CATALOG_CACHE_STALE_TTL", "60"))
+CATALOG_CACHE_LOCAL_MAXSIZE = 256
+# /api/home/: products per section, and top products shown per active deal.
+HOME_SECTION_SIZE = 12
+HOME_DEAL_PRODUCTS = 4
+# aeroplane.ranking: how long a ranked product feed is kept (seconds). Product
+# saves patch the cached feeds, so this only bounds drift from bulk changes.
+RANKED_FEED_TTL = int(os.environ.get("RANKED_FEED_TTL", str(24 * 60 * 60)))
+# Per-process cache of base64-encoded product images (aeroplane.crud).
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# aeroplane.warmup: fill the caches above when a worker boots ("off",
+# "block" to finish before serving, or "background"), for at most
+# WARMUP_BUDGET seconds. Keep the budget under gunicorn's worker timeout.
+WARMUP_ON_BOOT = os.environ.get("WARMUP_ON_BOOT", "off")
+WARMUP_BUDGET = float(os.environ.get("WARMUP_BUDGET", "20"))
+WARMUP_WORKERS = 4
+WARMUP_PRODUCTS = 50
 
 LANGUAGE_CODE = "en-us"
 
@@ -234,4 +474,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MPESA_CONSUMER_KEY = 'cABGtLC4JVhPnmC6JS45Xq3c1kG0leaevikPNIKMrDSAGC6K'
 MPESA_CONSUMER_SECRET = '7w3q3BpOG2bnQR4gQxfh83irqQJnVooatM0DwSeqikSXhaNicCwcqnfsFDFk6HwN'
 MPESA_BUSINESS_SHORTCODE = '174379'
-MPESA_PASSKEY = 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919'
\ No newline at end of file
+MPESA_PASSKEY = 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919'
+# Daraja endpoint; point it at a stub to benchmark or test without the sandbox.
+MPESA_API_BASE_URL = os.environ.get("MPESA_API_BASE_URL", "https://sandbox.safaricom.co.ke")
+MPESA_CALLBACK_URL = "https://admin.mohacollection.co.ke/mpesa-callback/"
+MPESA_HTTP_TIMEOUT = 30
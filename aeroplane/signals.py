@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.dispatch import Signal
+
+# Sent once per committed change with ``product_ids``: the set of products
+# whose cached representations are stale.
+products_changed = Signal()
+
+
+def notify_products_changed(product_ids):
+    product_ids = frozenset(product_ids)
+    if not product_ids:
+        return
+    from .models import Product
+    transaction.on_commit(lambda: products_changed.send(sender=Product, product_ids=product_ids))
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import httpx
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, Client
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from aeroplane import crud
+from aeroplane.middleware import QueryRecorder, RequestIdMiddleware
+from aeroplane.models import Category, HolidayDeal, Product
+from aeroplane.throttling import local_buckets
+from users.models import User
+
+
+@pytest.fixture
+def catalog():
+    category = Category.objects.create(title="Shoes")
+    products = [Product.objects.create(title=f"Shoe {i}", category=category, price=100 + i) for i in range(4)]
+    now = timezone.now()
+    deal = HolidayDeal.objects.create(
+        name="Idd Special", discount_percentage=10, start_date=now - timedelta(days=1), end_date=now + timedelta(days=1)
+    )
+    deal.products.set(products[:2])
+    return category, products
+
+
+def get_async(path, **extra):
+    return async_to_sync(AsyncClient().get)(path, **extra)
+
+
+def test_middleware_runs_natively_for_async_chains():
+    async def view(request):
+        return HttpResponse()
+
+    middleware = RequestIdMiddleware(view)
+    assert iscoroutinefunction(middleware)
+    assert async_to_sync(middleware)(Client().request().wsgi_request)["X-Request-ID"]
+    assert not iscoroutinefunction(RequestIdMiddleware(lambda request: HttpResponse()))
+
+
+@pytest.mark.django_db
+def test_async_catalog_matches_sync_views(catalog):
+    category, products = catalog
+    for sync_path, async_path in [
+        ("/api/products/", "/api/async/products/"),
+        ("/api/products/?ordering=rating", "/api/async/products/?ordering=rating"),
+        (f"/api/products/{products[0].id}/", f"/api/async/products/{products[0].id}/"),
+        (f"/api/products/category/{category.id}/", f"/api/async/products/category/{category.id}/"),
+        ("/api/holiday-deals/", "/api/async/holiday-deals/"),
+    ]:
+        expected = Client().get(sync_path)
+        response = get_async(async_path)
+        assert response.status_code == expected.status_code == 200
+        assert response.json() == expected.json(), async_path
+        assert response["X-Request-ID"]
+
+
+@pytest.mark.django_db
+def test_async_product_list_prefetches(catalog):
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        assert len(get_async("/api/async/products/").json()) == 4
+    assert recorder.count == 3
+
+
+@pytest.mark.django_db
+def test_async_catalog_not_found():
+    assert get_async("/api/async/products/999/").status_code == 404
+    assert get_async("/api/async/products/category/999/").json() == {"detail": "No products found for this category"}
+
+
+@pytest.fixture
+def daraja():
+    """Route the async M-Pesa client of the test's event loop to a fake Daraja."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path == "/oauth/v1/generate":
+            return httpx.Response(200, json={"access_token": "token"})
+        body = json.loads(request.content)
+        return httpx.Response(200, json={
+            "ResponseCode": "0", "ResponseDescription": "Accepted", "MerchantRequestID": "m-1",
+            "CheckoutRequestID": body["CheckoutRequestID"], "ResultCode": "0", "ResultDesc": "Paid",
+        })
+
+    async def install():
+        # async_to_sync starts a new loop per call; run this inside each one.
+        crud._async_clients[asyncio.get_running_loop()] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    crud._async_clients.clear()
+    local_buckets.clear()
+    yield calls, install
+    crud._async_clients.clear()
+
+
+@pytest.mark.django_db
+def test_async_mpesa_query(daraja):
+    calls, install = daraja
+    user = User.objects.create_user(username="payer", email="payer@example.com", password="secret")
+    auth = {"headers": {"Authorization": f"Bearer {AccessToken.for_user(user)}"}}
+
+    async def query(data, **extra):
+        await install()
+        return await AsyncClient().post("/api/async/query-mpesa/", data, content_type="application/json", **extra)
+
+    assert async_to_sync(query)({"checkout_request_id": "ws_1"}).status_code == 401
+    assert async_to_sync(query)({}, **auth).status_code == 400
+
+    response = async_to_sync(query)({"checkout_request_id": "ws_1"}, **auth)
+    assert response.status_code == 200
+    assert response.json()["CheckoutRequestID"] == "ws_1"
+    assert calls == ["/oauth/v1/generate", "/mpesa/stkpushquery/v1/query"]
@@ -0,0 +1,188 @@
+"""
+Endpoint benchmarks with JSON baselines.
+
+Skipped unless ``AEROPLANE_BENCH`` is set:
+
+``AEROPLANE_BENCH=run``
+    measure and write ``benchmarks/results.json``
+``AEROPLANE_BENCH=save``
+    measure and also overwrite ``benchmarks/baseline.json``
+``AEROPLANE_BENCH=compare``
+    measure and fail every endpoint whose latency (fastest round), query
+    count or peak allocation regressed past the baseline by more than
+    ``AEROPLANE_BENCH_THRESHOLD`` (a fraction, default 0.25; query counts
+    must not grow at all); an endpoint missing from the baseline fails too.
+    Latency is only compared with a baseline recorded on the same machine
+    and Python, so the committed ``baseline.json`` gates query counts and
+    allocations everywhere and latency where it was recorded
+
+``AEROPLANE_BENCH_SIZES`` picks the datasets (comma separated, default
+``small``; see ``DATASETS``) and ``AEROPLANE_BENCH_ROUNDS`` the timed
+requests per endpoint. For example::
+
+    AEROPLANE_BENCH=compare AEROPLANE_BENCH_SIZES=small,medium \\
+        python -m pytest --ds=aeroplane.settings aeroplane/tests/test_benchmarks.py
+"""
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import override_settings
+
+from aeroplane.middleware import QueryRecorder
+from aeroplane.models import HolidayDeal
+from aeroplane.querylog import ENDPOINTS, endpoint_caller, endpoint_context
+from aeroplane.seeding import PerfSeeder
+from users.models import User
+
+MODE = os.environ.get("AEROPLANE_BENCH", "")
+THRESHOLD = float(os.environ.get("AEROPLANE_BENCH_THRESHOLD", "0.25"))
+ROUNDS = int(os.environ.get("AEROPLANE_BENCH_ROUNDS", "10"))
+# Latency changes smaller than this are treated as noise whatever the ratio.
+MIN_LATENCY_DELTA_MS = float(os.environ.get("AEROPLANE_BENCH_MIN_DELTA_MS", "2"))
+SIZES = [size for size in os.environ.get("AEROPLANE_BENCH_SIZES", "small").split(",") if size]
+
+BENCH_DIR = Path(__file__).parent / "benchmarks"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+RESULTS_PATH = BENCH_DIR / "results.json"
+
+# PerfSeeder.run() counts per dataset. Images are kept small so that the
+# base64 encoding in the serializers does not drown out everything else.
+DATASETS = {
+    "small": dict(products=50, categories=5, tags=20, users=20, images_per_product=2, deals=4,
+                  products_per_deal=10, carts=20, orders=100, reviews=300),
+    "medium": dict(products=500, categories=20, tags=50, users=200, images_per_product=2, deals=10,
+                   products_per_deal=50, carts=200, orders=2_000, reviews=5_000),
+    "large": dict(products=5_000, categories=50, tags=200, users=1_000, images_per_product=3, deals=20,
+                  products_per_deal=200, carts=1_000, orders=20_000, reviews=50_000),
+}
+ANCHOR = datetime(2025, 1, 1, tzinfo=timezone.utc)
+MACHINE = f"{platform.node()} {platform.python_implementation()} {platform.python_version()}"
+
+requires_bench = pytest.mark.skipif(not MODE, reason="set AEROPLANE_BENCH=run|save|compare to run benchmarks")
+
+
+@pytest.fixture(scope="session")
+def results():
+    collected = {}
+    yield collected
+    if not collected:
+        return
+    BENCH_DIR.mkdir(exist_ok=True)
+    # Merge so that benchmarking one dataset keeps the others' numbers.
+    for path in (RESULTS_PATH, BASELINE_PATH) if MODE == "save" else (RESULTS_PATH,):
+        existing = json.loads(path.read_text()) if path.exists() else {}
+        for size, endpoints in collected.items():
+            existing.setdefault(size, {}).update(endpoints)
+        path.write_text(json.dumps(existing, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="module", params=SIZES)
+def dataset(request, django_db_setup, django_db_blocker, tmp_path_factory):
+    size = request.param
+    if size not in DATASETS:
+        pytest.fail(f"Unknown benchmark dataset {size!r}; choose from {', '.join(DATASETS)}")
+    media = override_settings(MEDIA_ROOT=tmp_path_factory.mktemp("media"))
+    media.enable()
+    with django_db_blocker.unblock():
+        PerfSeeder(seed=1, anchor=ANCHOR, image_sizes=((64, 64), (256, 256)), images_per_size=2).run(
+            **DATASETS[size]
+        )
+        # The seeded history ends at ANCHOR; keep one deal running today.
+        deal = HolidayDeal.objects.order_by("id").first()
+        HolidayDeal.objects.filter(pk=deal.pk).update(is_active=True)
+        ctx = {"size": size, **endpoint_context(User.objects.get(username="p1u0"), deal)}
+    yield ctx
+    with django_db_blocker.unblock():
+        call_command("flush", interactive=False, verbosity=0)
+    media.disable()
+
+
+def measure(ctx, name):
+    setup = ENDPOINTS[name][4]
+    call = endpoint_caller(ctx, name)
+
+    def prepare():
+        if setup:
+            setup(ctx)
+
+    prepare()
+    call()  # warm-up: imports, auth cache, connection setup
+
+    timings = []
+    for _ in range(ROUNDS):
+        prepare()
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+
+    prepare()
+    queries = QueryRecorder()
+    with connection.execute_wrapper(queries):
+        call()
+
+    prepare()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        # The fastest round is the most stable figure on a shared machine.
+        "latency_ms": round(min(timings) * 1000, 3),
+        "latency_median_ms": round(statistics.median(timings) * 1000, 3),
+        "queries": queries.count,
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "machine": MACHINE,
+    }
+
+
+def regressions(current, baseline):
+    problems = []
+    if current["queries"] > baseline["queries"]:
+        problems.append(f"queries {baseline['queries']} -> {current['queries']}")
+    latency, expected = current["latency_ms"], baseline["latency_ms"]
+    same_machine = current.get("machine") == baseline.get("machine")
+    if same_machine and latency > expected * (1 + THRESHOLD) and latency - expected > MIN_LATENCY_DELTA_MS:
+        problems.append(f"latency_ms {expected} -> {latency} (+{THRESHOLD:.0%} allowed)")
+    if current["peak_alloc_kb"] > baseline["peak_alloc_kb"] * (1 + THRESHOLD):
+        problems.append(
+            f"peak_alloc_kb {baseline['peak_alloc_kb']} -> {current['peak_alloc_kb']} (+{THRESHOLD:.0%} allowed)"
+        )
+    return problems
+
+
+@requires_bench
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", ENDPOINTS)
+def test_endpoint(dataset, name, results):
+    current = measure(dataset, name)
+    results.setdefault(dataset["size"], {})[name] = current
+
+    if MODE == "compare":
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        expected = baseline.get(dataset["size"], {}).get(name)
+        if expected is None:
+            pytest.fail(f"no baseline for {dataset['size']}/{name}; record one with AEROPLANE_BENCH=save")
+        problems = regressions(current, expected)
+        assert not problems, f"{dataset['size']}/{name} regressed: " + "; ".join(problems)
+
+
+def test_regressions_respect_threshold():
+    baseline = {"latency_ms": 10.0, "queries": 4, "peak_alloc_kb": 100.0}
+    assert regressions(dict(baseline, latency_ms=10 * (1 + THRESHOLD)), baseline) == []
+    assert len(regressions(dict(baseline, latency_ms=10 * (1 + THRESHOLD) + MIN_LATENCY_DELTA_MS + 1), baseline)) == 1
+    assert regressions(dict(baseline, queries=5), baseline) == ["queries 4 -> 5"]
+    assert len(regressions(dict(baseline, peak_alloc_kb=1000.0), baseline)) == 1
+    # Latency measured elsewhere is not comparable.
+    assert regressions(dict(baseline, latency_ms=100.0, machine="ci"), dict(baseline, machine="laptop")) == []
@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from aeroplane.caching import LOCK_KEY, TAG_KEY, TieredCache, invalidate_tags
+from aeroplane.models import Category, Product
+from users.models import User
+
+
+class Counter:
+    def __init__(self, value="value", delay=0):
+        self.calls = 0
+        self.value = value
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return f"{self.value}{self.calls}"
+
+
+@pytest.fixture
+def tiered():
+    return TieredCache("test", lock_wait=1, poll_interval=0.01)
+
+
+def test_local_tier_in_front_of_shared_tier(tiered):
+    compute = Counter()
+    assert tiered.get_or_set("k", compute, 60) == "value1"
+    assert tiered.get_or_set("k", compute, 60) == "value1"
+    tiered.local.clear()
+    assert tiered.get_or_set("k", compute, 60) == "value1"
+    assert len(tiered.local) == 1
+    assert compute.calls == 1
+
+    tiered.delete("k")
+    assert tiered.get("k") is None
+    assert tiered.get_or_set("k", compute, 60) == "value2"
+
+
+def test_none_and_per_key_ttl(tiered):
+    assert tiered.get_or_set("none", lambda: None, 60) is None
+    assert tiered.get("none", default="missing") is None
+    tiered.set("short", "x", ttl=0, stale_ttl=0)
+    assert tiered.get("short") is None
+
+
+def test_tags_invalidate_entries_in_every_process(tiered):
+    compute = Counter()
+    assert tiered.get_or_set("k", compute, 60, tags=("t",)) == "value1"
+    invalidate_tags("t", on_commit=False)
+    assert tiered.get_or_set("k", compute, 60, tags=("t",)) == "value2"
+    assert tiered.get_or_set("other", compute, 60, tags=("u",)) == "value3"
+
+    # Another process bumps the tag: its local tier is not purged here, but
+    # the entry is checked against the shared tag version.
+    cache.set(TAG_KEY.format(tag="t"), (time.time(), "elsewhere"), None)
+    assert tiered.get_or_set("k", compute, 60, tags=("t",)) == "value4"
+    assert tiered.get_or_set("other", compute, 60, tags=("u",)) == "value3"
+
+
+def test_local_entries_are_trusted_for_local_ttl():
+    trusting = TieredCache("trusting", local_ttl=60)
+    compute = Counter()
+    trusting.get_or_set("k", compute, 60, tags=("t",))
+    cache.set(TAG_KEY.format(tag="t"), (time.time(), "elsewhere"), None)
+    assert trusting.get_or_set("k", compute, 60, tags=("t",)) == "value1"
+    # Invalidations in this process purge the local tier at once.
+    invalidate_tags("t", on_commit=False)
+    assert trusting.get_or_set("k", compute, 60, tags=("t",)) == "value2"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_invalidation_waits_for_commit(tiered):
+    compute = Counter()
+    tiered.get_or_set("k", compute, 60, tags=("t",))
+    with transaction.atomic():
+        invalidate_tags("t")
+        assert tiered.get_or_set("k", compute, 60, tags=("t",)) == "value1"
+    assert tiered.get_or_set("k", compute, 60, tags=("t",)) == "value2"
+
+
+def test_stale_value_served_while_another_caller_revalidates(tiered):
+    compute = Counter()
+    tiered.set("k", "stale", ttl=0, stale_ttl=60)
+    cache.add(LOCK_KEY.format(key="test:k"), "someone else", 60)
+    assert tiered.get_or_set("k", compute, 60, stale_ttl=60) == "stale"
+    assert compute.calls == 0
+
+    cache.delete(LOCK_KEY.format(key="test:k"))
+    assert tiered.get_or_set("k", compute, 60, stale_ttl=60) == "value1"
+    assert tiered.get_or_set("k", compute, 60, stale_ttl=60) == "value1"
+    assert cache.get(LOCK_KEY.format(key="test:k")) is None
+
+
+def test_concurrent_misses_compute_once(tiered):
+    compute = Counter(delay=0.2)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(tiered.get_or_set("k", compute, 60)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["value1"] * 8
+    assert compute.calls == 1
+
+
+def test_waiters_give_up_on_a_stuck_lock(tiered):
+    cache.add(LOCK_KEY.format(key="test:k"), "stuck", 60)
+    start = time.monotonic()
+    assert tiered.get_or_set("k", Counter(), 60) == "value1"
+    assert 1 <= time.monotonic() - start < 2
+
+
+def test_errors_are_not_cached_and_release_the_lock(tiered):
+    def fail():
+        raise RuntimeError("database is down")
+
+    with pytest.raises(RuntimeError):
+        tiered.get_or_set("k", fail, 60)
+    assert cache.get(LOCK_KEY.format(key="test:k")) is None
+    assert tiered.get_or_set("k", Counter(), 60) == "value1"
+
+
+def test_update_patches_the_cached_value_and_drops_other_copies(tiered):
+    other = TieredCache("test", lock_wait=1, poll_interval=0.01)
+    tiered.get_or_set("k", lambda: (1, 2), 60, tags=("t",))
+    assert other.get("k", ("t",)) == (1, 2)
+
+    tiered.update("k", lambda value: value + (3,), 60, tags=("t",))
+    assert other.local.get("k") is None
+    assert other.get("k", ("t",)) == (1, 2, 3)
+    # Returning the value as is changes nothing, not even the tags.
+    assert tiered.update("k", lambda value: value, 60, tags=("t",)) == (1, 2, 3)
+    assert other.local.get("k") is not None
+
+    # A missing key stays missing, and a busy lock drops the key.
+    tiered.update("missing", lambda value: value + (3,), 60, tags=("u",))
+    assert tiered.get("missing", ("u",)) is None
+    cache.add(LOCK_KEY.format(key="test:k"), "busy", 60)
+    tiered.update("k", lambda value: value + (4,), 60, tags=("t",))
+    assert tiered.get("k", ("t",)) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_catalog_endpoints_are_cached_until_changed():
+    product = Product.objects.create(title="Widget")
+    Category.objects.create(title="Shoes")
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username="u", email="u@example.com", password="secret"))
+
+    for path in (f"/api/products/{product.id}/", "/api/categories/", "/api/holiday-deals/"):
+        first = client.get(path).json()
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(path).json() == first
+        assert len(queries) == 0, path
+
+    product.title = "Renamed"
+    product.save()
+    Category.objects.create(title="Hats")
+    assert client.get(f"/api/products/{product.id}/").json()["title"] == "Renamed"
+    assert len(client.get("/api/categories/").json()) == 2
+    assert Client().get("/api/products/999/").status_code == 404
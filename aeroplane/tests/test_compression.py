@@ -0,0 +1,122 @@
+import gzip
+import json
+
+import brotli
+import pytest
+import zstandard
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory
+
+from aeroplane import compression
+from aeroplane.caching import SizeBoundedLRU
+from aeroplane.middleware import CompressionMiddleware
+from aeroplane.models import Product
+
+DECOMPRESS = {
+    "gzip": gzip.decompress,
+    "br": brotli.decompress,
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+
+BODY = json.dumps([{"id": i, "image": "data:image/jpeg;base64," + "QUJD" * 200} for i in range(20)]).encode()
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br, zstd", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("zstd", "zstd"),
+    ("*", "br"),
+    ("*;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("identity", None),
+    ("gzip;q=bogus", None),
+    ("", None),
+])
+def test_negotiate(header, expected):
+    assert compression.negotiate(header) == expected
+
+
+def run(response, accept_encoding="gzip, br, zstd", path="/api/products/"):
+    request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip", "zstd"])
+def test_compresses_with_negotiated_encoding(encoding):
+    response = HttpResponse(BODY, content_type="application/json")
+    response["ETag"] = '"abc"'
+    response = run(response, accept_encoding=encoding)
+    assert response["Content-Encoding"] == encoding
+    assert int(response["Content-Length"]) == len(response.content) < len(BODY)
+    assert DECOMPRESS[encoding](response.content) == BODY
+    assert response["Vary"] == "Accept-Encoding"
+    assert response["ETag"] == 'W/"abc"'
+
+
+def test_skips_small_bodies_other_types_and_excluded_paths():
+    assert not run(HttpResponse(b'{"detail": "Not found"}', content_type="application/json")).has_header(
+        "Content-Encoding"
+    )
+    assert not run(HttpResponse(b"\xff" * 5000, content_type="image/jpeg")).has_header("Content-Encoding")
+    assert not run(HttpResponse(BODY, content_type="application/json"), path="/users/login/").has_header(
+        "Content-Encoding"
+    )
+    response = run(HttpResponse(BODY, content_type="application/json"), accept_encoding="")
+    assert not response.has_header("Content-Encoding")
+    assert response["Vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip", "zstd"])
+def test_compresses_streaming_responses_incrementally(encoding):
+    chunks = [BODY[i:i + 4096] for i in range(0, len(BODY), 4096)]
+    response = run(StreamingHttpResponse(iter(chunks), content_type="application/json"), accept_encoding=encoding)
+    assert response["Content-Encoding"] == encoding
+    assert not response.has_header("Content-Length")
+    compressed = list(response.streaming_content)
+    # Every input chunk is flushed on its own rather than buffered to the end.
+    assert len(compressed) >= len(chunks)
+    assert DECOMPRESS[encoding](b"".join(compressed)) == BODY
+
+
+def test_compresses_async_streaming_responses():
+    async def chunks():
+        for i in range(0, len(BODY), 4096):
+            yield BODY[i:i + 4096]
+
+    response = run(StreamingHttpResponse(chunks(), content_type="application/json"), accept_encoding="gzip")
+
+    async def collect():
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    assert gzip.decompress(async_to_sync(collect)()) == BODY
+
+
+def test_identical_bodies_reuse_the_compressed_variant(monkeypatch):
+    compression.variants.clear()
+    calls = []
+    one_shot, stream = compression.CODECS["br"]
+    monkeypatch.setitem(compression.CODECS, "br", (lambda data, level: calls.append(data) or one_shot(data, level), stream))
+
+    first = compression.compress_body(BODY, "br")
+    assert compression.compress_body(BODY, "br") is first
+    assert compression.compress_body(BODY + b" ", "br") is not first
+    assert len(calls) == 2
+
+
+def test_variant_cache_is_bounded():
+    cache = SizeBoundedLRU(max_bytes=10)
+    for key in "abc":
+        cache.set(key, b"xxxx")
+    assert cache.size == 8
+    assert cache.get("a") is None and cache.get("c") == b"xxxx"
+
+
+@pytest.mark.django_db
+def test_product_list_is_compressed_end_to_end():
+    for i in range(10):
+        Product.objects.create(title=f"Product {i}", description="A fine product. " * 20)
+    plain = Client().get("/api/products/")
+    response = Client().get("/api/products/", HTTP_ACCEPT_ENCODING="br")
+    assert response["Content-Encoding"] == "br"
+    assert json.loads(brotli.decompress(response.content)) == plain.json()
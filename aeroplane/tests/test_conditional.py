@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from aeroplane.crud import moderate_reviews
+from aeroplane.models import Category, HolidayDeal, Product, ProductReview
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def product():
+    return Product.objects.create(title="Widget")
+
+
+def revalidate(client, path, response, **extra):
+    return client.get(path, HTTP_IF_NONE_MATCH=response["ETag"], **extra)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("path", ["/api/products/", "/api/products/{id}/", "/api/async/products/"])
+def test_matching_requests_get_304_without_queries(product, path):
+    client = Client()
+    path = path.format(id=product.id)
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response["Cache-Control"] == "public, max-age=60"
+    assert response["Last-Modified"]
+
+    with CaptureQueriesContext(connection) as queries:
+        not_modified = revalidate(client, path, response)
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified["ETag"] == response["ETag"]
+    assert not_modified["Cache-Control"] == "public, max-age=60"
+    assert len(queries) == 0
+
+    assert client.get(path, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code == 304
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_invalidate_validators(product):
+    client = Client()
+    first = client.get("/api/products/")
+    assert client.get("/api/products/?ordering=price")["ETag"] != first["ETag"]
+
+    product.title = "Renamed"
+    product.save()
+    second = revalidate(client, "/api/products/", first)
+    assert second.status_code == 200
+    assert second.json()[0]["title"] == "Renamed"
+
+    # Rating summaries change through QuerySet.update() and products_changed.
+    author = User.objects.create_user(username="author", email="author@example.com", password="secret")
+    review = ProductReview.objects.create(user=author, product=product, rating=5)
+    assert revalidate(client, "/api/products/", second).status_code == 304
+    moderate_reviews([review.id], approve=True)
+    assert revalidate(client, "/api/products/", second).status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deal_membership_invalidates_deals_and_products(product):
+    now = timezone.now()
+    deal = HolidayDeal.objects.create(
+        name="Sale", discount_percentage=10, start_date=now - timedelta(days=1), end_date=now + timedelta(days=1)
+    )
+    client = Client()
+    deals = client.get("/api/holiday-deals/")
+    products = client.get("/api/products/")
+    assert deals.json()[0]["products"] == 0
+
+    deal.products.add(product)
+    assert revalidate(client, "/api/holiday-deals/", deals).json()[0]["products"] == 1
+    assert revalidate(client, "/api/products/", products).json()[0]["holiday_deals"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_categories_are_private_and_checked_after_authentication():
+    Category.objects.create(title="Shoes")
+    anonymous = Client().get("/api/categories/")
+    assert anonymous.status_code == 401
+    assert not anonymous.has_header("ETag")
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username="u", email="u@example.com", password="secret"))
+    response = client.get("/api/categories/")
+    assert response["Cache-Control"] == "private, max-age=60"
+    assert revalidate(client, "/api/categories/", response).status_code == 304
+
+    Category.objects.create(title="Hats")
+    assert len(revalidate(client, "/api/categories/", response).json()) == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_errors_carry_no_validators():
+    response = Client().get("/api/products/999/")
+    assert response.status_code == 404
+    assert not response.has_header("ETag")
+    assert not response.has_header("Cache-Control")
@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from aeroplane.crud import get_active_deals_with_top_products
+from aeroplane.models import Category, HolidayDeal, Product
+from aeroplane.ranking import invalidate_rankings
+from users.models import User
+
+
+@pytest.fixture
+def client():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username="u", email="u@example.com", password="secret"))
+    return client
+
+
+def published(title, **fields):
+    return Product.objects.create(title=title, product_status="published", **fields)
+
+
+@pytest.fixture
+def catalog():
+    Category.objects.create(title="Shoes")
+    products = [published(f"P{n}", featured=n % 2 == 0, rating_count=n) for n in range(6)]
+    Product.objects.create(title="Draft", featured=True)
+    now = timezone.now()
+    deal = HolidayDeal.objects.create(
+        name="Sale", discount_percentage=10, start_date=now - timedelta(days=1), end_date=now + timedelta(days=1)
+    )
+    deal.products.add(*products)
+    return products
+
+
+@pytest.mark.django_db(transaction=True)
+def test_home_sections(client, catalog, settings):
+    settings.HOME_SECTION_SIZE = 2
+    settings.HOME_DEAL_PRODUCTS = 3
+    data = client.get("/api/home/").json()
+
+    assert [category["title"] for category in data["categories"]] == ["Shoes"]
+    assert [product["title"] for product in data["featured"]] == ["P4", "P2"]
+    assert [product["title"] for product in data["new_arrivals"]] == ["P5", "P4"]
+    [deal] = data["deals"]
+    assert deal["products"] == 6
+    assert [product["title"] for product in deal["top_products"]] == ["P5", "P4", "P3"]
+    assert deal["top_products"][0]["holiday_deals"]["name"] == "Sale"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_home_is_one_cached_entry_and_shares_product_fetches(client, catalog):
+    with CaptureQueriesContext(connection) as cold:
+        first = client.get("/api/home/")
+    # Categories, three section selections, then one product fetch with its
+    # two prefetches for all sections.
+    product_fetches = [
+        q for q in cold.captured_queries if q["sql"].startswith('SELECT "aeroplane_product"."id", "aeroplane_product"."pid"')
+    ]
+    assert len(product_fetches) == 1
+
+    with CaptureQueriesContext(connection) as warm:
+        assert client.get("/api/home/").json() == first.json()
+    assert len(warm) == 0
+    assert client.get("/api/home/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+    assert first["Cache-Control"] == "private, max-age=60"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_partial_invalidation_rebuilds_only_that_section(client, catalog):
+    first = client.get("/api/home/")
+    Product.objects.filter(title="P1").update(featured=True)  # bypasses the signals
+    invalidate_rankings()
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get("/api/home/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert "P1" in [product["title"] for product in response.json()["featured"]]
+    # Both ranked feeds, then their products with the two prefetches;
+    # neither the deals nor the categories are read again.
+    assert len(queries) == 5
+    assert not any("ROW_NUMBER" in q["sql"] or "aeroplane_category" in q["sql"] for q in queries.captured_queries)
+
+    Category.objects.create(title="Hats")
+    assert len(client.get("/api/home/").json()["categories"]) == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_only_changes_to_shown_products_rebuild_sections(client, catalog, settings):
+    settings.HOME_SECTION_SIZE = 2
+    settings.HOME_DEAL_PRODUCTS = 2
+    first = client.get("/api/home/")
+
+    # Neither shown nor moving into a section: P0 is 6th of the new arrivals.
+    for title in ("P0", "Draft"):
+        product = Product.objects.get(title=title)
+        product.description = "Changed"
+        product.save()
+    assert client.get("/api/home/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+
+    shown = Product.objects.get(title="P4")
+    shown.title = "P4 renamed"
+    shown.save()
+    data = client.get("/api/home/").json()
+    assert [product["title"] for product in data["featured"]] == ["P4 renamed", "P2"]
+    assert [product["title"] for product in data["new_arrivals"]] == ["P5", "P4 renamed"]
+    assert [product["title"] for product in data["deals"][0]["top_products"]] == ["P5", "P4 renamed"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_publishing_a_deal_product_rebuilds_the_deals(client, catalog):
+    draft = Product.objects.get(title="Draft")
+    now = timezone.now()
+    deal = HolidayDeal.objects.create(
+        name="Drafts", discount_percentage=5, start_date=now - timedelta(days=1), end_date=now + timedelta(days=1)
+    )
+    deal.products.add(draft)
+    first = client.get("/api/home/")
+    assert [d["top_products"] for d in first.json()["deals"] if d["name"] == "Drafts"] == [[]]
+
+    draft.product_status = "published"
+    draft.save()
+    response = client.get("/api/home/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    deals = {d["name"]: [product["title"] for product in d["top_products"]] for d in response.json()["deals"]}
+    assert deals["Drafts"] == ["Draft"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_home_needs_login_and_handles_an_empty_catalog(client):
+    assert APIClient().get("/api/home/").status_code == 401
+    assert client.get("/api/home/").json() == {"categories": [], "featured": [], "deals": [], "new_arrivals": []}
+    assert get_active_deals_with_top_products(3) == []
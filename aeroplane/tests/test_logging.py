@@ -0,0 +1,60 @@
+import io
+import json
+import logging
+
+import pytest
+from django.test import Client
+
+from aeroplane.log import JsonFormatter, QueueingHandler, RedactingFilter, RequestIdFilter, redact
+
+
+def test_redact_masks_payment_fields():
+    callback = {"Body": {"stkCallback": {"CallbackMetadata": {"Item": [
+        {"Name": "Amount", "Value": 10},
+        {"Name": "MpesaReceiptNumber", "Value": "NLJ7RT61SV"},
+        {"Name": "PhoneNumber", "Value": 254708374149},
+    ]}}}}
+    items = redact(callback)["Body"]["stkCallback"]["CallbackMetadata"]["Item"]
+    assert [item["Value"] for item in items] == [10, "[redacted]", "[redacted]"]
+    assert redact({"Password": "x", "PartyA": "2547", "Amount": 5}) == {
+        "Password": "[redacted]", "PartyA": "[redacted]", "Amount": 5
+    }
+
+
+@pytest.fixture
+def captured():
+    stream = io.StringIO()
+    handler = QueueingHandler(stream)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(RedactingFilter())
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger("aeroplane.tests.logging")
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+
+    def lines():
+        handler.close()  # drains the queue
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield logger, lines
+    logger.removeHandler(handler)
+
+
+def test_records_are_written_as_redacted_json(captured):
+    logger, lines = captured
+    logger.info("push for %s", "order 1", extra={"mpesa_response": {"PhoneNumber": "2547"}, "phone": "2547"})
+    [entry] = lines()
+    assert entry["message"] == "push for order 1"
+    assert entry["mpesa_response"] == {"PhoneNumber": "[redacted]"}
+    assert entry["phone"] == "[redacted]"
+
+
+@pytest.mark.django_db
+def test_request_id_is_echoed_and_attached_to_records(captured, monkeypatch):
+    logger, lines = captured
+    monkeypatch.setattr("aeroplane.views.get_products", lambda ordering=None: logger.info("listing") or [])
+
+    response = Client(HTTP_X_REQUEST_ID="abc-123").get("/api/products/")
+    assert response["X-Request-ID"] == "abc-123"
+    assert Client(HTTP_X_REQUEST_ID="bad id\n").get("/api/products/")["X-Request-ID"] != "bad id\n"
+    assert [entry["request_id"] for entry in lines()][0] == "abc-123"
@@ -0,0 +1,37 @@
+import pytest
+from django.test import Client
+from prometheus_client import REGISTRY
+
+from aeroplane.metrics import track_mpesa
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+def test_requests_are_counted_by_route():
+    before = sample("http_responses_total", route="product-list", method="GET", status="200")
+    queries_before = sample("db_queries_per_request_count", route="product-list")
+
+    Client().get("/api/products/")
+
+    assert sample("http_responses_total", route="product-list", method="GET", status="200") == before + 1
+    assert sample("db_queries_per_request_count", route="product-list") == queries_before + 1
+    assert sample("http_request_duration_seconds_count", route="product-list", method="GET") >= 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_renders_text_format():
+    response = Client().get("/metrics")
+    assert response.status_code == 200
+    assert b"http_request_duration_seconds" in response.content
+
+
+def test_mpesa_errors_are_counted():
+    before = sample("mpesa_request_errors_total", endpoint="test")
+    with pytest.raises(ConnectionError):
+        with track_mpesa("test"):
+            raise ConnectionError
+    assert sample("mpesa_request_errors_total", endpoint="test") == before + 1
+    assert sample("mpesa_request_duration_seconds_count", endpoint="test") >= 1
@@ -0,0 +1,72 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from aeroplane.crud import moderate_reviews
+from aeroplane.models import Product, ProductReview
+from aeroplane.signals import products_changed
+from users.models import User
+
+
+@pytest.fixture
+def pending():
+    author = User.objects.create_user(username="author", email="author@example.com", password="secret")
+    products = [Product.objects.create(title=f"Product {i}") for i in range(2)]
+    ProductReview.objects.bulk_create([
+        ProductReview(user=author, product=products[i % 2], rating=i % 5 + 1) for i in range(20)
+    ])
+    return products
+
+
+@pytest.fixture
+def admin_client():
+    admin = User.objects.create_superuser(username="admin", email="admin@example.com", password="secret")
+    client = APIClient()
+    client.force_authenticate(admin)
+    return client
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_approval_groups_work_per_product(pending):
+    received = []
+    handler = lambda sender, product_ids, **kwargs: received.append(product_ids)
+    products_changed.connect(handler)
+    try:
+        ids = list(ProductReview.objects.values_list("id", flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            updated, product_ids = moderate_reviews(ids, approve=True)
+    finally:
+        products_changed.disconnect(handler)
+
+    assert updated == 20
+    assert product_ids == {p.id for p in pending}
+    # select, update and one summary update per product, plus the transaction
+    assert len(queries) <= 6
+    assert received == [frozenset(product_ids)]
+    for product in pending:
+        product.refresh_from_db()
+        assert product.rating_count == 10
+        assert product.rating_histogram == [2, 2, 2, 2, 2]
+
+    moderate_reviews(ids[:4], approve=False)
+    assert sum(Product.objects.values_list("rating_count", flat=True)) == 16
+
+
+@pytest.mark.django_db
+def test_moderation_queue_api(pending, admin_client):
+    body = admin_client.get("/api/reviews/moderation/?page_size=100").json()
+    assert len(body["results"]) == 20
+
+    ids = [review["id"] for review in body["results"][:5]]
+    response = admin_client.post("/api/reviews/moderation/", {"review_ids": ids, "action": "reject"}, format="json")
+    assert response.json()["updated"] == 5
+    assert response.json()["products"] == []
+    assert len(admin_client.get("/api/reviews/moderation/?page_size=100").json()["results"]) == 15
+
+
+@pytest.mark.django_db
+def test_moderation_requires_staff(pending):
+    client = APIClient()
+    client.force_authenticate(User.objects.get(username="author"))
+    assert client.get("/api/reviews/moderation/").status_code == 403
@@ -0,0 +1,74 @@
+import json
+import pstats
+
+import pytest
+from django.test import Client
+
+from aeroplane.models import Product
+from aeroplane.profiling import make_profile_token
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(settings, tmp_path):
+    settings.PROFILING_DIR = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def admin_client(db):
+    User.objects.create_superuser(username="admin", email="admin@example.com", password="secret")
+    token = Client().post("/users/login/", {"username": "admin", "password": "secret"}).json()["access_token"]
+    return Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+@pytest.mark.django_db
+def test_unsigned_requests_are_not_profiled(profile_dir):
+    assert "X-Profile-Id" not in Client().get("/api/products/")
+    assert "X-Profile-Id" not in Client(HTTP_X_PROFILE="forged").get("/api/products/")
+    assert not list(profile_dir.iterdir())
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("mode", ["cprofile", "sample"])
+def test_signed_request_is_profiled(mode, profile_dir):
+    Product.objects.create(title="Pear")
+    response = Client(HTTP_X_PROFILE=make_profile_token(mode)).get("/api/products/")
+    profile_id = response["X-Profile-Id"]
+
+    meta = json.loads((profile_dir / f"{profile_id}.json").read_text())
+    assert meta["mode"] == mode and meta["status"] == 200
+    assert any("aeroplane_product" in query["sql"] for query in meta["sql"])
+    speedscope = json.loads((profile_dir / f"{profile_id}.speedscope.json").read_text())
+    assert speedscope["profiles"][0]["type"] == "sampled"
+    if mode == "cprofile":
+        assert pstats.Stats(str(profile_dir / f"{profile_id}.pstats")).total_calls > 0
+
+
+@pytest.mark.django_db
+def test_sample_rate_profiles_without_header(settings, profile_dir):
+    settings.PROFILING_SAMPLE_RATE = 1.0
+    settings.PROFILING_MODE = "cprofile"
+    assert "X-Profile-Id" in Client().get("/api/products/")
+
+
+@pytest.mark.django_db
+def test_admin_can_list_and_download(admin_client):
+    profile_id = Client(HTTP_X_PROFILE=make_profile_token()).get("/api/products/")["X-Profile-Id"]
+
+    listing = admin_client.get("/api/profiles/").json()
+    assert [p["id"] for p in listing] == [profile_id]
+    assert "sql" not in listing[0]
+    assert admin_client.get(f"/api/profiles/{profile_id}/").json()["sql"]
+    download = admin_client.get(f"/api/profiles/{profile_id}/?download=pstats")
+    assert download.status_code == 200
+    assert download["Content-Disposition"].endswith(f'{profile_id}.pstats"')
+    assert admin_client.get("/api/profiles/../../etc/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_profiles_are_admin_only():
+    User.objects.create_user(username="bob", email="bob@example.com", password="secret")
+    token = Client().post("/users/login/", {"username": "bob", "password": "secret"}).json()["access_token"]
+    assert Client(HTTP_AUTHORIZATION=f"Bearer {token}").get("/api/profiles/").status_code == 403
+    assert Client().get("/api/profiles/").status_code == 401
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import re
+
+import pytest
+from django.core.asgi import get_asgi_application
+from django.test import Client, override_settings
+
+from aeroplane.middleware import NPlusOneError, query_fingerprint
+from aeroplane.models import Category, Product
+
+
+@pytest.fixture
+def products():
+    return [Product.objects.create(title=f"Product {i}") for i in range(8)]
+
+
+@pytest.fixture
+def unprefetched_listing(monkeypatch):
+    # The product listing as it was before it prefetched the serializer's
+    # relations: two queries per product.
+    monkeypatch.setattr("aeroplane.views.get_products", lambda ordering=None: list(Product.objects.all()))
+
+
+def test_fingerprint_collapses_in_lists():
+    assert query_fingerprint('SELECT 1 WHERE "id" IN (%s, %s, %s)') == query_fingerprint('SELECT 1 WHERE "id" IN (%s)')
+
+
+@pytest.mark.django_db
+@override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_REPEAT_THRESHOLD=5)
+def test_reports_query_count_and_repeated_shapes(products, unprefetched_listing, caplog):
+    with caplog.at_level(logging.INFO, logger="aeroplane.queries"):
+        response = Client().get("/api/products/")
+
+    assert 'desc="' in response["Server-Timing"]
+    summary = [r for r in caplog.records if r.levelno == logging.INFO][0]
+    assert summary.db_queries > 8
+    assert any(r.levelno == logging.WARNING and r.repeat_count == 8 for r in caplog.records)
+
+
+@pytest.mark.django_db
+@override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_STRICT=True)
+def test_strict_mode_fails_on_n_plus_one(products, unprefetched_listing):
+    with pytest.raises(NPlusOneError):
+        Client().get("/api/products/")
+
+
+@pytest.mark.django_db
+@override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_STRICT=True)
+def test_product_listings_prefetch_what_they_serialize(products):
+    category = Category.objects.create(title="Shoes")
+    Product.objects.update(category=category)
+    assert Client().get("/api/products/").status_code == 200
+    assert Client().get(f"/api/products/category/{category.id}/").status_code == 200
+
+
+@pytest.mark.django_db
+@override_settings(QUERY_INSPECTOR_ENABLED=False)
+def test_disabled_inspector_adds_nothing(products):
+    assert "Server-Timing" not in Client().get("/api/products/")
+
+
+def asgi_get(application, path):
+    """
+    GET ``path`` from an ASGI application on a fresh event loop, as a server
+    would: sync code then runs in asgiref's worker thread, with its own
+    database connections, rather than on the test thread.
+    """
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()  # the client stays connected
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"testserver")], "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(application(scope, receive, send))
+    finally:
+        loop.close()
+    return {name.lower(): value for name, value in messages[0]["headers"]}
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("path", ["/api/products/", "/api/async/products/"])
+def test_queries_are_seen_under_asgi(products, path):
+    with override_settings(QUERY_INSPECTOR_ENABLED=True):
+        application = get_asgi_application()
+    with override_settings(QUERY_INSPECTOR_ENABLED=True):
+        headers = asgi_get(application, path)
+    queries = int(re.search(r'desc="(\d+) queries"', headers[b"server-timing"].decode()).group(1))
+    assert queries > 0
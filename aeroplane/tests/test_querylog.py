@@ -0,0 +1,92 @@
+import json
+from datetime import datetime, timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from aeroplane.models import Cart, HolidayDeal, Product
+from aeroplane.querylog import capture, endpoint_context, explain, sequential_scans
+from aeroplane.ranking import FEEDS, FIELDS
+from aeroplane.seeding import PerfSeeder
+from users.models import User
+
+COUNTS = dict(products=30, categories=3, tags=5, users=6, images_per_product=1, deals=2,
+              products_per_deal=4, carts=8, orders=10, reviews=40)
+
+
+@pytest.fixture
+def seeded(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    PerfSeeder(seed=1, anchor=datetime(2025, 3, 1, tzinfo=timezone.utc), image_sizes=((16, 16),),
+               images_per_size=1).run(**COUNTS)
+
+
+@pytest.mark.django_db
+def test_capture_logs_every_endpoint_and_rolls_back(seeded):
+    user = User.objects.get(username="p1u0")
+    carts = Cart.objects.count()
+    log = capture(endpoint_context(user, HolidayDeal.objects.first()))
+
+    # Each statement shape is logged once, under the first endpoint running it.
+    assert {"product_list", "cart_add", "user_orders", "product_reviews", "deal_list"} <= {
+        entry["endpoint"] for entry in log
+    }
+    assert all(entry["sql"].lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")) for entry in log)
+    assert len({entry["sql"] for entry in log}) == len(log)
+    assert Cart.objects.count() == carts
+
+
+@pytest.mark.django_db
+def test_sequential_scans_on_sqlite():
+    unindexed = explain('SELECT * FROM "aeroplane_product" WHERE "title" = %s', ["x"])
+    assert [table for table, _ in sequential_scans(unindexed)] == ["aeroplane_product"]
+    by_key = explain('SELECT * FROM "aeroplane_product" WHERE "id" = %s', [1])
+    assert sequential_scans(by_key) == []
+    # Walking a partial index reads only its rows.
+    active = explain('SELECT * FROM "aeroplane_holidaydeal" WHERE "is_active" ORDER BY "start_date" DESC', [])
+    assert "deal_active_start_idx" in " ".join(active)
+    assert sequential_scans(active) == []
+
+
+@pytest.mark.django_db
+def test_ranked_feeds_read_the_published_products_by_index():
+    querysets = [Product.objects.filter(**lookups).values_list("id", *FIELDS) for lookups, _ in FEEDS.values()]
+    querysets.append(Product.objects.filter(product_status="published").order_by("-date", "-id")[:12])
+    for queryset in querysets:
+        plan = explain(*queryset.query.sql_with_params())
+        assert "product_status_date_idx" in " ".join(plan)
+        assert sequential_scans(plan) == [] and not any("TEMP B-TREE" in line for line in plan)
+
+
+def test_postgres_plans_are_walked():
+    plan = [{"Plan": {"Node Type": "Nested Loop", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "aeroplane_cart", "Plan Rows": 10},
+        {"Node Type": "Index Scan", "Relation Name": "users_user"},
+    ]}}]
+
+    class Postgres:
+        vendor = "postgresql"
+
+    assert sequential_scans(plan, using=Postgres()) == [("aeroplane_cart", "Seq Scan on aeroplane_cart (rows=10)")]
+
+
+@pytest.mark.django_db
+def test_explain_queries_command(seeded, tmp_path):
+    log_path = tmp_path / "queries.json"
+    out = StringIO()
+    call_command("explain_queries", "--save-log", str(log_path), "--ignore", "aeroplane_product", "--strict",
+                 stdout=out)
+    assert "0 sequential scans" in out.getvalue()
+
+    json.loads(log_path.read_text())  # replayable
+    with pytest.raises(CommandError, match="1 sequential scans"):
+        call_command("explain_queries", "--log", str(log_path), "--endpoint", "product_list", "--strict",
+                     stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_explain_queries_needs_data():
+    with pytest.raises(CommandError, match="seed_perf"):
+        call_command("explain_queries", stdout=StringIO())
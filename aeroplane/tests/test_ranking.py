@@ -0,0 +1,83 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from aeroplane.models import Product
+from aeroplane.ranking import FEEDS, build_feed, invalidate_rankings, ranked_ids
+
+
+def published(title, **fields):
+    return Product.objects.create(title=title, product_status="published", **fields)
+
+
+def titles(feed):
+    names = dict(Product.objects.values_list("id", "title"))
+    return [names[pk] for pk in ranked_ids(feed)]
+
+
+@pytest.fixture
+def catalog():
+    return [
+        published("A", price="90", old_price="100"),
+        published("B", featured=True, price="50", old_price="100"),
+        published("C", price="10", old_price="0"),
+        published("D", featured=True, price="75", old_price="100"),
+        Product.objects.create(title="Draft", featured=True, price="1", old_price="100"),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_feeds_are_ranked(catalog):
+    assert titles("featured") == ["D", "B"]
+    assert titles("newest") == ["D", "C", "B", "A"]
+    assert titles("discount") == ["B", "D", "A"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_feed_endpoint_pages_are_a_slice_and_one_fetch(catalog):
+    client = APIClient()
+    client.get("/api/products/feed/newest/")
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get("/api/products/feed/newest/?limit=2&offset=1")
+    data = response.json()
+    assert data["count"] == 4
+    assert [product["title"] for product in data["results"]] == ["C", "B"]
+    assert "offset=3" in data["next"]
+    # The products of the page with their two listing prefetches.
+    assert len(queries) == 3
+    assert response["ETag"]
+
+    assert client.get("/api/products/feed/bestsellers/").status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_saves_patch_the_cached_feeds(catalog):
+    a, b, c, d, draft = catalog
+    for feed in FEEDS:
+        ranked_ids(feed)
+
+    a.featured = True
+    a.price = "20"  # as assigned from request data
+    a.save()
+    draft.product_status = "published"
+    draft.save()
+    d.product_status = "draft"
+    d.save()
+    b.delete()
+
+    with CaptureQueriesContext(connection) as queries:
+        cached = {feed: list(ranked_ids(feed)) for feed in FEEDS}
+    assert len(queries) == 0
+    assert cached == {feed: list(build_feed(feed)[0]) for feed in FEEDS}
+    assert titles("featured") == ["Draft", "A"]
+    assert titles("discount") == ["Draft", "A"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_changes_need_an_invalidation(catalog):
+    assert titles("featured") == ["D", "B"]
+    Product.objects.filter(title="A").update(featured=True)  # bypasses the signals
+    assert titles("featured") == ["D", "B"]
+    invalidate_rankings()
+    assert titles("featured") == ["D", "B", "A"]
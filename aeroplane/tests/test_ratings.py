@@ -0,0 +1,65 @@
+import pytest
+
+from aeroplane.crud import (
+    create_pro_review, delete_product_review, get_products, rebuild_product_ratings, update_product_review
+)
+from aeroplane.models import Product, ProductReview
+from users.models import User
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username="reviewer", email="reviewer@example.com", password="secret")
+
+
+@pytest.fixture
+def product():
+    return Product.objects.create(title="Linen Shirt")
+
+
+def summary(product):
+    product.refresh_from_db()
+    return product.rating_count, product.rating_sum, product.rating_histogram
+
+
+@pytest.mark.django_db
+def test_only_approved_reviews_are_counted(user, product):
+    review = create_pro_review(user, product.id, {"rating": 4})
+    assert summary(product) == (0, 0, [0, 0, 0, 0, 0])
+
+    update_product_review(review.id, user, {"is_approved": True})
+    assert summary(product) == (1, 4, [0, 0, 0, 1, 0])
+
+
+@pytest.mark.django_db
+def test_rating_change_and_delete_apply_deltas(user, product):
+    review = create_pro_review(user, product.id, {"rating": 2, "is_approved": True})
+    update_product_review(review.id, user, {"rating": 5})
+    assert summary(product) == (1, 5, [0, 0, 0, 0, 1])
+    assert product.rating_average == 5
+
+    delete_product_review(review.id, user)
+    assert summary(product) == (0, 0, [0, 0, 0, 0, 0])
+    assert product.rating_average is None
+
+
+@pytest.mark.django_db
+def test_rebuild_recomputes_from_reviews(user, product):
+    ProductReview.objects.create(user=user, product=product, rating=3, is_approved=True)
+    ProductReview.objects.create(user=user, product=product, rating=5, is_approved=True)
+    ProductReview.objects.create(user=user, product=product, rating=1, is_approved=False)
+    Product.objects.filter(id=product.id).update(rating_count=9, rating_sum=1)
+
+    assert rebuild_product_ratings() == 1
+    assert summary(product) == (2, 8, [0, 0, 1, 0, 1])
+
+
+@pytest.mark.django_db
+def test_products_can_be_ordered_by_rating(user, product):
+    better = Product.objects.create(title="Silk Shirt")
+    unrated = Product.objects.create(title="Wool Shirt")
+    create_pro_review(user, product.id, {"rating": 3, "is_approved": True})
+    create_pro_review(user, better.id, {"rating": 5, "is_approved": True})
+
+    assert [p.id for p in get_products(ordering="rating")] == [better.id, product.id, unrated.id]
+    assert [p.id for p in get_products(ordering="-rating")] == [unrated.id, product.id, better.id]
@@ -0,0 +1,73 @@
+import io
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from django.test import Client
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from aeroplane import parsers, renderers
+from aeroplane.models import Product
+from aeroplane.parsers import ORJSONParser
+from aeroplane.renderers import ORJSONRenderer
+
+DATA = {
+    "price": Decimal("1999.50"),
+    "created_at": datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+    "naive": datetime(2025, 1, 2, 3, 4, 5),
+    "day": date(2025, 1, 2),
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "ttl": timedelta(minutes=1),
+    "label": gettext_lazy("Cart"),
+    "bytes": b"abc",
+    "nested": [{1: "non-string key"}, (1, 2), None, True, 1.5, "näive ✓"],
+}
+
+
+def test_renders_the_same_json_as_drf():
+    assert json.loads(ORJSONRenderer().render(DATA)) == json.loads(JSONRenderer().render(DATA))
+    assert json.loads(ORJSONRenderer().render(DATA))["created_at"] == "2025-01-02T03:04:05.678901Z"
+    assert ORJSONRenderer().render(None) == b""
+
+
+def test_indent():
+    assert ORJSONRenderer().render([1], "application/json; indent=2") == b"[\n  1\n]"
+    # orjson only indents by 2; other widths go through the stdlib.
+    assert ORJSONRenderer().render([1], "application/json; indent=4") == b"[\n    1\n]"
+
+
+def test_falls_back_to_stdlib_without_orjson(monkeypatch):
+    monkeypatch.setattr(renderers, "orjson", None)
+    monkeypatch.setattr(parsers, "orjson", None)
+    body = ORJSONRenderer().render(DATA)
+    assert body == JSONRenderer().render(DATA)
+    assert ORJSONParser().parse(io.BytesIO(body)) == JSONParser().parse(io.BytesIO(body))
+    with pytest.raises(ParseError):
+        ORJSONParser().parse(io.BytesIO(b'{"a": NaN}'))
+
+
+@pytest.mark.parametrize("body", [b"{", b'{"a": NaN}', b"\xff"])
+def test_parser_rejects_invalid_json(body):
+    with pytest.raises(ParseError, match="JSON parse error"):
+        ORJSONParser().parse(io.BytesIO(body))
+
+
+def test_parser_honours_the_request_encoding():
+    body = '{"title": "näive"}'.encode("latin-1")
+    assert ORJSONParser().parse(io.BytesIO(body), parser_context={"encoding": "latin-1"}) == {"title": "näive"}
+
+
+@pytest.mark.django_db
+def test_product_endpoints_use_orjson():
+    product = Product.objects.create(title="Widget", price=Decimal("12.50"))
+    response = Client().get("/api/products/")
+    assert isinstance(response.accepted_renderer, ORJSONRenderer)
+    assert response.json()[0]["price"] == "12.50"
+
+    response = Client().get(f"/api/async/products/{product.id}/")
+    assert response.json()["title"] == "Widget"
@@ -0,0 +1,57 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from aeroplane.models import Product, ProductReview
+from users.models import User
+
+
+@pytest.fixture
+def reviews():
+    product = Product.objects.create(title="Denim Jacket")
+    users = [
+        User.objects.create_user(username=f"user{i}", email=f"user{i}@example.com", password="secret")
+        for i in range(5)
+    ]
+    ProductReview.objects.bulk_create([
+        ProductReview(user=users[i % 5], product=product, rating=i % 5 + 1, is_approved=i % 6 != 0)
+        for i in range(30)
+    ])
+    return product, users
+
+
+@pytest.mark.django_db
+def test_product_feed_pages_through_approved_reviews_with_one_query(reviews):
+    product, _ = reviews
+    client = APIClient()
+    url = f"/api/products/{product.id}/reviews/?page_size=10"
+    seen = []
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            body = client.get(url).json()
+        assert len(queries) == 1
+        seen.extend(review["id"] for review in body["results"])
+        url = body["next"]
+
+    expected = ProductReview.objects.filter(product=product, is_approved=True).order_by("-created_at", "-id")
+    assert seen == list(expected.values_list("id", flat=True))
+    assert len(seen) == 25
+
+
+@pytest.mark.django_db
+def test_user_feed_only_lists_own_reviews(reviews):
+    _, users = reviews
+    client = APIClient()
+    client.force_authenticate(users[0])
+    body = client.get("/api/users/reviews/").json()
+    assert len(body["results"]) == 6
+    assert {review["user"] for review in body["results"]} == {"user0"}
+    assert body["next"] is None
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_is_rejected(reviews):
+    product, _ = reviews
+    response = APIClient().get(f"/api/products/{product.id}/reviews/?cursor=not-a-cursor")
+    assert response.status_code == 404
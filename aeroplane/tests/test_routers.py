@@ -0,0 +1,55 @@
+import itertools
+
+import pytest
+from django.conf import settings
+from django.test import Client
+
+from aeroplane.models import Cart, Category, Product
+from aeroplane.routers import CatalogReplicaRouter, _pinned_to_primary, is_pinned_to_primary
+
+
+@pytest.fixture
+def router():
+    token = _pinned_to_primary.set(False)
+    router = CatalogReplicaRouter()
+    router.replicas = ["replica_1", "replica_2"]
+    router._cycle = itertools.cycle(router.replicas)
+    yield router
+    _pinned_to_primary.reset(token)
+
+
+def test_catalog_reads_rotate_over_replicas(router):
+    assert [router.db_for_read(Product) for _ in range(3)] == ["replica_1", "replica_2", "replica_1"]
+    assert router.db_for_read(Category) == "replica_2"
+    assert router.db_for_read(Cart) == "default"
+
+
+def test_reads_stick_to_primary_after_a_write(router):
+    assert router.db_for_write(Cart) == "default"
+    assert is_pinned_to_primary()
+    assert router.db_for_read(Product) == "default"
+
+
+def test_least_lag_skips_lagging_replicas(router, monkeypatch):
+    router.selection = "least_lag"
+    router.max_lag = 5
+    lags = {"replica_1": 8.0, "replica_2": 0.5}
+    monkeypatch.setattr("aeroplane.routers.replica_lag", lambda alias: lags[alias])
+    assert router.db_for_read(Product) == "replica_2"
+
+    lags["replica_2"] = None  # unreachable
+    router._lags_checked_at = None
+    assert router.db_for_read(Product) == "default"
+
+
+@pytest.mark.skipif("replica_1" not in settings.DATABASES, reason="run with DB_REPLICAS=<file> to test a real replica")
+# Transactional, since reads inside an atomic block stay on the primary.
+@pytest.mark.django_db(transaction=True, databases=["default", "replica_1"])
+def test_catalog_reads_hit_replica_until_request_writes():
+    Category.objects.using("replica_1").create(title="Only on replica")
+    response = Client().get("/api/products/")
+    assert response.status_code == 200
+    assert list(Category.objects.values_list("title", flat=True)) == ["Only on replica"]
+    Cart.objects.create()
+    assert not Category.objects.exists()
+    _pinned_to_primary.set(False)
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from aeroplane.models import Category, HolidayDeal, Order, Product, ProductReview, Tag
+from aeroplane.seeding import PerfSeeder
+from users.models import User
+
+ANCHOR = datetime(2025, 3, 1, tzinfo=timezone.utc)
+COUNTS = dict(products=30, categories=3, tags=5, users=6, images_per_product=2, deals=2,
+              products_per_deal=4, carts=8, orders=10, reviews=40)
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+def seed():
+    PerfSeeder(seed=1, chunk_size=7, anchor=ANCHOR, image_sizes=((16, 16),), images_per_size=2).run(**COUNTS)
+    return (
+        list(Product.objects.order_by("id").values_list("pid", "title", "price", "date", "rating_count")),
+        list(Order.objects.order_by("id").values_list("total_amount", "created_at")),
+    )
+
+
+@pytest.mark.django_db
+def test_seeder_is_deterministic(tmp_path):
+    products, orders = seed()
+    assert len(products) == 30 and len(orders) == 10
+    assert HolidayDeal.objects.get(name="p1 Deal 0").products.count() == 4
+    # Whether a deal is running is judged at the anchor, not today.
+    assert all(is_active == (start <= ANCHOR <= end) for start, end, is_active in
+               HolidayDeal.objects.values_list("start_date", "end_date", "is_active"))
+    assert sum(row[4] for row in products) == ProductReview.objects.filter(is_approved=True).count()
+    assert (tmp_path / "seed_perf" / "p1_16x16_1.jpg").exists()
+
+    for model in (User, Product, Category, Tag, HolidayDeal):
+        model.objects.all().delete()
+    assert seed() == (products, orders)
+
+
+@pytest.mark.django_db
+def test_command_refuses_to_reseed():
+    args = ["--products", "2", "--reviews", "0", "--orders", "0", "--carts", "0", "--image-size", "8x8"]
+    call_command("seed_perf", *args, stdout=StringIO())
+    with pytest.raises(CommandError):
+        call_command("seed_perf", *args, stdout=StringIO())
@@ -0,0 +1,39 @@
+import base64
+
+from aeroplane.management.commands.coldstart_report import by_package, http_api_event, parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     fastapi.params
+import time:      2000 |       2120 |   fastapi
+import time:        80 |         80 |   django.urls
+import time:       300 |       2500 | aeroplane.main
+"""
+
+
+def test_parse_importtime():
+    modules = parse_importtime(IMPORTTIME + "unrelated line\n")
+    assert modules[0] == ("fastapi.params", 120, 120, 2)
+    assert modules[-1] == ("aeroplane.main", 300, 2500, 0)
+    assert by_package(modules) == [("fastapi", 2120), ("aeroplane", 300), ("django", 80)]
+
+
+def test_lambda_handler_serves_http_api_events():
+    from aeroplane.main import handler
+
+    for _ in range(2):  # a cold and a warm invocation
+        response = handler(http_api_event("/metrics?x=1"), None)
+        assert response["statusCode"] == 200
+        body = base64.b64decode(response["body"]) if response["isBase64Encoded"] else response["body"].encode()
+        assert b"http_request_duration_seconds" in body
+        assert response["headers"]["x-request-id"]
+
+
+def test_lambda_file_cache_is_writable(monkeypatch):
+    import runpy
+
+    for name in ("REDIS_URL", "CACHE_BACKEND", "CACHE_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "aeroplane-dev-app")
+    settings = runpy.run_module("aeroplane.settings")
+    assert settings["CACHES"]["default"]["LOCATION"] == "/tmp/aeroplane-cache"
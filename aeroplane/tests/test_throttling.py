@@ -0,0 +1,83 @@
+import pytest
+from django.core.cache import cache
+
+from aeroplane.throttling import CacheBucketStore, LocalBucketStore, local_buckets, normalize_phone_number
+from users.models import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clear_buckets():
+    local_buckets.clear()
+    cache.clear()
+
+
+@pytest.mark.parametrize("store_class", [LocalBucketStore, CacheBucketStore])
+def test_bucket_allows_burst_then_refills(store_class):
+    clock = FakeClock()
+    store = store_class(clock=clock)
+    assert [store.consume("k", 3, 1.0) for _ in range(3)] == [0, 0, 0]
+    assert store.consume("k", 3, 1.0) == pytest.approx(1.0)
+    clock.now += 1
+    assert store.consume("k", 3, 1.0) == 0
+    assert store.consume("other", 3, 1.0) == 0
+
+
+def test_local_store_evicts_when_full():
+    store = LocalBucketStore(maxsize=10)
+    for i in range(25):
+        store.consume(f"k{i}", 1, 1.0)
+    assert len(store._buckets) <= 10
+
+
+def test_local_store_evictions_are_amortised():
+    clock = FakeClock()
+    store = LocalBucketStore(maxsize=100, clock=clock)
+    for i in range(100):
+        store.consume(f"limited{i}", 1, 0.001)
+    # Nothing has refilled, so the least recently used tenth makes room.
+    store.consume("new", 1, 1.0)
+    assert len(store._buckets) == 91 and "limited0" not in store._buckets
+    for _ in range(1000):
+        store.consume("limited99", 1, 0.001)
+    assert len(store._refills) <= 200
+
+
+def test_flooding_new_identities_does_not_reset_a_limit():
+    clock = FakeClock()
+    store = LocalBucketStore(maxsize=10, clock=clock)
+    assert store.consume("victim", 1, 0.001) == 0
+    for i in range(100):
+        clock.now += 1
+        store.consume(f"flood{i}", 1, 1.0)
+    assert store.consume("victim", 1, 0.001) > 0
+
+
+@pytest.mark.django_db
+def test_login_is_throttled_per_username(client):
+    User.objects.create_user(username="dave", email="dave@example.com", password="secret")
+    for _ in range(5):
+        assert client.post("/users/login/", {"username": "dave", "password": "wrong"}).status_code == 401
+    response = client.post("/users/login/", {"username": "dave", "password": "secret"})
+    assert response.status_code == 429
+    assert "Retry-After" in response
+    assert client.post("/users/login/", {"username": "erin", "password": "wrong"}).status_code == 401
+
+
+def test_phone_numbers_share_one_bucket():
+    assert {normalize_phone_number(n) for n in ("0712 345 678", "+254712345678", "254-712-345678", "712345678")} == {
+        "254712345678"
+    }
+
+
+@pytest.mark.django_db
+def test_non_object_bodies_are_not_throttled_by_field(client):
+    response = client.post("/users/login/", [1, 2], content_type="application/json")
+    assert response.status_code < 500
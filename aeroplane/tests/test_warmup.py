@@ -0,0 +1,103 @@
+import os
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from aeroplane import warmup
+from aeroplane.asgi import application
+from aeroplane.crud import encode_image_to_base64, encoded_image_length, encoded_images, get_hot_product_ids
+from aeroplane.models import Category, Product
+
+
+@pytest.fixture(autouse=True)
+def cold(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    (tmp_path / "plain.jpg").write_bytes(b"\xff\xd8" * 64)
+    encoded_images.clear()
+    warmup._state.update(status="cold", started=None, finished=None, tasks={})
+
+
+@pytest.mark.django_db(transaction=True)
+def test_warm_fills_catalog_and_image_caches(settings):
+    settings.WARMUP_PRODUCTS = 1
+    Category.objects.create(title="Shoes")
+    featured = Product.objects.create(title="Featured", featured=True)
+    plain = Product.objects.create(title="Plain", image="plain.jpg")
+    assert get_hot_product_ids(1) == [featured.id]
+
+    state = warmup.warm(budget=30, workers=2)
+    assert state["status"] == "warm"
+    assert state["tasks"]["images:0"]["count"] == 1
+    assert encoded_images.size > 0
+
+    client = Client()
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(f"/api/products/{featured.id}/").json()["title"] == "Featured"
+    assert len(queries) == 0
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get("/api/holiday-deals/").json() == []
+    assert len(queries) == 0
+    stat = os.stat(plain.image.path)
+    cached = encoded_images.get((plain.image.path, stat.st_mtime_ns, stat.st_size))
+    assert cached.startswith("data:image/jpeg;base64,")
+    assert encode_image_to_base64(plain.image) is cached
+
+
+@pytest.mark.django_db(transaction=True)
+def test_images_stop_before_evicting_each_other(settings, tmp_path, monkeypatch):
+    settings.WARMUP_PRODUCTS = 0
+    for i in range(3):
+        (tmp_path / f"p{i}.jpg").write_bytes(bytes([i]) * 300)
+        Product.objects.create(title=f"P{i}", image=f"p{i}.jpg")
+    length = encoded_image_length(Product.objects.first().image)
+    monkeypatch.setattr(encoded_images, "max_bytes", 2 * length + 10)
+
+    state = warmup.warm(budget=30, workers=1)
+    assert state["tasks"]["images:0"]["count"] == 2
+    assert encoded_images.size == 2 * length
+    assert len(encode_image_to_base64(Product.objects.first().image)) == length
+
+
+@pytest.mark.django_db(transaction=True)
+def test_budget_leaves_warmup_partial_but_ready():
+    Product.objects.create(title="Widget")
+    state = warmup.warm(budget=0)
+    assert state["status"] == "partial"
+    # Only the products task checks the budget: it stops or never starts.
+    assert not state["tasks"].get("products:0", {"ok": False})["ok"]
+
+    response = Client().get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "partial"
+
+
+def test_ready_is_503_while_warming():
+    warmup._state["status"] = "warming"
+    assert warmup.warm()["status"] == "warming"  # already running
+    assert Client().get("/ready").status_code == 503
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_and_lifespan_startup(settings):
+    Category.objects.create(title="Shoes")
+    call_command("warm_caches", "--budget", "30")
+    assert warmup.status()["status"] == "warm"
+
+    settings.WARMUP_ON_BOOT = "block"
+    warmup._state["status"] = "cold"
+    messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    async_to_sync(application)({"type": "lifespan"}, receive, send)
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert warmup.status()["status"] == "warm"
@@ -0,0 +1,251 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LocalBucketStore:
+    """
+    In-process token buckets. Each bucket is a ``(tokens, updated_at,
+    full_at)`` triple keyed by throttle scope and identity; refilling is
+    computed lazily on the next request, so idle buckets cost nothing.
+    A heap of ``(full_at, key)`` finds the refilled buckets when the store
+    is full without scanning it; a bucket's ``full_at`` only grows, so its
+    entry is pushed once and moved on when it turns out to be early.
+    """
+
+    def __init__(self, maxsize=100_000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._refills = []
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate):
+        """
+        Take one token from the bucket at ``key``.
+
+        :return: 0 if the request is allowed, otherwise the seconds until a
+                 token becomes available
+        """
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+                if len(self._buckets) >= self.maxsize:
+                    self._evict(now)
+                new = True
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+                self._buckets.move_to_end(key)
+                new = False
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / refill_rate
+            full_at = now + (capacity - tokens) / refill_rate
+            self._buckets[key] = (tokens, now, full_at)
+            if new:
+                self._push_refill(full_at, key)
+        return wait
+
+    def _push_refill(self, full_at, key):
+        # Entries left by least recently used evictions are skipped when
+        # popped; the heap is rebuilt if a flood of new keys piles them up.
+        heapq.heappush(self._refills, (full_at, key))
+        if len(self._refills) > 2 * max(self.maxsize, len(self._buckets)):
+            self._refills = [(bucket[2], key) for key, bucket in self._buckets.items()]
+            heapq.heapify(self._refills)
+
+    def _evict(self, now):
+        # A bucket that has refilled completely is the same as no bucket, so
+        # those go first: flooding new identities then cannot reset anyone's
+        # limit. The least recently used go next, down to 90% of maxsize, so
+        # that the next few thousand new keys do not evict again.
+        while self._refills and self._refills[0][0] <= now:
+            _, key = heapq.heappop(self._refills)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            if bucket[2] <= now:
+                del self._buckets[key]
+            else:
+                heapq.heappush(self._refills, (bucket[2], key))
+        excess = len(self._buckets) - self.maxsize * 9 // 10
+        if excess > 0:
+            for key in list(islice(self._buckets, excess)):
+                del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._refills.clear()
+
+
+class CacheBucketStore:
+    """
+    Token buckets kept in a Django cache so that all workers share them.
+    The read-modify-write is not atomic, so under heavy concurrency a client
+    may get a few requests beyond its burst; that is acceptable for abuse
+    protection.
+    """
+
+    def __init__(self, alias="default", clock=time.time):
+        self.alias = alias
+        self.clock = clock
+
+    def consume(self, key, capacity, refill_rate):
+        cache = caches[self.alias]
+        now = self.clock()
+        bucket = cache.get(key)
+        if bucket is None:
+            tokens = capacity
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill_rate
+        # Once a bucket would have refilled completely it can simply expire.
+        cache.set(key, (tokens, now), math.ceil((capacity - tokens) / refill_rate) + 1)
+        return wait
+
+
+def get_bucket_store():
+    if getattr(settings, "THROTTLE_BACKEND", "local") == "cache":
+        return CacheBucketStore(getattr(settings, "THROTTLE_CACHE_ALIAS", "default"))
+    return local_buckets
+
+
+local_buckets = LocalBucketStore()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket variant of DRF's ``SimpleRateThrottle``.
+
+    A rate of ``"5/min"`` allows a burst of 5 requests and refills at 5 tokens
+    per minute. Subclasses set ``scope`` (looked up in
+    ``DEFAULT_THROTTLE_RATES``) and implement ``get_ident_value``; returning
+    ``None`` skips throttling for that request.
+    """
+
+    _parsed_rates = {}
+
+    def __init__(self):
+        if not getattr(self, 'rate', None):
+            self.rate = self.get_rate()
+        parsed = self._parsed_rates.get(self.rate)
+        if parsed is None:
+            parsed = self._parsed_rates[self.rate] = self.parse_rate(self.rate)
+        self.num_requests, self.duration = parsed
+        self.wait_seconds = None
+
+    def get_rate(self):
+        return self.THROTTLE_RATES.get(self.scope)
+
+    def get_store(self):
+        return get_bucket_store()
+
+    def get_ident_value(self, request):
+        raise NotImplementedError('.get_ident_value() must be overridden')
+
+    def get_cache_key(self, request, view):
+        ident = self.get_ident_value(request)
+        if ident is None or ident == '':
+            return None
+        return f"throttle:{self.scope}:{ident}"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        self.wait_seconds = self.get_store().consume(
+            key, self.num_requests, self.num_requests / self.duration
+        )
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def request_field(request, name):
+    """
+    The string ``name`` of the request body, or None. Throttles run before the
+    view validates anything, so the body may be any JSON value.
+    """
+    data = request.data
+    value = data.get(name) if isinstance(data, dict) else None
+    return value if isinstance(value, str) else None
+
+
+def normalize_phone_number(phone_number):
+    """``0712 345 678``, ``+254712345678`` and ``712345678`` all give ``254712345678``."""
+    digits = re.sub(r'\D', '', phone_number)
+    if digits.startswith('0'):
+        digits = '254' + digits[1:]
+    elif len(digits) == 9:
+        digits = '254' + digits
+    return digits
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    def get_ident_value(self, request):
+        return self.get_ident(request)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Throttles the authenticated user, or for unauthenticated requests such as
+    login the username being attempted.
+    """
+
+    def get_ident_value(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        username = request_field(request, 'username')
+        return username.lower() if username is not None else None
+
+
+class PhoneTokenBucketThrottle(TokenBucketThrottle):
+    """Throttles the phone number being charged, in its canonical 254 form."""
+
+    def get_ident_value(self, request):
+        phone_number = request_field(request, 'phone_number')
+        return normalize_phone_number(phone_number) if phone_number is not None else None
+
+
+class LoginIPThrottle(IPTokenBucketThrottle):
+    scope = 'login_ip'
+
+
+class LoginUserThrottle(UserTokenBucketThrottle):
+    scope = 'login_user'
+
+
+class CheckoutIPThrottle(IPTokenBucketThrottle):
+    scope = 'checkout_ip'
+
+
+class CheckoutUserThrottle(UserTokenBucketThrottle):
+    scope = 'checkout_user'
+
+
+class CheckoutPhoneThrottle(PhoneTokenBucketThrottle):
+    scope = 'checkout_phone'
+
+
+class MpesaQueryUserThrottle(UserTokenBucketThrottle):
+    scope = 'mpesa_query_user'
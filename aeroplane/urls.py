@@ -2,13 +2,15 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
+from aeroplane import async_views
 from aeroplane.views import (
     HolidayDealViewSet, ProductViewSet, CategoryViewSet, CartViewSet, create_checkout, 
     create_order, get_user_orders, create_checkout_session_view, 
     mpesa_callback_view, query_mpesa_view,
     # New review endpoints
     create_product_review, list_product_reviews, list_user_reviews, 
-    update_product_review, delete_product_review
+    update_product_review_view, delete_product_review_view, review_moderation_view, metrics_view, readiness_view,
+    list_profiles_view, profile_detail_view, home_view
 )
 
 router = DefaultRouter()
@@ -19,6 +21,9 @@ router.register(r'holiday-deals', HolidayDealViewSet, basename='holiday-deal')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('ready', readiness_view, name='ready'),
+    path('api/home/', home_view, name='home'),
     path('api/', include(router.urls)),
     path('users/', include('users.urls')),
     path('api/checkout/', create_checkout),
@@ -33,6 +38,18 @@ urlpatterns = [
     path('api/products/<int:product_id>/reviews/', list_product_reviews, name='product-reviews'),
     path('api/products/<int:product_id>/reviews/create/', create_product_review, name='create-product-review'),
     path('api/users/reviews/', list_user_reviews, name='user-reviews'),
-    path('api/reviews/<int:review_id>/', update_product_review, name='update-review'),
-    path('api/reviews/<int:review_id>/delete/', delete_product_review, name='delete-review'),
+    path('api/reviews/<int:review_id>/', update_product_review_view, name='update-review'),
+    path('api/reviews/<int:review_id>/delete/', delete_product_review_view, name='delete-review'),
+    path('api/reviews/moderation/', review_moderation_view, name='review-moderation'),
+    # Request profiles (admin only)
+    path('api/profiles/', list_profiles_view, name='profile-list'),
+    path('api/profiles/<str:profile_id>/', profile_detail_view, name='profile-detail'),
+    # Async variants, for ASGI deployments
+    path('api/async/products/', async_views.product_list_view, name='async-product-list'),
+    path('api/async/products/<int:product_id>/', async_views.product_detail_view, name='async-product-detail'),
+    path('api/async/products/category/<int:category_id>/', async_views.products_by_category_view,
+         name='async-product-list-by-category'),
+    path('api/async/holiday-deals/', async_views.holiday_deal_list_view, name='async-holiday-deal-list'),
+    path('api/async/checkout-session/', async_views.create_checkout_session_view, name='async-checkout-session'),
+    path('api/async/query-mpesa/', async_views.query_mpesa_view, name='async-query-mpesa'),
 ]
\ No newline at end of file
@@ -1,8 +1,11 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, action, throttle_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 
 from .models import (
     RATING, HolidayDeal, Product, Category, Cart, CartItem, CheckoutSession, Order, 
@@ -18,17 +21,202 @@ from .serializers import (
     CheckoutSessionSerializer, OrderSerializer, OrderItemSerializer, 
     ProductReviewSerializer, CheckoutSessionRequestSerializer, 
     CheckoutSessionResponseSerializer, MpesaQueryRequestSerializer, 
-    MpesaQueryResponseSerializer
+    MpesaQueryResponseSerializer, ReviewModerationSerializer
 )
 from .crud import (
     get_products, get_product, create_product, update_product, delete_product, 
     get_categories, get_products_by_category, get_or_create_cart, add_to_cart, 
     update_cart_it, remove_from_cart, create_checkout_session, create_pro_review, 
     get_product_reviews, update_product_review, delete_product_review, 
-    initiate_mpesa_stk_push, process_mpesa_callback, process_mpesa_query
+    initiate_mpesa_stk_push, process_mpesa_callback, process_mpesa_query,
+    get_moderation_queue, moderate_reviews,
+    get_active_deals_with_top_products, with_listing_prefetches
+)
+from . import profiling, warmup
+from .caching import cached_catalog, catalog_cache, invalidate_tags
+from .conditional import conditional
+from .metrics import render_metrics
+from .pagination import CreatedAtCursorPagination, RankedFeedPagination
+from .ranking import FEEDS, ranked_ids, ranked_page
+from .throttling import (
+    CheckoutIPThrottle, CheckoutPhoneThrottle, CheckoutUserThrottle, MpesaQueryUserThrottle
 )
 # from users.views import check_session_status
 
+
+# Serialized catalog data behind the cached endpoints; also used by
+# aeroplane.warmup.
+
+def product_detail_data(pk):
+    """Product ``pk`` as the detail endpoint returns it, or None if there is none."""
+    def build():
+        product = get_product(pk)
+        return dict(ProductSerializer(product).data) if product else None
+    return cached_catalog(f'product:{pk}', ('products',), build)
+
+
+def category_list_data():
+    return cached_catalog('categories', ('categories',), lambda: list(
+        CategorySerializer(Category.objects.all(), many=True).data
+    ))
+
+
+def active_deal_list_data():
+    return cached_catalog('deals:active', ('deals',), lambda: list(
+        HolidayDealSerializer(HolidayDeal.objects.filter(is_active=True), many=True).data
+    ))
+
+
+# Product sections of /api/home/ and the ranked feed (aeroplane.ranking)
+# each shows the head of. Each is cached on its own under "home:<section>",
+# also a tag, which the receivers of connect_home_signals() invalidate only
+# when a change reaches a product the section shows (or would show), so an
+# unrelated product save leaves the home page cached.
+HOME_SECTIONS = {
+    'featured': 'featured',
+    'deals': None,
+    'new_arrivals': 'newest',
+}
+HOME_TAGS = ('categories', *(f'home:{section}' for section in HOME_SECTIONS))
+
+
+def invalidate_home_sections(*sections):
+    """Rebuild only these sections of /api/home/, once the transaction commits."""
+    invalidate_tags(*(f'home:{section}' for section in sections))
+
+
+def _home_section_product_ids(section):
+    """Ids of the products the cached ``section`` shows (none if it is not cached)."""
+    data = catalog_cache.get(f'home:{section}', (f'home:{section}',)) or []
+    products = [product for deal in data for product in deal['top_products']] if section == 'deals' else data
+    return {product['id'] for product in products}
+
+
+def _invalidate_home_sections_showing(product_ids, also=()):
+    sections = {section for section in HOME_SECTIONS if _home_section_product_ids(section) & set(product_ids)}
+    if sections or also:
+        invalidate_home_sections(*sections, *also)
+
+
+def connect_home_signals():
+    """Invalidate the /api/home/ sections a catalog change reaches."""
+    from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+    from .models import ProductImages
+    from .ranking import feed_changed
+    from .signals import products_changed
+
+    sections = {feed: section for section, feed in HOME_SECTIONS.items() if feed}
+
+    def ranking_moved(sender, feed, positions, **kwargs):
+        size = settings.HOME_SECTION_SIZE
+        if feed in sections and (positions is None or any(p is not None and p < size for p in positions)):
+            invalidate_home_sections(sections[feed])
+
+    def product_publishing(sender, instance, **kwargs):
+        # Deals show only published products, so one being published enters
+        # its active deals' top products without being shown yet.
+        instance._joins_home_deals = bool(
+            instance.pk and instance.product_status == 'published'
+            and Product.objects.filter(pk=instance.pk, holiday_deals__is_active=True)
+            .exclude(product_status='published').exists()
+        )
+
+    def product_changed(sender, instance, **kwargs):
+        # Feed moves are ranking_moved's; this covers the deal top products,
+        # and a deleted product leaves its deals' product counts behind.
+        deals = kwargs['signal'] is post_delete or getattr(instance, '_joins_home_deals', False)
+        _invalidate_home_sections_showing([instance.pk], also=('deals',) if deals else ())
+
+    def images_changed(sender, instance, **kwargs):
+        _invalidate_home_sections_showing([instance.product_id])
+
+    def ratings_changed(sender, product_ids, **kwargs):
+        # Deals show their best rated products.
+        _invalidate_home_sections_showing(product_ids, also=('deals',))
+
+    def everything_changed(sender, action=None, **kwargs):
+        # Every product shows its active deals, and deleting a category nulls
+        # its products' category_id; both are rare.
+        if action is None or action.startswith('post_'):
+            invalidate_home_sections(*HOME_SECTIONS)
+
+    receivers = [
+        (feed_changed, ranking_moved, None),
+        (pre_save, product_publishing, Product),
+        (post_save, product_changed, Product),
+        (post_delete, product_changed, Product),
+        (post_save, images_changed, ProductImages),
+        (post_delete, images_changed, ProductImages),
+        (products_changed, ratings_changed, None),
+        (post_save, everything_changed, HolidayDeal),
+        (post_delete, everything_changed, HolidayDeal),
+        (m2m_changed, everything_changed, HolidayDeal.products.through),
+        (post_delete, everything_changed, Category),
+    ]
+    for signal, receiver, sender in receivers:
+        uid = f"aeroplane.views.home.{receiver.__name__}.{getattr(sender, '__name__', 'any')}"
+        signal.connect(receiver, sender=sender, weak=False, dispatch_uid=uid)
+
+
+class ProductBatch:
+    """Serialized products by id, fetched together with the listing prefetches."""
+
+    def __init__(self):
+        self.data = {}
+
+    def prefetch(self, ids):
+        missing = set(ids) - self.data.keys()
+        if missing:
+            products = list(with_listing_prefetches(Product.objects.filter(id__in=missing)))
+            for product, data in zip(products, ProductSerializer(products, many=True).data):
+                self.data[product.id] = dict(data)
+
+    def get(self, ids):
+        self.prefetch(ids)
+        return [self.data[pk] for pk in ids if pk in self.data]
+
+
+def home_data():
+    """/api/home/: one cache entry assembled from the category list and the cached sections."""
+    return cached_catalog('home', HOME_TAGS, _build_home)
+
+
+def _build_home():
+    size, per_deal = settings.HOME_SECTION_SIZE, settings.HOME_DEAL_PRODUCTS
+    selectors = {
+        'featured': lambda: list(ranked_ids('featured')[:size]),
+        'deals': lambda: get_active_deals_with_top_products(per_deal),
+        'new_arrivals': lambda: list(ranked_ids('newest')[:size]),
+    }
+    # Select the products of every section to rebuild up front, so that
+    # they are fetched and serialized in one go.
+    selected = {
+        section: select() for section, select in selectors.items()
+        if catalog_cache.get(f'home:{section}', (f'home:{section}',)) is None
+    }
+    batch = ProductBatch()
+    batch.prefetch([
+        *selected.get('featured', ()), *selected.get('new_arrivals', ()),
+        *(pk for _, ids in selected.get('deals', ()) for pk in ids),
+    ])
+
+    def choice(section):
+        return selected[section] if section in selected else selectors[section]()
+
+    builders = {
+        'featured': lambda: batch.get(choice('featured')),
+        'deals': lambda: [
+            {**HolidayDealSerializer(deal).data, 'top_products': batch.get(ids)} for deal, ids in choice('deals')
+        ],
+        'new_arrivals': lambda: batch.get(choice('new_arrivals')),
+    }
+    data = {'categories': category_list_data()}
+    for section, build in builders.items():
+        data[section] = cached_catalog(f'home:{section}', (f'home:{section}',), build)
+    return data
+
+
 # request.user = check_session_status
 
 class ProductViewSet(viewsets.ModelViewSet):
@@ -36,17 +224,18 @@ class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
 
+    @method_decorator(conditional('products'))
     def list(self, request):
-        products = get_products()
+        products = get_products(ordering=request.query_params.get('ordering'))
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
+    @method_decorator(conditional('products'))
     def retrieve(self, request, pk=None):
-        product = get_product(pk)
-        if not product:
+        data = product_detail_data(pk)
+        if data is None:
             return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
-        serializer = self.get_serializer(product)
-        return Response(serializer.data)
+        return Response(data)
 
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -67,18 +256,35 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response({"message": "Product deleted successfully"}, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'], url_path='category/(?P<category_id>\d+)')
+    @method_decorator(conditional('products'))
     def list_by_category(self, request, category_id=None):
-        products = get_products_by_category(category_id)
+        products = get_products_by_category(category_id, ordering=request.query_params.get('ordering'))
         if not products:
             return Response({"detail": "No products found for this category"}, status=status.HTTP_404_NOT_FOUND)
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='feed/(?P<feed>[a-z_]+)')
+    @method_decorator(conditional('products'))
+    def feed(self, request, feed=None):
+        """A page of a ranked feed (featured, newest, discount) from its precomputed id list."""
+        if feed not in FEEDS:
+            return Response({"detail": "Unknown feed"}, status=status.HTTP_404_NOT_FOUND)
+        paginator = RankedFeedPagination()
+        ids = paginator.paginate_queryset(ranked_ids(feed), request, view=self)
+        serializer = self.get_serializer(ranked_page(ids), many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+@method_decorator(conditional('categories', public=False), name='list')
+@method_decorator(conditional('categories', public=False), name='retrieve')
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        return Response(category_list_data())
+
     
 
 class CartViewSet(viewsets.ViewSet):
@@ -147,6 +353,7 @@ def get_user_orders(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([CheckoutIPThrottle, CheckoutUserThrottle, CheckoutPhoneThrottle])
 def create_checkout_session_view(request):
     serializer = CheckoutSessionRequestSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -163,8 +370,7 @@ def create_checkout_session_view(request):
     if not phone_number.startswith('254'):
         return Response({"detail": "Invalid M-Pesa phone number"}, status=status.HTTP_400_BAD_REQUEST)
     
-    callback_url = f"https://admin.mohacollection.co.ke/mpesa-callback/"
-    mpesa_response = initiate_mpesa_stk_push(order, phone_number, float(order.total_amount), callback_url)
+    mpesa_response = initiate_mpesa_stk_push(order, phone_number, float(order.total_amount), settings.MPESA_CALLBACK_URL)
     response_serializer = CheckoutSessionResponseSerializer({
         'checkout_request_id': mpesa_response['CheckoutRequestID'],
         'merchant_request_id': mpesa_response['MerchantRequestID'],
@@ -183,6 +389,7 @@ def mpesa_callback_view(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([MpesaQueryUserThrottle])
 def query_mpesa_view(request):
     serializer = MpesaQueryRequestSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -214,7 +421,7 @@ def create_product_review(request, product_id):
             product_id=product_id,
             data=serializer.validated_data
         )
-        return Response(review, status=status.HTTP_201_CREATED)
+        return Response(ProductReviewSerializer(review).data, status=status.HTTP_201_CREATED)
     except ValueError as e:
         return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -222,21 +429,23 @@ def create_product_review(request, product_id):
 @permission_classes([AllowAny])  # Allow anyone to view reviews
 def list_product_reviews(request, product_id):
     """
-    Retrieve all reviews for a specific product.
+    Retrieve a page of approved reviews for a specific product, newest first.
     """
-    reviews = get_product_reviews(product_id=product_id)
+    paginator = CreatedAtCursorPagination()
+    reviews = paginator.paginate_queryset(get_product_reviews(product_id=product_id, approved_only=True), request)
     serializer = ProductReviewSerializer(reviews, many=True)
-    return Response(serializer.data)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_user_reviews(request):
     """
-    Retrieve all reviews by the authenticated user.
+    Retrieve a page of the authenticated user's reviews, newest first.
     """
-    reviews = get_product_reviews(user=request.user)
+    paginator = CreatedAtCursorPagination()
+    reviews = paginator.paginate_queryset(get_product_reviews(user=request.user), request)
     serializer = ProductReviewSerializer(reviews, many=True)
-    return Response(serializer.data)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
@@ -267,9 +476,31 @@ def delete_product_review_view(request, review_id):
     """
     Delete a review by the authenticated user.
     """
-    if delete_product_review(review_id, request.user):
-        return Response({"message": "Review deleted successfully"}, status=status.HTTP_200_OK)
-    return Response({"detail": "Review not found or unauthorized"}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        delete_product_review(review_id, request.user)
+    except ValueError:
+        return Response({"detail": "Review not found or unauthorized"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"message": "Review deleted successfully"}, status=status.HTTP_200_OK)
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdminUser])
+def review_moderation_view(request):
+    """
+    GET lists reviews waiting for moderation; POST approves or rejects a
+    batch of them.
+    """
+    if request.method == 'GET':
+        paginator = CreatedAtCursorPagination()
+        reviews = paginator.paginate_queryset(get_moderation_queue(), request)
+        return paginator.get_paginated_response(ProductReviewSerializer(reviews, many=True).data)
+
+    serializer = ReviewModerationSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    updated, product_ids = moderate_reviews(
+        serializer.validated_data['review_ids'],
+        approve=serializer.validated_data['action'] == 'approve'
+    )
+    return Response({"updated": updated, "products": sorted(product_ids)})
 
 class HolidayDealViewSet(viewsets.ModelViewSet):
     queryset = HolidayDeal.objects.all()
@@ -277,11 +508,11 @@ class HolidayDealViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
     lookup_field = 'deal_id'
 
+    @method_decorator(conditional('deals'))
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset().filter(is_active=True)        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return Response(active_deal_list_data())
     
+    @method_decorator(conditional('deals'))
     def retrieve(self, request, *args, **kwargs):
         # Explicitly handle the detail view
         deal = self.get_object()
@@ -289,8 +520,52 @@ class HolidayDealViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'], url_path='products')
+    @method_decorator(conditional('products'))
     def get_products(self, request, deal_id=None):
         deal = self.get_object()
-        products = deal.products.all()
+        products = with_listing_prefetches(deal.products.all())
         serializer = ProductSerializer(products, many=True)
         return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional(*HOME_TAGS, public=False)
+def home_view(request):
+    """Everything the storefront home page shows, in one response."""
+    return Response(home_data())
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint."""
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+def readiness_view(request):
+    """Load balancer readiness probe: 503 while this worker warms its caches."""
+    state = warmup.status()
+    return JsonResponse(state, status=200 if warmup.is_ready() else 503)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def list_profiles_view(request):
+    return Response(profiling.list_profiles())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_detail_view(request, profile_id):
+    """Profile metadata and SQL timeline; ``?download=pstats|speedscope`` fetches the profile itself."""
+    fmt = request.query_params.get('download')
+    if fmt is None:
+        meta = profiling.get_profile(profile_id)
+        if meta is None:
+            return Response({"detail": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(meta)
+    path = profiling.profile_file(profile_id, fmt)
+    if path is None:
+        return Response({"detail": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+    suffix, content_type = profiling.FORMATS[fmt]
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=profile_id + suffix, content_type=content_type)
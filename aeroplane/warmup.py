@@ -0,0 +1,194 @@
+"""
+Cache warmup: fill the catalog and image caches before a worker takes
+traffic, so the first requests after a deploy don't all pay the cold cost.
+
+``warm()`` runs these tasks on a thread pool:
+
+- the category list, the active holiday deals and ``/api/home/``;
+- the detail responses of the hottest ``WARMUP_PRODUCTS`` products, by
+  ``crud.get_hot_product_ids``;
+- the base64 encoding of every other product image (what the product list
+  spends most of its time on), until the image cache is full. The product
+  list response itself is not cached, so its images are all there is to
+  warm.
+
+Everything stops at ``budget`` seconds. A task cut short leaves the warmup
+``partial``, which still counts as ready: the caches fill on demand anyway.
+
+``warm_on_boot()`` is called by the gunicorn ``post_worker_init`` hook and
+the ASGI lifespan startup in ``aeroplane.asgi``, and ``/ready`` reports the
+state of this process (503 while warming). ``manage.py warm_caches`` fills
+the shared cache tier ahead of a deploy.
+"""
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {"status": "cold", "started": None, "finished": None, "tasks": {}}
+
+
+def status():
+    """A copy of this process's warmup state."""
+    with _lock:
+        return {**_state, "tasks": dict(_state["tasks"])}
+
+
+def is_ready():
+    return status()["status"] != "warming"
+
+
+def _chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class _Budget:
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+
+def _warm_categories(budget):
+    from .views import category_list_data
+    return len(category_list_data())
+
+
+def _warm_deals(budget):
+    from .views import active_deal_list_data
+    return len(active_deal_list_data())
+
+
+def _warm_home(budget):
+    from .views import home_data
+    return len(home_data())
+
+
+def _warm_products(ids, budget):
+    from .views import product_detail_data
+    done = 0
+    for pk in ids:
+        if budget.expired:
+            raise TimeoutError(f"{done} of {len(ids)} products warmed")
+        product_detail_data(pk)
+        done += 1
+    return done
+
+
+def _warm_images(ids, budget):
+    from .crud import encode_image_to_base64, encoded_image_length, encoded_images
+    from .models import Product, ProductImages
+    fields = [product.image for product in Product.objects.filter(id__in=ids).only("image")]
+    fields += [row.images for row in ProductImages.objects.filter(product_id__in=ids).only("images")]
+    done = 0
+    for field in fields:
+        if encoded_images.size + encoded_image_length(field) > encoded_images.max_bytes:
+            break  # it would only evict an image encoded earlier
+        if budget.expired:
+            raise TimeoutError(f"{done} of {len(fields)} images encoded")
+        encode_image_to_base64(field)
+        done += 1
+    return done
+
+
+def _run(name, task, *args):
+    started = time.monotonic()
+    try:
+        result = {"ok": True, "count": task(*args)}
+    except Exception as exc:
+        if not isinstance(exc, TimeoutError):
+            logger.warning("Warmup task %s failed", name, exc_info=True)
+        result = {"ok": False, "error": str(exc) or type(exc).__name__}
+    finally:
+        connections.close_all()
+    result["seconds"] = round(time.monotonic() - started, 3)
+    with _lock:
+        _state["tasks"][name] = result
+
+
+def _tasks(budget):
+    from .crud import get_hot_product_ids
+    from .models import Product
+
+    workers = settings.WARMUP_WORKERS
+    hot = get_hot_product_ids(settings.WARMUP_PRODUCTS)
+    tasks = [("categories", _warm_categories, budget), ("deals", _warm_deals, budget), ("home", _warm_home, budget)]
+    for number, ids in enumerate(_chunks(hot, max(1, math.ceil(len(hot) / workers)))):
+        tasks.append((f"products:{number}", _warm_products, ids, budget))
+    hot = set(hot)
+    rest = [pk for pk in Product.objects.order_by("-featured", "-id").values_list("id", flat=True) if pk not in hot]
+    for number, ids in enumerate(_chunks(rest, 200)):
+        tasks.append((f"images:{number}", _warm_images, ids, budget))
+    return tasks
+
+
+def _begin():
+    with _lock:
+        if _state["status"] == "warming":
+            return False
+        _state.update(status="warming", started=time.time(), finished=None, tasks={})
+        return True
+
+
+def _warm(budget, workers):
+    budget = _Budget(settings.WARMUP_BUDGET if budget is None else budget)
+    workers = workers or settings.WARMUP_WORKERS
+    submitted = None
+    try:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup")
+        try:
+            futures = [executor.submit(_run, *task) for task in _tasks(budget)]
+            submitted = len(futures)
+            wait(futures, timeout=max(0.0, budget.deadline - time.monotonic()))
+        finally:
+            # Tasks stop at the deadline by themselves; queued ones are dropped.
+            executor.shutdown(wait=True, cancel_futures=True)
+    except Exception:
+        logger.exception("Cache warmup failed")
+
+    with _lock:
+        tasks = _state["tasks"]
+        complete = len(tasks) == submitted and all(task["ok"] for task in tasks.values())
+        _state.update(status="warm" if complete else "partial", finished=time.time())
+        logger.info("Cache warmup %s in %.1fs", _state["status"], _state["finished"] - _state["started"])
+    return status()
+
+
+def warm(budget=None, workers=None):
+    """
+    Fill the caches within ``budget`` seconds (``WARMUP_BUDGET``) using
+    ``workers`` threads (``WARMUP_WORKERS``) and return the final state.
+    Does nothing if another warmup is already running in this process.
+    """
+    if not _begin():
+        return status()
+    return _warm(budget, workers)
+
+
+def warm_on_boot():
+    """Warm according to ``WARMUP_ON_BOOT``: ``off``, ``block`` or ``background``."""
+    mode = settings.WARMUP_ON_BOOT
+    if mode == "block":
+        warm()
+    elif mode == "background":
+        # Not ready from now until the thread has finished.
+        if _begin():
+            threading.Thread(target=_warm_in_background, name="warmup", daemon=True).start()
+    elif mode != "off":
+        logger.warning("Unknown WARMUP_ON_BOOT %r; not warming", mode)
+
+
+def _warm_in_background():
+    try:
+        _warm(None, None)
+    finally:
+        connections.close_all()
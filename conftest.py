@@ -0,0 +1,20 @@
+import pytest
+from django.core.cache import cache
+from django.test.utils import override_settings
+
+from aeroplane.caching import TieredCache
+
+
+@pytest.fixture(scope="session", autouse=True)
+def process_local_cache():
+    # The configured file cache outlives the test database and is shared with
+    # the development server.
+    with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    cache.clear()
+    for instance in list(TieredCache.instances):
+        instance.local.clear()
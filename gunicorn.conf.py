@@ -0,0 +1,25 @@
+# Gunicorn settings, picked up automatically from the working directory:
+#     gunicorn aeroplane.main:application
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the Prometheus multiprocess
+    # directory; its counters and histograms are kept.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Warm this worker's caches (WARMUP_ON_BOOT) before it accepts requests.
+    # post_fork would run before the worker has loaded Django. In "block"
+    # mode the worker doesn't heartbeat until warmup returns, so keep
+    # WARMUP_BUDGET under the worker timeout (30 seconds by default).
+    from aeroplane.warmup import warm_on_boot
+
+    warm_on_boot()
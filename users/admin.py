@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, ShippingAddress, PaymentMethod
+from .models import User, ShippingAddress, PaymentMethod, RefreshTokenFamily
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -13,3 +13,8 @@ class ShippingAddressAdmin(admin.ModelAdmin):
 @admin.register(PaymentMethod)
 class PaymentMethodAdmin(admin.ModelAdmin):
     pass
+
+@admin.register(RefreshTokenFamily)
+class RefreshTokenFamilyAdmin(admin.ModelAdmin):
+    list_display = ('family_id', 'user', 'generation', 'revoked', 'expires_at')
+    list_filter = ('revoked',)
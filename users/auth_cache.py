@@ -0,0 +1,74 @@
+import copy
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from aeroplane.caching import TieredCache, invalidate_tags
+
+BLACKLIST_KEY = "users:auth:blacklisted:{digest}"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# Local entries are trusted for USER_AUTH_CACHE_LOCAL_TTL seconds; after that
+# they are reused only while the user's tag is unchanged.
+user_cache = TieredCache(
+    "auth",
+    local_maxsize=_setting("USER_AUTH_CACHE_LOCAL_MAXSIZE", 1024),
+    local_ttl=_setting("USER_AUTH_CACHE_LOCAL_TTL", 5),
+)
+local_users = user_cache.local
+
+
+def user_tag(user_id):
+    return f"user:{user_id}"
+
+
+def get_cached_user(user_id, load):
+    """
+    Return a copy of the user from the local LRU or the shared cache, calling
+    ``load()`` to fetch it from the database on a miss.
+    """
+    user = user_cache.get_or_set(
+        str(user_id), load, _setting("USER_AUTH_CACHE_SHARED_TTL", 300), tags=(user_tag(user_id),), lock=False,
+    )
+    return copy.copy(user)
+
+
+def bump_user_version(user_id):
+    """
+    Invalidate every cached copy of a user. Call this after changing a user
+    through a path that bypasses ``save()`` (e.g. ``QuerySet.update``).
+    """
+    # Now, so the rest of this transaction sees the change, and again on
+    # commit, in case another request re-cached the old row in between.
+    invalidate_tags(user_tag(user_id), on_commit=False)
+    invalidate_tags(user_tag(user_id))
+
+
+def _token_digest(token):
+    return hashlib.md5(str(token).encode()).hexdigest()
+
+
+def is_token_blacklisted(token, lookup):
+    """
+    Cached wrapper around the blacklist lookup. ``lookup`` is only called
+    when the shared cache has no answer for this token yet.
+    """
+    key = BLACKLIST_KEY.format(digest=_token_digest(token))
+    blacklisted = cache.get(key)
+    if blacklisted is None:
+        blacklisted = lookup()
+        cache.set(key, blacklisted, _setting("USER_AUTH_CACHE_SHARED_TTL", 300))
+    return blacklisted
+
+
+def mark_token_blacklisted(token):
+    cache.set(
+        BLACKLIST_KEY.format(digest=_token_digest(token)),
+        True,
+        int(settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds()),
+    )
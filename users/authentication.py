@@ -1,10 +1,35 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .auth_cache import get_cached_user, is_token_blacklisted
 from .models import BlacklistedToken
 
 class CustomJWTAuthentication(JWTAuthentication):
     def get_validated_token(self, raw_token):
         token = super().get_validated_token(raw_token)
-        if BlacklistedToken.objects.filter(token=str(token)).exists():
+        if is_token_blacklisted(token, lambda: BlacklistedToken.objects.filter(token=str(token)).exists()):
             raise InvalidToken("Token is blacklisted")
-        return token
\ No newline at end of file
+        return token
+
+    def get_user(self, validated_token):
+        """
+        Resolve the token's user from the auth cache, falling back to the
+        database (and populating the cache) on a miss.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id, lambda: super(CustomJWTAuthentication, self).get_user(validated_token))
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
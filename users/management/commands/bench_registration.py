@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+)
+
+
+class Command(BaseCommand):
+    help = "Measure registrations per second through /users/register/ against a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=50, help="Number of users to register.")
+        parser.add_argument(
+            "--fast-hasher",
+            action="store_true",
+            help="Hash passwords with MD5 to measure everything except the password hash.",
+        )
+
+    def handle(self, *args, count, fast_hasher, **options):
+        hashers = ["django.contrib.auth.hashers.MD5PasswordHasher"] if fast_hasher else settings.PASSWORD_HASHERS
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(PASSWORD_HASHERS=hashers):
+                client = Client()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    for i in range(count):
+                        response = client.post("/users/register/", {
+                            "username": f"bench{i}",
+                            "email": f"bench{i}@example.com",
+                            "password": "bench-password",
+                        })
+                        if response.status_code != 201:
+                            raise CommandError(f"Registration {i} failed: {response.status_code} {response.content!r}")
+                    elapsed = time.perf_counter() - start
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{count} registrations in {elapsed:.3f}s: {count / elapsed:.1f}/s, "
+            f"{elapsed / count * 1000:.2f} ms and {len(queries) / count:.1f} queries each"
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.tokens import flush_expired_token_families
+
+
+class Command(BaseCommand):
+    help = "Delete refresh token families that have expired."
+
+    def handle(self, *args, **options):
+        deleted = flush_expired_token_families()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired token families"))
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
+
+from .auth_cache import bump_user_version, mark_token_blacklisted
 
 # Create your models here.
 class User(AbstractUser):
@@ -24,13 +26,26 @@ class Profile(models.Model):
 
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.create(user=instance)
+        # Cache the new profile on the user so nothing has to query it back.
+        instance.profile = Profile.objects.create(user=instance)
+
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Only write back a profile the caller actually loaded through the user. A
+    # freshly created one was just inserted, and partial saves such as the
+    # last_login update never touch it.
+    if created or update_fields is not None:
+        return
+    if User.profile.is_cached(instance):
+        instance.profile.save()
 
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Any save counts: deactivation and password changes go through here too.
+    bump_user_version(instance.pk)
 
 post_save.connect(create_user_profile, sender=User)
 post_save.connect(save_user_profile, sender=User)
+post_save.connect(invalidate_cached_user, sender=User)
+post_delete.connect(invalidate_cached_user, sender=User)
 
 class BlacklistedToken(models.Model):
     token = models.TextField(unique=True)
@@ -38,6 +53,32 @@ class BlacklistedToken(models.Model):
 
     def __str__(self):
         return f"Blacklisted {self.token[:10]}..."
+
+def cache_blacklisted_token(sender, instance, created, **kwargs):
+    if created:
+        mark_token_blacklisted(instance.token)
+
+post_save.connect(cache_blacklisted_token, sender=BlacklistedToken)
+
+class RefreshTokenFamily(models.Model):
+    """
+    One row per login session. Every rotation bumps ``generation``; a refresh
+    token whose generation no longer matches has been reused and revokes the
+    whole family.
+    """
+    family_id = models.UUIDField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='token_families')
+    generation = models.PositiveIntegerField(default=0)
+    revoked = models.BooleanField(default=False)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Refresh Token Family"
+        verbose_name_plural = "Refresh Token Families"
+
+    def __str__(self):
+        return f"{self.family_id} (gen {self.generation}){' revoked' if self.revoked else ''}"
     
 
 class ShippingAddress(models.Model):
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import User, ShippingAddress, PaymentMethod, BlacklistedToken
+from .tokens import FamilyRefreshToken, rotate_refresh_token
 
 class LoginRequestSerializer(serializers.Serializer):
     username = serializers.CharField()
@@ -10,6 +11,14 @@ class RegisterRequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
 
+class TokenFamilyRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+    access = serializers.CharField(read_only=True)
+
+    def validate(self, attrs):
+        refresh = rotate_refresh_token(FamilyRefreshToken(attrs['refresh']))
+        return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
 class ShippingAddressSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShippingAddress
@@ -1,3 +1,121 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from aeroplane.throttling import local_buckets
+
+from .auth_cache import local_users
+from .authentication import CustomJWTAuthentication
+from .models import BlacklistedToken, Profile, RefreshTokenFamily, User
+from .tokens import flush_expired_token_families
+
+
+class CustomJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="secret")
+        self.token = AccessToken.for_user(self.user)
+        self.auth = CustomJWTAuthentication()
+
+    def authenticate(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        return self.auth.authenticate(request)
+
+    def test_second_request_uses_no_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_shared_cache_survives_local_eviction(self):
+        self.authenticate()
+        local_users.clear()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.username, "alice")
+
+    def test_save_invalidates_cached_user(self):
+        self.authenticate()
+        self.user.username = "alice2"
+        self.user.save()
+        user, _ = self.authenticate()
+        self.assertEqual(user.username, "alice2")
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_blacklisted_token_is_rejected_after_cached_check(self):
+        self.authenticate()
+        BlacklistedToken.objects.create(token=str(self.token))
+        with self.assertRaises(InvalidToken):
+            self.authenticate()
+
+
+class RefreshTokenFamilyTests(TestCase):
+    def setUp(self):
+        local_buckets.clear()
+        self.user = User.objects.create_user(username="bob", email="bob@example.com", password="secret")
+
+    def login(self):
+        response = self.client.post("/users/login/", {"username": "bob", "password": "secret"})
+        return response.json()["refresh_token"]
+
+    def refresh(self, token):
+        return self.client.post("/token/refresh/", {"refresh": token})
+
+    def test_rotation_issues_new_refresh_token(self):
+        response = self.refresh(self.login())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+        self.assertEqual(self.refresh(response.json()["refresh"]).status_code, 200)
+        self.assertEqual(RefreshTokenFamily.objects.get().generation, 2)
+
+    def test_reuse_revokes_family(self):
+        first = self.login()
+        second = self.refresh(first).json()["refresh"]
+        self.assertEqual(self.refresh(first).status_code, 401)
+        self.assertEqual(self.refresh(second).status_code, 401)
+        self.assertTrue(RefreshTokenFamily.objects.get().revoked)
+
+    def test_legacy_token_rotates_once(self):
+        legacy = str(RefreshToken.for_user(self.user))
+        self.assertEqual(self.refresh(legacy).status_code, 200)
+        self.assertEqual(self.refresh(legacy).status_code, 401)
+
+    def test_flush_removes_expired_families(self):
+        self.login()
+        RefreshTokenFamily.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(flush_expired_token_families(), 1)
+        self.assertFalse(RefreshTokenFamily.objects.exists())
+
+
+class RegistrationTests(TestCase):
+    def register(self, username="carol", email="carol@example.com"):
+        return self.client.post("/users/register/", {"username": username, "email": email, "password": "secret"})
+
+    def test_registration_creates_profile_in_one_pass(self):
+        with self.assertNumQueries(4):  # savepoint, user, profile, release
+            response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Profile.objects.filter(user__username="carol").exists())
+
+    def test_duplicate_username_and_email_are_reported(self):
+        self.register()
+        self.assertEqual(self.register(email="other@example.com").json()["detail"], "Username already taken")
+        self.assertEqual(self.register(username="other").json()["detail"], "Email already taken")
 
-# Create your tests here.
+    def test_partial_user_save_does_not_touch_profile(self):
+        self.register()
+        user = User.objects.get(username="carol")
+        with self.assertNumQueries(1):
+            user.save(update_fields=["last_login"])
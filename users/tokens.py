@@ -0,0 +1,108 @@
+import uuid
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RefreshTokenFamily
+
+FAMILY_CLAIM = "fam"
+GENERATION_CLAIM = "gen"
+
+
+class FamilyRefreshToken(RefreshToken):
+    """Refresh token carrying its family id and generation."""
+
+    # The access tokens minted from it have no use for the family claims.
+    no_copy_claims = RefreshToken.no_copy_claims + (FAMILY_CLAIM, GENERATION_CLAIM)
+
+
+def issue_refresh_token(user) -> FamilyRefreshToken:
+    """
+    Start a new token family for a fresh login and return its first refresh
+    token.
+    """
+    token = FamilyRefreshToken.for_user(user)
+    family_id = uuid.uuid4()
+    RefreshTokenFamily.objects.create(
+        family_id=family_id,
+        user=user,
+        expires_at=datetime_from_epoch(token["exp"]),
+    )
+    token[FAMILY_CLAIM] = family_id.hex
+    token[GENERATION_CLAIM] = 0
+    return token
+
+
+def rotate_refresh_token(token: FamilyRefreshToken) -> FamilyRefreshToken:
+    """
+    Advance the token's family by one generation and turn ``token`` into its
+    replacement in place.
+
+    The common case is a single conditional ``UPDATE`` on the family's primary
+    key. If it matches nothing, the token is either revoked/expired or an
+    already-rotated generation being replayed, in which case the whole family
+    is revoked.
+
+    Tokens issued before families existed have no family claim; their jti
+    becomes the family id, so they rotate once like any other token.
+
+    :raises TokenError: if the token may not be refreshed
+    """
+    now = timezone.now()
+    family_id = token.get(FAMILY_CLAIM) or token[api_settings.JTI_CLAIM]
+    generation = token.get(GENERATION_CLAIM, 0)
+
+    if FAMILY_CLAIM not in token:
+        RefreshTokenFamily.objects.get_or_create(
+            family_id=family_id,
+            defaults={
+                "user_id": token[api_settings.USER_ID_CLAIM],
+                "expires_at": datetime_from_epoch(token["exp"]),
+            },
+        )
+
+    rotated = RefreshTokenFamily.objects.filter(
+        family_id=family_id,
+        generation=generation,
+        revoked=False,
+        expires_at__gt=now,
+        user__is_active=True,
+    ).update(
+        generation=F("generation") + 1,
+        expires_at=now + api_settings.REFRESH_TOKEN_LIFETIME,
+    )
+    if not rotated:
+        if RefreshTokenFamily.objects.filter(family_id=family_id).exclude(generation=generation).exists():
+            revoke_token_family(family_id)
+            raise TokenError(_("Token has already been used"))
+        raise TokenError(_("Token is invalid or expired"))
+
+    token[FAMILY_CLAIM] = uuid.UUID(str(family_id)).hex
+    token[GENERATION_CLAIM] = generation + 1
+    token.set_jti()
+    token.set_exp()
+    token.set_iat()
+    return token
+
+
+def revoke_token_family(family_id) -> int:
+    return RefreshTokenFamily.objects.filter(family_id=family_id).update(revoked=True)
+
+
+def revoke_user_token_families(user) -> int:
+    return RefreshTokenFamily.objects.filter(user=user, revoked=False).update(revoked=True)
+
+
+def flush_expired_token_families() -> int:
+    """
+    Delete families past their expiry. Every token of a family expires no
+    later than the family itself, so expired rows can never be needed for
+    reuse detection again.
+    """
+    deleted, _ = RefreshTokenFamily.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -1,17 +1,23 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from django.contrib.auth import authenticate, get_user_model
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from .serializers import (LoginRequestSerializer, RegisterRequestSerializer, 
                          ShippingAddressSerializer, PaymentMethodSerializer, UserProfileSerializer)
 from .models import BlacklistedToken, ShippingAddress, PaymentMethod
+from .tokens import FamilyRefreshToken, issue_refresh_token, revoke_token_family, FAMILY_CLAIM
 from .crud import (create_shipping_address, get_shipping_addresses, update_shipping_address, 
                    delete_shipping_address, create_payment_method, get_payment_methods, 
                    update_payment_method, delete_payment_method)
 
+from aeroplane.throttling import LoginIPThrottle, LoginUserThrottle
+
 User = get_user_model()
 
 @api_view(['POST'])
@@ -19,20 +25,28 @@ User = get_user_model()
 def register_user(request):
     serializer = RegisterRequestSerializer(data=request.data)
     if serializer.is_valid():
-        if User.objects.filter(username=serializer.validated_data['username']).exists():
-            return Response({"detail": "Username already taken"}, status=status.HTTP_400_BAD_REQUEST)
-        if User.objects.filter(email=serializer.validated_data['email']).exists():
-           return Response({"detail": "Email already taken"}, status=status.HTTP_400_BAD_REQUEST)
-        user = User.objects.create_user(
-            username=serializer.validated_data['username'],
-            email=serializer.validated_data['email'],
-            password=serializer.validated_data['password']
-        )
+        # The unique constraints on username and email do the duplicate
+        # checking; the profile is created by the post_save handler inside the
+        # same transaction.
+        try:
+            with transaction.atomic():
+                User.objects.create_user(
+                    username=serializer.validated_data['username'],
+                    email=serializer.validated_data['email'],
+                    password=serializer.validated_data['password']
+                )
+        except IntegrityError:
+            if User.objects.filter(username=serializer.validated_data['username']).exists():
+                return Response({"detail": "Username already taken"}, status=status.HTTP_400_BAD_REQUEST)
+            if User.objects.filter(email=serializer.validated_data['email']).exists():
+                return Response({"detail": "Email already taken"}, status=status.HTTP_400_BAD_REQUEST)
+            raise
         return Response({"message": "User registered successfully"}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginUserThrottle])
 def login_user(request):
     serializer = LoginRequestSerializer(data=request.data)
     if serializer.is_valid():
@@ -42,7 +56,7 @@ def login_user(request):
         if not user:
             return Response({"detail": "Invalid username or password"}, status=status.HTTP_401_UNAUTHORIZED)
         token = AccessToken.for_user(user)
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_refresh_token(user)
         return Response({"access_token": str(token), "refresh_token": str(refresh)}, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -54,6 +68,14 @@ def logout_user(request):
         return Response({"detail": "Token missing"}, status=status.HTTP_403_FORBIDDEN)
     if not BlacklistedToken.objects.filter(token=str(token)).exists():
         BlacklistedToken.objects.create(token=str(token))
+    # Also end the refresh token's session when the client sends it along.
+    if request.data.get('refresh_token'):
+        try:
+            refresh = FamilyRefreshToken(request.data['refresh_token'])
+        except TokenError:
+            refresh = None
+        if refresh is not None and refresh.get(FAMILY_CLAIM) and refresh[api_settings.USER_ID_CLAIM] == request.user.pk:
+            revoke_token_family(refresh[FAMILY_CLAIM])
     return Response({"message": "Logout successful. Token invalidated."}, status=status.HTTP_200_OK)
 
 @api_view(['GET'])